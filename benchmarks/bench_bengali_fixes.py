@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for apply_bengali_fixes.
+Builds a large synthetic Bengali OCR corpus (clean text with injected spacing errors),
+checks the compiled single-pass matcher against the sequential str.replace reference
+page by page, then times both.
+
+Usage: python benchmarks/bench_bengali_fixes.py [--pages 2000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_processing.bengali_text_fixes import (  # noqa: E402
+    BENGALI_FIXES,
+    _apply_bengali_fixes_sequential,
+    apply_bengali_fixes,
+)
+
+SAMPLE_TEXT = (
+    "আজ আমার বয়স সাতাশ মাত্র। এ জীবনটা না দৈর্ঘ্যের হিসাবে বড়ো, না গুণের হিসাবে। "
+    "তবু ইহার একটু বিশেষ মূল্য আছে। ইহা সেই ফুলের মতো যাহার বুকের উপরে ভ্রমর আসিয়া বসিয়াছিল, "
+    "এবং সেই পদক্ষেপের ইতিহাস তাহার জীবনের মাঝখানে ফলের মতো গুটি ধরিয়া উঠিয়াছে। "
+    "অনুপমের মামা তাহার চেয়ে বছর ছয়েক মাত্র বড়ো। শিক্ষার্থীরা প্রশ্নের উত্তর খুঁজে বের করবে। "
+)
+
+
+def make_corpus(pages: int, seed: int = 42) -> list:
+    """
+    Synthetic OCR pages: sample text with spaces injected before marks and around dandas
+    """
+    rng = random.Random(seed)
+    noisy_targets = {key.replace(' ', ''): key for key in BENGALI_FIXES if key.strip()}
+    page_texts = []
+    for _ in range(pages):
+        text = SAMPLE_TEXT * 6
+        out = []
+        for char in text:
+            if rng.random() < 0.08 and char in "ািীুূেৈোৌ্ংঁ়।":
+                out.append(' ' * rng.choice([1, 1, 1, 2]))
+            out.append(char)
+            if rng.random() < 0.01:
+                out.append('  ')
+        page = ''.join(out)
+        # Sprinkle a few split conjuncts taken directly from the fix table
+        for broken in rng.sample(sorted(noisy_targets.values()), 5):
+            page += ' ' + broken
+        page_texts.append(page)
+    return page_texts
+
+
+def time_call(func, page_texts, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in page_texts:
+            func(page)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    page_texts = make_corpus(args.pages)
+    corpus_chars = sum(len(page) for page in page_texts)
+
+    mismatches = sum(
+        1 for page in page_texts
+        if apply_bengali_fixes(page) != _apply_bengali_fixes_sequential(page)
+    )
+    document = "\n\n".join(page_texts)
+    document_match = apply_bengali_fixes(document) == _apply_bengali_fixes_sequential(document)
+
+    sequential = time_call(_apply_bengali_fixes_sequential, page_texts, args.repeat)
+    compiled = time_call(apply_bengali_fixes, page_texts, args.repeat)
+
+    print(f"corpus: {args.pages} pages, {corpus_chars / 1e6:.1f}M chars, {len(BENGALI_FIXES)} fixes")
+    print(f"equivalence: {args.pages - mismatches}/{args.pages} pages identical, "
+          f"whole document {'identical' if document_match else 'DIFFERENT'}")
+    print(f"sequential str.replace: {sequential:.3f}s ({corpus_chars / sequential / 1e6:.1f}M chars/s)")
+    print(f"compiled single pass:   {compiled:.3f}s ({corpus_chars / compiled / 1e6:.1f}M chars/s)")
+    print(f"speedup: {sequential / compiled:.1f}x")
+
+    if mismatches or not document_match:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
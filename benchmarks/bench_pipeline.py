@@ -0,0 +1,335 @@
+"""
+Offline end-to-end benchmark: ingest -> index -> concurrent queries.
+Generates synthetic Bengali PDFs (text-layer and scanned), times every ingest stage
+in pages/s, the index build (seconds, memory, recall) and query latency percentiles
+for N concurrent users. Azure OpenAI is replaced by in-process stand-ins
+(benchmarks/fakes.py) with configurable latency, so runs need no network or keys
+and are comparable between commits. Results are written as JSON.
+
+Usage: python benchmarks/bench_pipeline.py [--documents 8] [--pages 10] [--scanned 2]
+       [--users 1,8,32] [--questions 5] [--skip-ocr] [--output benchmarks/results/run.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+import pytesseract  # noqa: E402
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings  # noqa: E402
+from benchmarks.synthetic_pdfs import find_bengali_font, make_corpus  # noqa: E402
+from config.config import CONFIG  # noqa: E402
+from conversation.conversation_chain import create_optimized_conversation_chain  # noqa: E402
+from telemetry.metrics import current_rss_mb  # noqa: E402
+from telemetry.progress import ProgressReporter, set_default_reporter  # noqa: E402
+from pdf_processing.bengali_text_fixes import apply_bengali_fixes  # noqa: E402
+from pdf_processing.chunking import smart_text_chunking  # noqa: E402
+from pdf_processing.extraction import build_page_records  # noqa: E402
+from pdf_processing.ocr_engine import OCR_CONFIGS, OCR_DPI, peak_rss_mb, render_page, run_pdf_ocr  # noqa: E402
+from pdf_processing.preprocessing import preprocess_page, summarize_page_stats  # noqa: E402
+from query.streaming import StreamingAnswerHandler  # noqa: E402
+from vectorstore.embedding_batcher import BatchedEmbeddings  # noqa: E402
+from vectorstore.faiss_vectorstore import attach_sparse_index  # noqa: E402
+from vectorstore.index_builder import build_vectorstore  # noqa: E402
+
+
+class StageTimer:
+    """
+    Accumulates wall time and page counts per stage
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+
+    def add(self, stage: str, seconds: float, pages: int = 0):
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "pages": 0})
+        entry["seconds"] += seconds
+        entry["pages"] += pages
+
+    def report(self) -> Dict:
+        return {
+            stage: dict(entry, pages_per_second=entry["pages"] / entry["seconds"] if entry["seconds"] and entry["pages"] else None)
+            for stage, entry in self.stages.items()
+        }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(values: List[float]) -> Dict:
+    if not values:
+        return {}
+    return {
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "mean_ms": statistics.fmean(values),
+        "max_ms": max(values),
+    }
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(errors: Dict) -> Dict:
+    return dict(errors, cer=errors["errors"] / errors["chars"] if errors["chars"] else None)
+
+
+def ingest_text_document(entry: Dict, timer: StageTimer) -> List[Dict]:
+    start = time.perf_counter()
+    doc = fitz.open(stream=entry["bytes"], filetype="pdf")
+    page_texts = {i: doc[i].get_text("text") for i in range(len(doc))}
+    doc.close()
+    pages = build_page_records(page_texts, {i: "direct" for i in page_texts})
+    timer.add("extract_text_layer", time.perf_counter() - start, len(page_texts))
+    return pages
+
+
+def ingest_scanned_document(entry: Dict, timer: StageTimer, dpi: int, page_stats: Dict, ocr_errors: Dict) -> List[Dict]:
+    """
+    Serial render -> preprocess -> Tesseract -> fixes so each stage is timed on its own.
+    Adds each page's character edit distance to its source text to ocr_errors.
+    """
+    doc = fitz.open(stream=entry["bytes"], filetype="pdf")
+    page_texts = {}
+    for i in range(len(doc)):
+        start = time.perf_counter()
+        image = render_page(doc, i, dpi)
+        timer.add("render", time.perf_counter() - start, 1)
+
+        start = time.perf_counter()
+        processed, page_stats[(entry["name"], i)] = preprocess_page(image)
+        timer.add("preprocess", time.perf_counter() - start, 1)
+        truth = " ".join(entry["texts"][i].split())
+        ocr_errors["pages"] += 1
+        ocr_errors["chars"] += len(truth)
+        if processed is None:
+            # Blank page: never reaches Tesseract
+            ocr_errors["errors"] += len(truth)
+            continue
+
+        start = time.perf_counter()
+        text = pytesseract.image_to_string(processed, config=OCR_CONFIGS[0])
+        timer.add("tesseract", time.perf_counter() - start, 1)
+
+        start = time.perf_counter()
+        page_texts[i] = apply_bengali_fixes(text)
+        timer.add("bengali_fixes", time.perf_counter() - start, 1)
+        ocr_errors["errors"] += edit_distance(" ".join(page_texts[i].split()), truth)
+    doc.close()
+    return build_page_records(page_texts, {i: "ocr" for i in page_texts})
+
+
+def bench_parallel_ocr(corpus: List[Dict], dpi: int, workers: int) -> Dict:
+    """
+    Throughput of the production OCR pipeline (process pool, lazy rendering), no cache
+    """
+    scanned = [entry for entry in corpus if entry["scanned"]]
+    pages = sum(entry["pages"] for entry in scanned)
+    start = time.perf_counter()
+    for entry in scanned:
+        run_pdf_ocr(entry["bytes"], dpi=dpi, max_workers=workers)
+    seconds = time.perf_counter() - start
+    return {"workers": workers, "pages": pages, "seconds": seconds, "pages_per_second": pages / seconds if seconds else None}
+
+
+def is_hit(question: Dict, documents) -> bool:
+    for doc in documents:
+        page_start = doc.metadata.get("page_start") or 0
+        page_end = doc.metadata.get("page_end") or page_start
+        if doc.metadata.get("source") == question["source"] and page_start <= question["page"] <= page_end:
+            return True
+    return False
+
+
+def run_user(vectorstore, questions: List[Dict], args) -> List[Dict]:
+    """
+    One user: a chain with its own memory asking its questions in order
+    """
+    conversation = create_optimized_conversation_chain(
+        vectorstore,
+        llm=FakeChatModel(ttft_ms=args.llm_ttft_ms, tokens_per_second=args.llm_tokens_per_second, answer_tokens=args.answer_tokens),
+        condense_llm=FakeChatModel(ttft_ms=args.llm_ttft_ms, tokens_per_second=args.llm_tokens_per_second * 4, answer_tokens=20),
+    )
+    results = []
+    for question in questions:
+        handler = StreamingAnswerHandler(lambda token, text: None)
+        response = conversation({"question": question["question"]}, callbacks=[handler])
+        results.append(dict(handler.metrics(), hit=is_hit(question, response.get("source_documents", []))))
+    return results
+
+
+def bench_queries(vectorstore, questions: List[Dict], users: int, per_user: int, args) -> Dict:
+    assignments = [
+        [questions[(user * per_user + i) % len(questions)] for i in range(per_user)]
+        for user in range(users)
+    ]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        runs = list(executor.map(lambda assigned: run_user(vectorstore, assigned, args), assignments))
+    wall = time.perf_counter() - start
+
+    results = [result for run in runs for result in run]
+    return {
+        "users": users,
+        "queries": len(results),
+        "wall_seconds": wall,
+        "queries_per_second": len(results) / wall if wall else None,
+        "total": latency_summary([r["total_ms"] for r in results]),
+        "retrieval": latency_summary([r["retrieval_ms"] for r in results if r["retrieval_ms"] is not None]),
+        "ttft": latency_summary([r["ttft_ms"] for r in results if r["ttft_ms"] is not None]),
+        "retrieval_hit_rate": sum(r["hit"] for r in results) / len(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=10, help="pages per document")
+    parser.add_argument("--scanned", type=int, default=2, help="documents without a text layer")
+    parser.add_argument("--users", default="1,8,32", help="comma-separated concurrent user counts")
+    parser.add_argument("--questions", type=int, default=5, help="questions per user")
+    parser.add_argument("--skip-ocr", action="store_true", help="no scanned documents (no Tesseract needed)")
+    parser.add_argument("--ocr-workers", type=int, default=0, help="also time run_pdf_ocr with this many workers")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI)
+    parser.add_argument("--font", default=None, help="Bengali TTF font for the synthetic PDFs")
+    parser.add_argument("--index-type", default=None, help="FAISS index type (default: FAISS_INDEX_TYPE)")
+    parser.add_argument("--no-rerank", action="store_true", help="disable the cross-encoder stage")
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0, help="simulated latency per embedding call")
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.5)
+    parser.add_argument("--llm-ttft-ms", type=float, default=400.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    # Library code reports progress; keep the benchmark output to the summary
+    set_default_reporter(ProgressReporter())
+    if args.no_rerank:
+        CONFIG["RERANKER_MODEL"] = ""
+    user_counts = [int(value) for value in args.users.split(",") if value.strip()]
+    scanned_documents = 0 if args.skip_ocr else min(args.scanned, args.documents)
+    if scanned_documents:
+        try:
+            pytesseract.get_tesseract_version()
+        except pytesseract.TesseractNotFoundError:
+            parser.error(f"Tesseract not found at {pytesseract.pytesseract.tesseract_cmd} (TESSERACT_PATH); use --skip-ocr")
+
+    start = time.perf_counter()
+    corpus, questions = make_corpus(args.documents, args.pages, scanned_documents, find_bengali_font(args.font), args.seed)
+    generate_seconds = time.perf_counter() - start
+    total_pages = args.documents * args.pages
+    print(f"corpus: {args.documents} documents x {args.pages} pages ({scanned_documents} scanned), generated in {generate_seconds:.1f}s")
+
+    # Ingest, stage by stage
+    timer = StageTimer()
+    documents = []
+    page_stats = {}
+    ocr_errors = {"pages": 0, "chars": 0, "errors": 0}
+    for entry in corpus:
+        if entry["scanned"]:
+            pages = ingest_scanned_document(entry, timer, args.dpi, page_stats, ocr_errors)
+        else:
+            pages = ingest_text_document(entry, timer)
+        start = time.perf_counter()
+        documents.extend(smart_text_chunking(pages, entry["name"]))
+        timer.add("chunk", time.perf_counter() - start, entry["pages"])
+
+    embeddings = FakeEmbeddings(latency_ms=args.embed_latency_ms, per_text_ms=args.embed_per_text_ms)
+    batcher = BatchedEmbeddings(
+        embeddings,
+        batch_size=CONFIG["EMBEDDING_BATCH_SIZE"],
+        max_concurrency=CONFIG["EMBEDDING_MAX_CONCURRENCY"],
+    )
+    start = time.perf_counter()
+    vectors = batcher.embed_documents([doc.page_content for doc in documents])
+    timer.add("embed", time.perf_counter() - start, total_pages)
+
+    # Index build
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    vectorstore, build_info = build_vectorstore(documents, vectors, embeddings, args.index_type)
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    attach_sparse_index(vectorstore)
+    sparse_seconds = time.perf_counter() - start
+    timer.add("index", index_seconds + sparse_seconds, total_pages)
+
+    ingest = {"stages": timer.report(), "chunks": len(documents), "embedding_calls": embeddings.calls}
+    if page_stats:
+        ingest["preprocess"] = dict(summarize_page_stats(page_stats), adaptive=CONFIG["PREPROCESS_ADAPTIVE"])
+        # Character error rate against the source text: compare runs with and without PREPROCESS_ADAPTIVE
+        ingest["ocr_quality"] = character_error_rate(ocr_errors)
+    if args.ocr_workers and scanned_documents:
+        ingest["parallel_ocr"] = bench_parallel_ocr(corpus, args.dpi, args.ocr_workers)
+    index = {
+        "type": build_info.get("index_type"),
+        "vectors": len(vectors),
+        "build_seconds": index_seconds,
+        "sparse_build_seconds": sparse_seconds,
+        "rss_delta_mb": current_rss_mb() - rss_before,
+        "build_info": build_info,
+    }
+
+    for stage, entry in ingest["stages"].items():
+        rate = entry["pages_per_second"]
+        print(f"  {stage:<20} {entry['seconds']:8.2f}s  {rate:8.1f} pages/s" if rate else f"  {stage:<20} {entry['seconds']:8.2f}s")
+    if "ocr_quality" in ingest:
+        quality = ingest["ocr_quality"]
+        print(f"OCR: character error rate {quality['cer']:.3f} over {quality['pages']} pages "
+              f"(PREPROCESS_ADAPTIVE={CONFIG['PREPROCESS_ADAPTIVE']})")
+    print(f"index: {index['vectors']} vectors ({index['type']}) in {index_seconds:.2f}s, +{index['rss_delta_mb']:.0f} MB RSS")
+
+    # Concurrent queries
+    query = []
+    for users in user_counts:
+        result = bench_queries(vectorstore, questions, users, args.questions, args)
+        query.append(result)
+        total = result["total"]
+        print(f"users={users:<4} p50 {total['p50_ms']:7.0f} ms  p95 {total['p95_ms']:7.0f} ms  "
+              f"p99 {total['p99_ms']:7.0f} ms  {result['queries_per_second']:.1f} q/s  "
+              f"hit rate {result['retrieval_hit_rate']:.0%}")
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "process_peak_rss_mb": peak_rss_mb(),
+        },
+        "parameters": vars(args),
+        "corpus": {"documents": args.documents, "pages": total_pages, "scanned_documents": scanned_documents, "generate_seconds": generate_seconds},
+        "ingest": ingest,
+        "index": index,
+        "query": query,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
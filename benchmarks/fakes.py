@@ -0,0 +1,134 @@
+"""
+Offline stand-ins for the Azure OpenAI clients used by the benchmarks.
+Both are deterministic: the same input always gives the same output, so runs are
+comparable between releases. Latency is simulated with sleeps so throughput and
+concurrency behave like a remote API without needing one.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from vectorstore.sparse_index import tokenize_bengali
+
+ANSWER_VOCABULARY = (
+    "পাঠ্য বই এ বলা হয়েছে অনুপমের মামা তাহার চেয়ে বছর ছয়েক মাত্র বড়ো শিক্ষার্থীরা "
+    "প্রশ্নের উত্তর খুঁজে বের করবে এই তথ্য প্রদত্ত ডকুমেন্টে পাওয়া যায় গল্পের মূল বিষয়"
+).split()
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Bag-of-words random projection: every token maps to a fixed pseudo-random vector
+    and a text is the normalized sum of its tokens, so texts sharing words are close
+    (retrieval behaves sensibly) without any model. latency_ms is charged per call
+    plus per_text_ms per text, like a batched remote endpoint.
+    """
+
+    def __init__(self, dimension: int = 384, latency_ms: float = 0.0, per_text_ms: float = 0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.per_text_ms = per_text_ms
+        self._token_vectors: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.texts = 0
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            vector = np.random.default_rng(_seed(token)).standard_normal(self.dimension).astype(np.float32)
+            with self._lock:
+                self._token_vectors[token] = vector
+        return vector
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = tokenize_bengali(text) or [text]
+        vector = np.sum([self._token_vector(token) for token in tokens], axis=0)
+        vector /= np.linalg.norm(vector) or 1.0
+        return vector.tolist()
+
+    def _charge(self, count: int):
+        with self._lock:
+            self.calls += 1
+            self.texts += count
+        delay = (self.latency_ms + self.per_text_ms * count) / 1000
+        if delay > 0:
+            time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._charge(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._charge(1)
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with a deterministic sequence of words after a simulated
+    time to first token, then streams at tokens_per_second
+    """
+
+    ttft_ms: float = 400.0
+    tokens_per_second: float = 60.0
+    answer_tokens: int = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = np.random.default_rng(_seed(prompt))
+        return [ANSWER_VOCABULARY[i] + " " for i in rng.integers(0, len(ANSWER_VOCABULARY), self.answer_tokens)]
+
+    def _result(self, tokens: List[str]) -> ChatResult:
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content="".join(tokens).strip()))],
+            llm_output={"token_usage": {"completion_tokens": len(tokens)}},
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.ttft_ms / 1000)
+        for token in tokens:
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            time.sleep(1 / self.tokens_per_second)
+        return self._result(tokens)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.ttft_ms / 1000)
+        for token in tokens:
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            await asyncio.sleep(1 / self.tokens_per_second)
+        return self._result(tokens)
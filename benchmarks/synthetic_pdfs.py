@@ -0,0 +1,144 @@
+"""
+Synthetic Bengali PDFs for the benchmarks: text-layer documents and "scanned"
+copies (pages rasterized with paper noise, no text layer), plus questions whose
+answers are planted on known pages. Uses a Bengali TTF font when one is installed,
+otherwise MuPDF's built-in Noto Serif Bengali fallback; PyMuPDF's HTML layout
+shapes the conjuncts, so both variants look like real documents.
+"""
+
+import io
+import os
+import random
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/noto/NotoSansBengali-Regular.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansBengali-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSansBengali-Regular.ttf",
+    "/usr/share/fonts/truetype/lohit-bengali/Lohit-Bengali.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSerif.ttf",
+    "C:/Windows/Fonts/Nirmala.ttf",
+)
+
+PARAGRAPHS = (
+    "আজ আমার বয়স সাতাশ মাত্র। এ জীবনটা না দৈর্ঘ্যের হিসাবে বড়ো, না গুণের হিসাবে। তবু ইহার একটু বিশেষ মূল্য আছে।",
+    "ইহা সেই ফুলের মতো যাহার বুকের উপরে ভ্রমর আসিয়া বসিয়াছিল, এবং সেই পদক্ষেপের ইতিহাস তাহার জীবনের মাঝখানে ফলের মতো গুটি ধরিয়া উঠিয়াছে।",
+    "অনুপমের মামা তাহার চেয়ে বছর ছয়েক মাত্র বড়ো। শিক্ষার্থীরা প্রশ্নের উত্তর খুঁজে বের করবে।",
+    "বাংলা সাহিত্যের ইতিহাসে এই গল্পটি বিশেষ স্থান অধিকার করে আছে। লেখক সমাজের নানা দিক তুলে ধরেছেন।",
+    "বিবাহের আসরে কন্যার পিতা শম্ভুনাথ বাবু গহনা যাচাইয়ের ঘটনায় অপমানিত বোধ করেন এবং বিবাহ ভাঙিয়া দেন।",
+)
+NAMES = ("অনুপম", "কল্যাণী", "শম্ভুনাথ", "হরিশ", "বিনু", "মামা", "রমেশ", "সুমিতা")
+PLACES = ("কলকাতা", "কানপুর", "ঢাকা", "রাজশাহী", "চট্টগ্রাম", "সিলেট", "খুলনা", "বরিশাল")
+
+
+def find_bengali_font(path: Optional[str] = None) -> Optional[str]:
+    """
+    An installed Bengali font, or None for MuPDF's built-in fallback
+    """
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Font not found: {path}")
+        return path
+    for candidate in FONT_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def _page_content(rng: random.Random, document: int, page: int) -> Tuple[List[str], Dict]:
+    name = rng.choice(NAMES)
+    place = rng.choice(PLACES)
+    year = rng.randint(1890, 1990)
+    fact = f"{name} {year} সালে {place} গিয়েছিলেন।"
+    paragraphs = [rng.choice(PARAGRAPHS) for _ in range(6)]
+    paragraphs.insert(rng.randrange(len(paragraphs) + 1), fact)
+    question = {
+        "question": f"{name} {year} সালে কোথায় গিয়েছিলেন?",
+        "answer": place,
+        "document": document,
+        "page": page + 1,
+    }
+    return paragraphs, question
+
+
+def make_text_pdf(rng: random.Random, font_path: Optional[str], document: int, pages: int) -> Tuple[bytes, List[Dict], List[str]]:
+    """
+    Returns (pdf bytes, questions, source text of each page); the source text is the
+    ground truth for OCR error rates
+    """
+    css = "* {font-size: 13px; line-height: 1.5;}"
+    archive = None
+    if font_path:
+        archive = fitz.Archive(os.path.dirname(font_path))
+        css = (
+            f"@font-face {{font-family: bn; src: url({os.path.basename(font_path)});}} "
+            "* {font-family: bn; font-size: 13px; line-height: 1.5;}"
+        )
+    pdf = fitz.open()
+    questions = []
+    texts = []
+    for page_index in range(pages):
+        page = pdf.new_page(width=595, height=842)
+        paragraphs, question = _page_content(rng, document, page_index)
+        html = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+        page.insert_htmlbox(fitz.Rect(50, 50, 545, 792), html, css=css, archive=archive)
+        questions.append(question)
+        texts.append("\n".join(paragraphs))
+    data = pdf.tobytes(garbage=3, deflate=True)
+    pdf.close()
+    return data, questions, texts
+
+
+def rasterize_pdf(pdf_bytes: bytes, rng: random.Random, dpi: int = 200, noise: float = 12.0) -> bytes:
+    """
+    Image-only copy of a PDF: each page rendered to grayscale with sensor noise and specks
+    """
+    source = fitz.open(stream=pdf_bytes, filetype="pdf")
+    scanned = fitz.open()
+    noise_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    for page in source:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width).astype(np.float32)
+        pixels += noise_rng.normal(0, noise, pixels.shape)
+        specks = noise_rng.random(pixels.shape) < 0.0005
+        pixels[specks] = 0
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="PNG")
+        target = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        target.insert_image(target.rect, stream=buffer.getvalue())
+    data = scanned.tobytes(deflate=True)
+    source.close()
+    scanned.close()
+    return data
+
+
+def make_corpus(
+    documents: int,
+    pages_per_document: int,
+    scanned_documents: int,
+    font_path: Optional[str],
+    seed: int = 42,
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Returns ([{"name", "bytes", "scanned", "pages", "texts"}], questions). The first
+    scanned_documents documents are rasterized copies without a text layer; "texts"
+    holds each page's source text.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    questions = []
+    for document in range(documents):
+        data, document_questions, texts = make_text_pdf(rng, font_path, document, pages_per_document)
+        scanned = document < scanned_documents
+        if scanned:
+            data = rasterize_pdf(data, rng)
+        name = f"synthetic_{'scan' if scanned else 'text'}_{document:03d}.pdf"
+        for question in document_questions:
+            question["source"] = name
+        corpus.append({"name": name, "bytes": data, "scanned": scanned, "pages": pages_per_document, "texts": texts})
+        questions.extend(document_questions)
+    return corpus, questions
@@ -12,7 +12,97 @@ CONFIG = {
     "OPENAI_CHAT_API_VERSION": os.getenv("OPENAI_CHAT_API_VERSION"),
     "AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME": os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"),
     "OPENAI_EMBEDDING_API_VERSION": os.getenv("OPENAI_EMBEDDING_API_VERSION"),
-    "TESSERACT_PATH": "/opt/homebrew/bin/tesseract"
+    "TESSERACT_PATH": "/opt/homebrew/bin/tesseract",
+    # OCR worker processes (0 = one per CPU core)
+    "OCR_WORKERS": int(os.getenv("OCR_WORKERS", "0")),
+    "OCR_DPI": int(os.getenv("OCR_DPI", "400")),
+    # Adaptive preprocessing: skip blank pages, skip denoising on noise-free pages, optionally
+    # shrink large type (false = denoise every page at full size, as before)
+    "PREPROCESS_ADAPTIVE": os.getenv("PREPROCESS_ADAPTIVE", "true").lower() == "true",
+    # Estimated noise sigma (0-255 scale) above which a page is denoised. Even sigma ~1 turns
+    # into speckle after thresholding, so only clean pages (estimate ~0) should skip it
+    "PREPROCESS_DENOISE_SIGMA": float(os.getenv("PREPROCESS_DENOISE_SIGMA", "0.1")),
+    # Pages with less ink than this fraction of their area are treated as blank
+    "PREPROCESS_BLANK_INK_RATIO": float(os.getenv("PREPROCESS_BLANK_INK_RATIO", "0.0005")),
+    # Text components taller than this (pixels) are shrunk towards it, at most to 75%
+    # (0 = never; off by default, it did not hold OCR accuracy on large type)
+    "PREPROCESS_TARGET_GLYPH_PX": int(os.getenv("PREPROCESS_TARGET_GLYPH_PX", "0")),
+    # Page-level OCR cache (empty dir disables it)
+    "OCR_CACHE_DIR": os.getenv("OCR_CACHE_DIR", ".ocr_cache"),
+    "OCR_CACHE_MAX_MB": int(os.getenv("OCR_CACHE_MAX_MB", "512")),
+    # Persistent chunk embedding cache (empty dir disables it)
+    "EMBEDDING_CACHE_DIR": os.getenv("EMBEDDING_CACHE_DIR", ".embedding_cache"),
+    # Embedding batcher: batch size, concurrent requests, tokens/minute quota (0 = unlimited)
+    "EMBEDDING_BATCH_SIZE": int(os.getenv("EMBEDDING_BATCH_SIZE", "100")),
+    "EMBEDDING_MAX_CONCURRENCY": int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4")),
+    "EMBEDDING_TPM_LIMIT": int(os.getenv("EMBEDDING_TPM_LIMIT", "0")),
+    "EMBEDDING_MAX_RETRIES": int(os.getenv("EMBEDDING_MAX_RETRIES", "6")),
+    # Embedding backend: "azure" (Azure OpenAI) or "local" (sentence-transformers on CPU)
+    "EMBEDDING_BACKEND": os.getenv("EMBEDDING_BACKEND", "azure"),
+    "LOCAL_EMBEDDING_MODEL": os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"),
+    "LOCAL_EMBEDDING_RUNTIME": os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch"),  # "torch" or "onnx"
+    "LOCAL_EMBEDDING_ONNX_FILE": os.getenv("LOCAL_EMBEDDING_ONNX_FILE", ""),  # e.g. onnx/model_qint8_avx512_vnni.onnx
+    "LOCAL_EMBEDDING_BATCH_SIZE": int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64")),
+    "LOCAL_EMBEDDING_THREADS": int(os.getenv("LOCAL_EMBEDDING_THREADS", "0")),  # 0 = torch default
+    # FAISS index type: "auto" (by corpus size), "flat", "hnsw", "ivf_flat" or "ivf_pq"
+    "FAISS_INDEX_TYPE": os.getenv("FAISS_INDEX_TYPE", "auto"),
+    "FAISS_FLAT_MAX_VECTORS": int(os.getenv("FAISS_FLAT_MAX_VECTORS", "50000")),
+    "FAISS_HNSW_MAX_VECTORS": int(os.getenv("FAISS_HNSW_MAX_VECTORS", "500000")),
+    "FAISS_NPROBE": int(os.getenv("FAISS_NPROBE", "16")),
+    "FAISS_EF_SEARCH": int(os.getenv("FAISS_EF_SEARCH", "64")),
+    "FAISS_HNSW_M": int(os.getenv("FAISS_HNSW_M", "32")),
+    "FAISS_EF_CONSTRUCTION": int(os.getenv("FAISS_EF_CONSTRUCTION", "200")),
+    # Vector encoding for flat / hnsw / ivf_flat: "float32", "fp16" or "int8" (scalar quantized)
+    "FAISS_VECTOR_ENCODING": os.getenv("FAISS_VECTOR_ENCODING", "float32"),
+    # Re-rank k * factor compressed-index candidates with exact float32 distances (0 = off);
+    # the float32 copy this keeps is held in addition to the compressed codes
+    "FAISS_RERANK_FACTOR": int(os.getenv("FAISS_RERANK_FACTOR", "0")),
+    # Retrieval: "hybrid" (BM25 + dense, reciprocal rank fusion) or "dense" (MMR only)
+    "RETRIEVAL_MODE": os.getenv("RETRIEVAL_MODE", "hybrid"),
+    "RETRIEVAL_K": int(os.getenv("RETRIEVAL_K", "8")),
+    "RETRIEVAL_FETCH_K": int(os.getenv("RETRIEVAL_FETCH_K", "50")),
+    "RRF_K": int(os.getenv("RRF_K", "60")),
+    # Prompt context budget for retrieved passages (0 = pass retrieved chunks through unchanged)
+    "CONTEXT_TOKEN_BUDGET": int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000")),
+    "CONTEXT_TOKENIZER": os.getenv("CONTEXT_TOKENIZER", "o200k_base"),
+    # Cross-encoder re-ranking (empty RERANKER_MODEL disables it),
+    # e.g. cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+    "RERANKER_MODEL": os.getenv("RERANKER_MODEL", ""),
+    "RERANK_CANDIDATES": int(os.getenv("RERANK_CANDIDATES", "100")),
+    "RERANK_TOP_N": int(os.getenv("RERANK_TOP_N", "6")),
+    "RERANK_BATCH_SIZE": int(os.getenv("RERANK_BATCH_SIZE", "16")),
+    "RERANK_LATENCY_BUDGET_MS": float(os.getenv("RERANK_LATENCY_BUDGET_MS", "1500")),
+    # Answer cache shared across sessions (0 entries disables it)
+    "ANSWER_CACHE_MAX_ENTRIES": int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000")),
+    "ANSWER_CACHE_TTL_SECONDS": float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400")),
+    "ANSWER_CACHE_SIMILARITY": float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+    # Previous question/answer turns that must also match for a cached answer to be reused
+    "ANSWER_CACHE_CONTEXT_TURNS": int(os.getenv("ANSWER_CACHE_CONTEXT_TURNS", "1")),
+    # Chat memory: "buffer" (unbounded), "window" (last N turns), "token" or "summary"
+    "MEMORY_STRATEGY": os.getenv("MEMORY_STRATEGY", "window"),
+    "MEMORY_WINDOW_TURNS": int(os.getenv("MEMORY_WINDOW_TURNS", "4")),
+    "MEMORY_MAX_TOKENS": int(os.getenv("MEMORY_MAX_TOKENS", "1500")),
+    # Skip the condense-question LLM call for questions that don't refer to earlier turns
+    "CONDENSE_SHORT_CIRCUIT": os.getenv("CONDENSE_SHORT_CIRCUIT", "true").lower() == "true",
+    # Stream answer tokens into the page as they are generated
+    "STREAM_ANSWERS": os.getenv("STREAM_ANSWERS", "true").lower() == "true",
+    # HTTP query service (python -m service)
+    "SERVICE_HOST": os.getenv("SERVICE_HOST", "0.0.0.0"),
+    "SERVICE_PORT": int(os.getenv("SERVICE_PORT", "8080")),
+    # Questions answered at once; up to SERVICE_MAX_QUEUE more wait, the rest get 503
+    "SERVICE_MAX_CONCURRENCY": int(os.getenv("SERVICE_MAX_CONCURRENCY", "64")),
+    "SERVICE_MAX_QUEUE": int(os.getenv("SERVICE_MAX_QUEUE", "256")),
+    # Threads for FAISS / BM25 search, re-ranking and other blocking work
+    "SERVICE_SEARCH_THREADS": int(os.getenv("SERVICE_SEARCH_THREADS", "8")),
+    "SERVICE_REQUEST_TIMEOUT_SECONDS": float(os.getenv("SERVICE_REQUEST_TIMEOUT_SECONDS", "120")),
+    "SERVICE_SESSION_TTL_SECONDS": float(os.getenv("SERVICE_SESSION_TTL_SECONDS", "1800")),
+    "SERVICE_MAX_SESSIONS": int(os.getenv("SERVICE_MAX_SESSIONS", "10000")),
+    # Per-stage timing spans and counters (off = near-zero overhead)
+    "METRICS_ENABLED": os.getenv("METRICS_ENABLED", "false").lower() == "true",
+    # Also log every span as it finishes (verbose; for debugging a slow stage)
+    "METRICS_LOG_SPANS": os.getenv("METRICS_LOG_SPANS", "false").lower() == "true",
+    # Prometheus /metrics port for the Streamlit app and ingest CLI (0 = off; the HTTP service serves /metrics itself)
+    "METRICS_PORT": int(os.getenv("METRICS_PORT", "0"))
 }
 
 # Set Tesseract path if specified
@@ -1 +1,5 @@
-from .conversation_chain import create_optimized_conversation_chain
\ No newline at end of file
+from .conversation_chain import create_optimized_conversation_chain, retrieval_stats
+from .hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from .context_packer import PackedRetriever, count_tokens, pack_context
+from .reranker import RerankingRetriever, ScoreCache
+from .memory import CondenseQuestionGate, RollingSummaryMemory, create_memory
\ No newline at end of file
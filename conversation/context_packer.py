@@ -0,0 +1,133 @@
+"""
+Context Packer Module
+Turns ranked retrieval results into a prompt context that fits a token budget.
+Overlapping or adjacent chunks of the same document (smart_text_chunking overlaps
+them by 300 characters) are merged back into one passage so the overlap is sent
+once, and passages are added in rank order until the budget is full.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from config.config import CONFIG
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding(CONFIG["CONTEXT_TOKENIZER"])
+except Exception:  # tokenizer unavailable offline: fall back to a character estimate
+    _ENCODING = None
+
+# Chunks separated by at most this many characters (stripped whitespace) count as adjacent
+MAX_MERGE_GAP = 2
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // 3)
+
+
+def _merge_group(items: List[Tuple[int, Document]]) -> List[Tuple[int, Document]]:
+    """
+    Merge one source's (rank, chunk) items whose character spans overlap or touch
+    """
+    items = sorted(items, key=lambda item: item[1].metadata["start_index"])
+    merged = []
+    for rank, doc in items:
+        start, end = doc.metadata["start_index"], doc.metadata["end_index"]
+        if merged:
+            best_rank, current = merged[-1]
+            current_end = current.metadata["end_index"]
+            if start <= current_end + MAX_MERGE_GAP:
+                if end > current_end:
+                    tail = doc.page_content[max(0, current_end - start):]
+                    text = current.page_content + ("\n" if start > current_end else "") + tail
+                else:
+                    text = current.page_content
+                metadata = dict(current.metadata)
+                metadata["end_index"] = max(end, current_end)
+                metadata["merged_chunks"] = metadata.get("merged_chunks", 1) + 1
+                if "page_end" in doc.metadata:
+                    metadata["page_end"] = max(metadata.get("page_end", doc.metadata["page_end"]), doc.metadata["page_end"])
+                merged[-1] = (min(best_rank, rank), Document(page_content=text, metadata=metadata))
+                continue
+        merged.append((rank, doc))
+    return merged
+
+
+def merge_chunks(ranked: List[Tuple[int, Document]]) -> List[Document]:
+    """
+    Merge overlapping/adjacent chunks per source; passages come back in best-rank order
+    """
+    groups: Dict[str, List[Tuple[int, Document]]] = {}
+    passages = []
+    for rank, doc in ranked:
+        if "start_index" in doc.metadata and "end_index" in doc.metadata:
+            groups.setdefault(doc.metadata.get("source", "Unknown"), []).append((rank, doc))
+        else:
+            passages.append((rank, doc))
+    for items in groups.values():
+        passages.extend(_merge_group(items))
+    return [doc for _, doc in sorted(passages, key=lambda item: item[0])]
+
+
+def pack_context(documents: List[Document], token_budget: int) -> Tuple[List[Document], Dict]:
+    """
+    Greedily take chunks in rank order while the merged context stays within token_budget.
+    Returns the packed passages and token accounting for the query.
+    """
+    candidate_tokens = sum(count_tokens(doc.page_content) for doc in documents)
+    selected: List[Tuple[int, Document]] = []
+    packed: List[Document] = []
+    packed_tokens = 0
+
+    for rank, doc in enumerate(documents):
+        trial = merge_chunks(selected + [(rank, doc)])
+        tokens = sum(count_tokens(passage.page_content) for passage in trial)
+        if tokens <= token_budget:
+            selected.append((rank, doc))
+            packed, packed_tokens = trial, tokens
+
+    stats = {
+        "candidates": len(documents),
+        "candidate_tokens": candidate_tokens,
+        "chunks_used": len(selected),
+        "passages": len(packed),
+        "packed_tokens": packed_tokens,
+        "tokens_saved": candidate_tokens - packed_tokens,
+        "token_budget": token_budget,
+    }
+    return packed, stats
+
+
+class PackedRetriever(BaseRetriever):
+    """
+    Wraps a retriever so the chain receives budget-packed passages instead of raw chunks
+    """
+
+    retriever: BaseRetriever
+    token_budget: int = 3000
+    last_stats: Dict = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        with metrics.span("context.pack"):
+            packed, stats = pack_context(documents, self.token_budget)
+        self.last_stats = stats
+        metrics.count("chunks_total", stats["chunks_used"], stage="context")
+        metrics.count("context_tokens_total", stats["packed_tokens"])
+        logger.info(
+            "Packed %d/%d chunks into %d passages: %d tokens (saved %d of %d)",
+            stats["chunks_used"], stats["candidates"], stats["passages"],
+            stats["packed_tokens"], stats["tokens_saved"], stats["candidate_tokens"],
+        )
+        return packed
@@ -1,43 +1,121 @@
-import streamlit as st
+from functools import lru_cache
 from langchain_openai import AzureChatOpenAI
-from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
 from langchain.vectorstores import FAISS
 from config.config import CONFIG
+from telemetry.progress import get_reporter
+from telemetry.llm import LLMMetricsHandler
+from .hybrid_retriever import HybridRetriever
+from .context_packer import PackedRetriever
+from .reranker import RerankingRetriever, load_cross_encoder, open_score_cache
+from .memory import CondenseQuestionGate, create_memory
 
-def create_optimized_conversation_chain(vectorstore: FAISS) -> any:
+def create_retriever(vectorstore: FAISS, k: int):
     """
-    Create optimized conversation chain with FAISS retriever
+    Hybrid BM25 + dense retriever, or dense MMR for indexes without a sparse index
     """
-    st.info("🤖 Setting up optimized conversation chain...")
+    sparse_index = getattr(vectorstore, "sparse_index", None)
+    if CONFIG["RETRIEVAL_MODE"] == "hybrid" and sparse_index is not None:
+        get_reporter().info(f"🔀 Hybrid retrieval: BM25 + FAISS, top {k} after fusion")
+        return HybridRetriever(
+            vectorstore=vectorstore,
+            sparse_index=sparse_index,
+            k=k,
+            fetch_k=max(k, CONFIG["RETRIEVAL_FETCH_K"]),
+            rrf_k=CONFIG["RRF_K"]
+        )
     
-    llm = AzureChatOpenAI(
+    return vectorstore.as_retriever(
+        search_type="mmr",
+        search_kwargs={
+            "k": k,
+            "fetch_k": max(k, CONFIG["RETRIEVAL_FETCH_K"]), 
+            "lambda_mult": 0.6 
+        }
+    )
+
+def create_reranking_retriever(vectorstore: FAISS):
+    """
+    Retriever followed by the cross-encoder stage when RERANKER_MODEL is set
+    """
+    if not CONFIG["RERANKER_MODEL"]:
+        return create_retriever(vectorstore, CONFIG["RETRIEVAL_K"])
+    
+    try:
+        load_cross_encoder(CONFIG["RERANKER_MODEL"])
+    except Exception as e:
+        get_reporter().warning(f"⚠️ Re-ranker unavailable, using retriever order: {str(e)}")
+        return create_retriever(vectorstore, CONFIG["RETRIEVAL_K"])
+    
+    get_reporter().info(f"🎯 Re-ranking {CONFIG['RERANK_CANDIDATES']} candidates to top {CONFIG['RERANK_TOP_N']} with {CONFIG['RERANKER_MODEL']}")
+    return RerankingRetriever(
+        retriever=create_retriever(vectorstore, CONFIG["RERANK_CANDIDATES"]),
+        model_name=CONFIG["RERANKER_MODEL"],
+        top_n=CONFIG["RERANK_TOP_N"],
+        batch_size=CONFIG["RERANK_BATCH_SIZE"],
+        latency_budget_ms=CONFIG["RERANK_LATENCY_BUDGET_MS"],
+        cache=open_score_cache()
+    )
+
+def retrieval_stats(conversation) -> dict:
+    """
+    Per-stage stats of the last query, keyed by retriever stage class name
+    """
+    stats = {}
+    retriever = getattr(conversation, "retriever", None)
+    while retriever is not None:
+        if getattr(retriever, "last_stats", None):
+            stats[type(retriever).__name__] = retriever.last_stats
+        retriever = getattr(retriever, "retriever", None)
+    return stats
+
+def create_chat_llm(streaming: bool = False, max_tokens: int = 3000, role: str = "answer") -> AzureChatOpenAI:
+    return AzureChatOpenAI(
         azure_endpoint=CONFIG["AZURE_OPENAI_ENDPOINT"],
         api_key=CONFIG["AZURE_OPENAI_API_KEY"],
         azure_deployment=CONFIG["AZURE_OPENAI_DEPLOYMENT_NAME"],
         openai_api_version=CONFIG["OPENAI_CHAT_API_VERSION"],
         temperature=0.2,
-        max_tokens=3000,
+        max_tokens=max_tokens,
         top_p=0.85,
         frequency_penalty=0.0,
-        presence_penalty=0.0
+        presence_penalty=0.0,
+        streaming=streaming,
+        # Tokens and latency per role; records nothing unless METRICS_ENABLED
+        callbacks=[LLMMetricsHandler(role)]
     )
+
+@lru_cache(maxsize=None)
+def shared_chat_llm(streaming: bool = False, max_tokens: int = 3000, role: str = "answer") -> AzureChatOpenAI:
+    """
+    One client (and HTTP connection pool) per configuration, shared by every session's chain
+    """
+    return create_chat_llm(streaming=streaming, max_tokens=max_tokens, role=role)
+
+def create_optimized_conversation_chain(vectorstore: FAISS, memory=None, llm=None, condense_llm=None) -> any:
+    """
+    Create optimized conversation chain with FAISS retriever.
+    Pass the session's existing memory to rebuild the chain on a new index version
+    without losing the conversation; llm / condense_llm replace the pooled Azure
+    clients (e.g. offline stand-ins for benchmarks).
+    """
+    get_reporter().info("🤖 Setting up optimized conversation chain...")
     
-    memory = ConversationBufferMemory(
-        memory_key='chat_history',
-        return_messages=True,
-        output_key='answer'
-    )
+    # Only the answer LLM streams; question condensing and summaries use a separate,
+    # non-streaming client so their tokens never reach the page
+    llm = llm or shared_chat_llm(streaming=CONFIG["STREAM_ANSWERS"])
+    condense_llm = condense_llm or shared_chat_llm(streaming=False, max_tokens=512, role="condense")
     
-    retriever = vectorstore.as_retriever(
-        search_type="mmr",
-        search_kwargs={
-            "k": 50,
-            "fetch_k": 100, 
-            "lambda_mult": 0.6 
-        }
-    )
+    # Bounded history: it is re-sent to the condense-question call and the answer prompt.
+    # Memory is the only per-session state; the index and clients are shared.
+    if memory is None:
+        memory = create_memory(condense_llm)
+    
+    retriever = create_reranking_retriever(vectorstore)
+    if CONFIG["CONTEXT_TOKEN_BUDGET"] > 0:
+        # Overlapping chunks are merged and the context is cut to the token budget
+        retriever = PackedRetriever(retriever=retriever, token_budget=CONFIG["CONTEXT_TOKEN_BUDGET"])
 
     custom_template = """
     You are an expert assistant for analyzing Bengali documents. Answer questions based on the provided context.
@@ -94,12 +172,18 @@ def create_optimized_conversation_chain(vectorstore: FAISS) -> any:
     
     conversation_chain = ConversationalRetrievalChain.from_llm(
         llm=llm,
+        condense_question_llm=condense_llm,
         retriever=retriever,
         memory=memory,
         return_source_documents=True,
         verbose=False,
         combine_docs_chain_kwargs={"prompt": prompt}
     )
+    if CONFIG["CONDENSE_SHORT_CIRCUIT"]:
+        # Self-contained follow-up questions skip the condense-question LLM call
+        conversation_chain.question_generator = CondenseQuestionGate(
+            question_generator=conversation_chain.question_generator
+        )
     
-    st.success("✅ Optimized conversation chain with FAISS ready!")
+    get_reporter().success("✅ Optimized conversation chain with FAISS ready!")
     return conversation_chain
\ No newline at end of file
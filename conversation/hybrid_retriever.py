@@ -0,0 +1,59 @@
+"""
+Hybrid Retriever Module
+Dense FAISS search and BM25 keyword search fused with reciprocal rank fusion (RRF),
+so a small k still covers both semantic matches and exact Bengali names/terms.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from telemetry import metrics
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], rrf_k: int = 60) -> List[str]:
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (rrf_k + rank)
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever returning the top k chunks of the fused dense + BM25 rankings
+    """
+
+    vectorstore: FAISS
+    sparse_index: Any
+    k: int = 8
+    fetch_k: int = 50
+    rrf_k: int = 60
+
+    def dense_ids(self, query: str) -> List[str]:
+        with metrics.span("retrieval.embed_query"):
+            vector = np.asarray([self.vectorstore.embeddings.embed_query(query)], dtype=np.float32)
+        with metrics.span("retrieval.dense"):
+            _, positions = self.vectorstore.index.search(vector, self.fetch_k)
+        return [self.vectorstore.index_to_docstore_id[int(p)] for p in positions[0] if p >= 0]
+
+    def sparse_ids(self, query: str) -> List[str]:
+        with metrics.span("retrieval.sparse"):
+            return [doc_id for doc_id, _ in self.sparse_index.search(query, self.fetch_k)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        fused = reciprocal_rank_fusion([self.dense_ids(query), self.sparse_ids(query)], self.rrf_k)
+        documents = []
+        for doc_id in fused[:self.k]:
+            doc = self.vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                documents.append(doc)
+        metrics.count("chunks_total", len(documents), stage="retrieval")
+        return documents
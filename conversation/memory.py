@@ -0,0 +1,195 @@
+"""
+Conversation Memory Module
+Bounded chat memory for the retrieval chain, selected by CONFIG["MEMORY_STRATEGY"]:
+- "buffer": the full history (unbounded)
+- "window": the last N question/answer turns
+- "token": as many recent messages as fit a token limit
+- "summary": a rolling summary of older turns plus the last N turns, where the
+  summary is updated on a background thread after the answer has been returned
+  (turns stay verbatim until a summary covering them succeeds)
+Also provides the gate that skips the condense-question LLM call for questions
+that do not refer back to the conversation.
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from langchain.chains.base import Chain
+from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory, ConversationTokenBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.callbacks import AsyncCallbackManagerForChainRun, CallbackManagerForChainRun
+from langchain_core.messages import SystemMessage, get_buffer_string
+from pydantic import PrivateAttr
+
+from config.config import CONFIG
+from telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+MEMORY_STRATEGIES = ("buffer", "window", "token", "summary")
+
+# Summaries run off the request path; two workers are plenty for a handful of sessions each
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+SUMMARY_PROMPT = """Progressively summarize the conversation below, adding onto the previous summary.
+Keep names, page references and facts from the document; reply in the conversation's language.
+
+Previous summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+# Words that point back at earlier turns ("তিনি কোথায় গেলেন?", "what did he do?")
+_REFERRING_WORDS = {
+    "তিনি", "তাঁর", "তার", "তাকে", "তাঁকে", "তাদের", "তাঁদের", "তারা", "তাঁরা", "সে", "সেই",
+    "উনি", "ওনার", "ওর", "ওই", "ওখানে", "সেখানে", "তখন", "এটা", "ওটা", "এটি", "সেটা", "সেটি", "আর",
+    "he", "she", "it", "they", "him", "her", "his", "its", "them", "their", "this", "that",
+    "these", "those", "there", "then", "also", "more", "else",
+}
+_WORD_PATTERN = re.compile(r'[ঀ-৿]+|[^\W_]+')
+MIN_SELF_CONTAINED_WORDS = 3
+
+
+def is_self_contained(question: str) -> bool:
+    """
+    Heuristic: a question of a few words with no pronoun or back-reference can be
+    answered without rewriting it against the chat history
+    """
+    words = [word.lower() for word in _WORD_PATTERN.findall(question)]
+    if len(words) < MIN_SELF_CONTAINED_WORDS:
+        return False
+    return not any(word in _REFERRING_WORDS for word in words)
+
+
+class CondenseQuestionGate(Chain):
+    """
+    Stand-in for the chain's question generator: passes self-contained questions
+    through unchanged and only calls the condense LLM chain for follow-ups
+    """
+
+    question_generator: Chain
+    skipped: int = 0
+    condensed: int = 0
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["question", "chat_history"]
+
+    @property
+    def output_keys(self) -> List[str]:
+        return ["text"]
+
+    def _call(self, inputs: Dict[str, Any], run_manager: CallbackManagerForChainRun = None) -> Dict[str, str]:
+        if is_self_contained(inputs["question"]):
+            self.skipped += 1
+            metrics.count("condense_total", result="skipped")
+            return {"text": inputs["question"]}
+        self.condensed += 1
+        metrics.count("condense_total", result="condensed")
+        callbacks = run_manager.get_child() if run_manager else None
+        return {"text": self.question_generator.run(callbacks=callbacks, **inputs)}
+
+    async def _acall(self, inputs: Dict[str, Any], run_manager: AsyncCallbackManagerForChainRun = None) -> Dict[str, str]:
+        if is_self_contained(inputs["question"]):
+            self.skipped += 1
+            metrics.count("condense_total", result="skipped")
+            return {"text": inputs["question"]}
+        self.condensed += 1
+        metrics.count("condense_total", result="condensed")
+        callbacks = run_manager.get_child() if run_manager else None
+        return {"text": await self.question_generator.arun(callbacks=callbacks, **inputs)}
+
+
+class RollingSummaryMemory(BaseChatMemory):
+    """
+    Last max_recent_turns turns verbatim, everything older as an LLM summary that is
+    refreshed asynchronously so summarizing never delays an answer. chat_memory only
+    holds the turns no summary covers yet, so a failed summary loses nothing.
+    """
+
+    llm: Any
+    memory_key: str = "chat_history"
+    max_recent_turns: int = 4
+    summary: str = ""
+    summarized_messages: int = 0
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _pending: Any = PrivateAttr(default=None)
+    # Bumped by clear(), so a summary started before it is discarded
+    _generation: int = PrivateAttr(default=0)
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            summary = self.summary
+            unsummarized = list(self.chat_memory.messages)
+        messages = ([SystemMessage(content=f"Summary of earlier conversation: {summary}")] if summary else []) + unsummarized
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: get_buffer_string(messages)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self._schedule_summary()
+
+    def _schedule_summary(self):
+        with self._lock:
+            messages = self.chat_memory.messages
+            upto = len(messages) - 2 * self.max_recent_turns
+            if upto <= 0 or (self._pending is not None and not self._pending.done()):
+                return
+            new_lines = get_buffer_string(messages[:upto])
+            self._pending = _SUMMARY_EXECUTOR.submit(self._summarize, self.summary, new_lines, upto, self._generation)
+
+    def _summarize(self, summary: str, new_lines: str, upto: int, generation: int):
+        try:
+            result = self.llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(none)", new_lines=new_lines))
+        except Exception as e:
+            # The turns stay verbatim; the next saved turn retries
+            logger.warning("Conversation summary failed, keeping %d messages verbatim: %s", upto, e)
+            metrics.count("stage_errors_total", stage="memory.summary")
+            with self._lock:
+                self._pending = None
+            return
+        with self._lock:
+            self._pending = None
+            if generation != self._generation:
+                return
+            self.summary = getattr(result, "content", str(result))
+            # Only turns appended after the summarized ones remain
+            del self.chat_memory.messages[:upto]
+            self.summarized_messages += upto
+        # Turns added while this summary was running may already need the next one
+        self._schedule_summary()
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self.summary = ""
+            self.summarized_messages = 0
+            self._generation += 1
+
+
+def create_memory(llm, strategy: str = None) -> BaseChatMemory:
+    """
+    Chat memory for ConversationalRetrievalChain using the configured strategy
+    """
+    strategy = strategy or CONFIG["MEMORY_STRATEGY"]
+    common = {"memory_key": "chat_history", "return_messages": True, "output_key": "answer"}
+    if strategy == "buffer":
+        return ConversationBufferMemory(**common)
+    if strategy == "window":
+        return ConversationBufferWindowMemory(k=CONFIG["MEMORY_WINDOW_TURNS"], **common)
+    if strategy == "token":
+        return ConversationTokenBufferMemory(llm=llm, max_token_limit=CONFIG["MEMORY_MAX_TOKENS"], **common)
+    if strategy == "summary":
+        return RollingSummaryMemory(llm=llm, max_recent_turns=CONFIG["MEMORY_WINDOW_TURNS"], **common)
+    raise ValueError(f"Unknown MEMORY_STRATEGY: {strategy!r} (expected one of {MEMORY_STRATEGIES})")
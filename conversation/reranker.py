@@ -0,0 +1,142 @@
+"""
+Re-ranker Module
+Cross-encoder re-ranking between the retriever and the combine-docs chain: a small
+multilingual cross-encoder scores (question, chunk) pairs in CPU batches and keeps
+the best few. Scores are cached per (question, chunk_id), and when scoring runs
+past its latency budget the stage falls back to the retriever's own order.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from telemetry import metrics
+from vectorstore.embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def load_cross_encoder(model_name: str, max_length: int = 512):
+    """
+    One CPU cross-encoder per model name, shared by every chain in the process
+    """
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+
+class ScoreCache:
+    """
+    Thread-safe LRU of cross-encoder scores keyed by (normalized question, chunk_id)
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def put(self, key: Tuple[str, str], score: float):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def open_score_cache(max_entries: int = 50000) -> ScoreCache:
+    return ScoreCache(max_entries)
+
+
+def _chunk_key(doc: Document) -> str:
+    return doc.metadata.get("chunk_id") or normalize_text(doc.page_content)
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Retrieves candidates with the wrapped retriever and returns the top_n by cross-encoder score
+    """
+
+    retriever: BaseRetriever
+    model_name: str
+    top_n: int = 6
+    batch_size: int = 16
+    latency_budget_ms: float = 1500.0
+    cache: ScoreCache
+    last_stats: Dict = {}
+
+    def score(self, query: str, documents: List[Document], deadline: float) -> Tuple[Optional[List[float]], int]:
+        """
+        Scores for documents in order, or None if the deadline passed first; also returns cache hits
+        """
+        question = normalize_text(query)
+        keys = [(question, _chunk_key(doc)) for doc in documents]
+        scores = [self.cache.get(key) for key in keys]
+        hits = sum(score is not None for score in scores)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if not missing:
+            return scores, hits
+
+        model = load_cross_encoder(self.model_name)
+        for start in range(0, len(missing), self.batch_size):
+            if time.perf_counter() > deadline:
+                return None, hits
+            batch = missing[start:start + self.batch_size]
+            batch_scores = model.predict(
+                [(query, documents[i].page_content) for i in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.cache.put(keys[i], scores[i])
+        if time.perf_counter() > deadline:
+            # Scores are cached for next time, but this query already spent its budget
+            return None, hits
+        return scores, hits
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        start = time.perf_counter()
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        retrieved = time.perf_counter()
+
+        with metrics.span("rerank"):
+            scores, hits = self.score(query, documents, retrieved + self.latency_budget_ms / 1000)
+        metrics.cache_lookup("rerank", hits, len(documents) - hits)
+        if scores is None:
+            metrics.count("rerank_fallbacks_total")
+            ranked = documents
+        else:
+            order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+            ranked = [documents[i] for i in order]
+        finished = time.perf_counter()
+
+        self.last_stats = {
+            "candidates": len(documents),
+            "kept": min(self.top_n, len(ranked)),
+            "cache_hits": hits,
+            "fallback": scores is None,
+            "retrieve_ms": (retrieved - start) * 1000,
+            "rerank_ms": (finished - retrieved) * 1000,
+        }
+        logger.info(
+            "Re-ranked %d candidates in %.0f ms (retrieval %.0f ms, %d cached%s)",
+            len(documents), self.last_stats["rerank_ms"], self.last_stats["retrieve_ms"], hits,
+            ", budget exceeded: vector order" if scores is None else "",
+        )
+        return ranked[:self.top_n]
@@ -0,0 +1 @@
+from .pipeline import find_pdfs, ingest_directory
\ No newline at end of file
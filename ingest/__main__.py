@@ -0,0 +1,62 @@
+"""
+Headless ingestion CLI: builds or updates the index the app loads (./faiss_index),
+so run it from the app's directory with the same .env.
+
+Usage: python -m ingest <pdf_dir> [--method hybrid|ocr] [--rebuild] [--progress log|tqdm|json] [--metrics]
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+from config.config import CONFIG
+from telemetry import metrics
+from telemetry.progress import REPORTERS, create_reporter, use_reporter
+
+from .pipeline import CHECKPOINT_DIR, EXTRACTION_METHODS, ingest_directory
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ingest", description="Bulk-ingest a directory of PDFs into the FAISS index")
+    parser.add_argument("pdf_dir", help="directory of PDFs (searched recursively)")
+    parser.add_argument("--method", choices=EXTRACTION_METHODS, default="hybrid",
+                        help="hybrid: text layer where usable, OCR for the rest; ocr: OCR every page")
+    parser.add_argument("--rebuild", action="store_true", help="build a new index instead of updating the existing one")
+    parser.add_argument("--no-recursive", action="store_true", help="only PDFs directly inside pdf_dir")
+    parser.add_argument("--progress", choices=[name for name in REPORTERS if name != "streamlit"], default="log")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR, help="where extracted pages are checkpointed per document")
+    parser.add_argument("--keep-checkpoints", action="store_true", help="keep checkpoints after the document is indexed")
+    parser.add_argument("--ocr-workers", type=int, default=None, help="OCR processes (default: OCR_WORKERS)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record per-stage timings and counters (as METRICS_ENABLED) and add them to the summary")
+    args = parser.parse_args(argv)
+
+    # Logs go to stderr so --progress json leaves stdout as pure JSON lines
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s", stream=sys.stderr)
+    if args.metrics:
+        metrics.set_enabled(True)
+    if metrics.enabled() and CONFIG["METRICS_PORT"]:
+        metrics.start_metrics_server(CONFIG["METRICS_PORT"])
+
+    with use_reporter(create_reporter(args.progress)) as report:
+        try:
+            summary = ingest_directory(
+                args.pdf_dir,
+                method=args.method,
+                rebuild=args.rebuild,
+                recursive=not args.no_recursive,
+                checkpoint_dir=args.checkpoint_dir,
+                max_workers=args.ocr_workers,
+                keep_checkpoints=args.keep_checkpoints,
+            )
+        except Exception as e:
+            report.error(f"❌ Ingestion failed: {str(e)}")
+            return 2
+        if args.progress != "json":
+            print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
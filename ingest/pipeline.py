@@ -0,0 +1,196 @@
+"""
+Batch Ingestion Module
+Headless bulk ingestion of a directory of PDFs into the index the app loads.
+
+Every document's extracted pages are checkpointed as soon as extraction finishes,
+keyed by content hash and extraction method, so an interrupted run resumes without
+re-running OCR. Documents already in the index with the same content hash are
+skipped. When adding to an existing index each document is upserted (its delta is
+the durable checkpoint); a fresh build embeds everything at the end so the index
+type is chosen for the full corpus, with the embedding cache making a retry cheap.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from pdf_processing.chunking import smart_text_chunking
+from pdf_processing.extraction import enhanced_ocr_extraction, extract_hybrid_text
+from vectorstore.faiss_vectorstore import INDEX_PATH, create_faiss_vectorstore, load_existing_faiss_index, update_faiss_index
+from vectorstore.incremental import hash_content, is_unchanged, load_manifest
+from telemetry import metrics
+from telemetry.progress import get_reporter
+from vectorstore.index_store import has_saved_index
+
+CHECKPOINT_DIR = "ingest_checkpoints"
+EXTRACTION_METHODS = ("hybrid", "ocr")
+
+
+def find_pdfs(root: str, recursive: bool = True) -> List[str]:
+    """
+    Sorted PDF paths under root
+    """
+    if not recursive:
+        return sorted(
+            os.path.join(root, name) for name in os.listdir(root)
+            if name.lower().endswith(".pdf") and os.path.isfile(os.path.join(root, name))
+        )
+    return sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(root)
+        for name in names if name.lower().endswith(".pdf")
+    )
+
+
+def _source_names(paths: List[str]) -> Dict[str, str]:
+    """
+    Map path -> source name. Sources are file names, as for uploads in the app,
+    so a file ingested here is recognized as unchanged when uploaded there.
+    """
+    sources = {}
+    seen = {}
+    for path in paths:
+        name = os.path.basename(path)
+        if name in seen:
+            raise ValueError(f"Duplicate file name {name!r}: {seen[name]} and {path}")
+        seen[name] = path
+        sources[path] = name
+    return sources
+
+
+def _checkpoint_path(checkpoint_dir: str, content_hash: str, method: str) -> str:
+    return os.path.join(checkpoint_dir, f"{content_hash}-{method}.json")
+
+
+def load_checkpoint(path: str) -> Optional[List[Dict]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        # A torn or foreign file is just a missing checkpoint
+        return None
+
+
+def save_checkpoint(path: str, source: str, pages: List[Dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "created": time.time(), "pages": pages}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def extract_pages(pdf_bytes: bytes, source: str, method: str, max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    "hybrid" matches the app's "Direct + OCR Fallback", "ocr" its "OCR Only"
+    """
+    if method == "hybrid":
+        return extract_hybrid_text(pdf_bytes, source, max_workers)
+    return enhanced_ocr_extraction(pdf_bytes, source, max_workers)
+
+
+def ingest_directory(
+    root: str,
+    method: str = "hybrid",
+    rebuild: bool = False,
+    recursive: bool = True,
+    checkpoint_dir: str = CHECKPOINT_DIR,
+    max_workers: Optional[int] = None,
+    keep_checkpoints: bool = False,
+) -> Dict:
+    """
+    Extract, chunk, embed and index every PDF under root into INDEX_PATH.
+    Returns a summary with the sources that were indexed, skipped and failed.
+    """
+    if method not in EXTRACTION_METHODS:
+        raise ValueError(f"Unknown extraction method: {method!r} (expected one of {EXTRACTION_METHODS})")
+    report = get_reporter()
+    started = time.perf_counter()
+    paths = find_pdfs(root, recursive)
+    sources = _source_names(paths)
+
+    vectorstore = None
+    if not rebuild and os.path.exists(INDEX_PATH):
+        vectorstore = load_existing_faiss_index()
+        if vectorstore is None:
+            raise RuntimeError(f"Existing index at {INDEX_PATH} could not be loaded; rerun with rebuild to replace it")
+    manifest = load_manifest(INDEX_PATH) if vectorstore is not None else {}
+
+    summary = {"documents": len(paths), "indexed": [], "unchanged": [], "failed": [], "resumed": [], "chunks": 0, "pages": 0}
+    report.event("start", f"Ingesting {len(paths)} PDFs from {root}", documents=len(paths), method=method, rebuild=rebuild)
+
+    pending = []
+    content_hashes = {}
+    checkpoints = []
+    for position, path in enumerate(paths, 1):
+        source = sources[path]
+        document_start = time.perf_counter()
+        try:
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+            content_hash = hash_content(pdf_bytes)
+            if vectorstore is not None and is_unchanged(manifest, source, content_hash):
+                summary["unchanged"].append(source)
+                report.event("document", source=source, status="unchanged", position=position, total=len(paths))
+                continue
+
+            checkpoint = _checkpoint_path(checkpoint_dir, content_hash, method)
+            pages = load_checkpoint(checkpoint)
+            if pages is not None:
+                summary["resumed"].append(source)
+            else:
+                report.info(f"📖 Processing: {source}")
+                with metrics.span("ingest.extract", method=method):
+                    pages = extract_pages(pdf_bytes, source, method, max_workers)
+                if not pages:
+                    raise ValueError("no text extracted")
+                save_checkpoint(checkpoint, source, pages)
+
+            documents = smart_text_chunking(pages, source)
+            if not documents:
+                raise ValueError("no chunks after splitting")
+            if vectorstore is not None:
+                update_faiss_index(vectorstore, source, content_hash, documents)
+                if not keep_checkpoints:
+                    os.remove(checkpoint)
+            else:
+                pending.extend(documents)
+                content_hashes[source] = content_hash
+                checkpoints.append(checkpoint)
+        except Exception as e:
+            summary["failed"].append({"source": source, "error": str(e)})
+            report.error(f"❌ {source}: {str(e)}")
+            report.event("document", source=source, status="failed", error=str(e), position=position, total=len(paths))
+            continue
+
+        summary["indexed"].append(source)
+        summary["chunks"] += len(documents)
+        summary["pages"] += len(pages)
+        report.event(
+            "document", source=source, status="indexed" if vectorstore is not None else "extracted",
+            pages=len(pages), chunks=len(documents), resumed=source in summary["resumed"],
+            seconds=round(time.perf_counter() - document_start, 3), position=position, total=len(paths)
+        )
+
+    if vectorstore is None and pending:
+        create_faiss_vectorstore(pending, content_hashes)
+        saved = load_manifest(INDEX_PATH)
+        if not has_saved_index(INDEX_PATH) or not all(is_unchanged(saved, source, content_hash) for source, content_hash in content_hashes.items()):
+            raise RuntimeError(f"Index was built but could not be saved to {INDEX_PATH}; checkpoints kept for the next run")
+        if not keep_checkpoints:
+            for checkpoint in checkpoints:
+                if os.path.exists(checkpoint):
+                    os.remove(checkpoint)
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    summary["index_sources"] = len(load_manifest(INDEX_PATH))
+    if metrics.enabled():
+        summary["metrics"] = metrics.snapshot()
+        metrics.log_summary("ingest")
+    report.event(
+        "finish", f"Indexed {len(summary['indexed'])}, unchanged {len(summary['unchanged'])}, failed {len(summary['failed'])}",
+        **{key: summary[key] for key in ("chunks", "pages", "seconds", "index_sources")}
+    )
+    return summary
@@ -1,17 +1,25 @@
 import streamlit as st
 import os
-import shutil
-from pdf_processing.extraction import extract_direct_text_advanced, enhanced_ocr_extraction
+import uuid
+from pdf_processing.extraction import enhanced_ocr_extraction, extract_hybrid_text, join_pages
 from pdf_processing.chunking import smart_text_chunking
-from vectorstore.faiss_vectorstore import create_faiss_vectorstore, load_existing_faiss_index
+from vectorstore.faiss_vectorstore import (
+    create_faiss_vectorstore, indexed_sources, load_existing_faiss_index,
+    remove_from_faiss_index, update_faiss_index
+)
+from vectorstore.incremental import hash_content, index_version, is_unchanged, load_manifest
+from vectorstore.embeddings import BackendMismatchError, is_backend_configured
+from vectorstore.shared_index import SessionHandle, open_shared_index
 from conversation.conversation_chain import create_optimized_conversation_chain
-from query.query_handler import handle_user_query
+from query.query_handler import get_answer_cache, handle_user_query
 from templates.htmlTemplates import css, bot_template, user_template
 from config.config import CONFIG
+from telemetry import metrics
 
-def process_pdf_intelligently(pdf_file, processing_method: str) -> str:
+def process_pdf_intelligently(pdf_file, processing_method: str) -> list:
     """
-    Intelligent PDF processing with fallback strategies
+    Intelligent PDF processing with per-page routing between direct text and OCR.
+    Returns page records ({"page", "text", "method"}).
     """
     pdf_name = pdf_file.name
     pdf_file.seek(0)
@@ -19,19 +27,41 @@ def process_pdf_intelligently(pdf_file, processing_method: str) -> str:
     
     st.info(f"🔍 Analyzing {pdf_name}...")
     
-    direct_text = extract_direct_text_advanced(pdf_bytes)
-    
     if processing_method == "Direct + OCR Fallback":
-        if len(direct_text.strip()) > 200:
-            st.success(f"✅ Using direct text extraction for {pdf_name}")
-            return direct_text
-        else:
-            st.info(f"📸 Falling back to OCR for {pdf_name}")
-            return enhanced_ocr_extraction(pdf_bytes, pdf_name)
+        # Each page uses its text layer when usable; only scanned/garbage pages are OCR'd
+        return extract_hybrid_text(pdf_bytes, pdf_name)
     else:
         st.info(f"📸 Using OCR extraction for {pdf_name}")
         return enhanced_ocr_extraction(pdf_bytes, pdf_name)
 
+def invalidate_answer_cache():
+    """
+    Drop cached answers built against an older version of the index
+    """
+    cache = get_answer_cache()
+    if cache is not None:
+        dropped = cache.invalidate(keep_index_version=index_version("faiss_index"))
+        if dropped:
+            st.info(f"♻️ Cleared {dropped} cached answers from the previous index")
+
+def attach_shared_index(memory=None) -> bool:
+    """
+    Point this session at the process-wide index; only the chain and its memory are per session
+    """
+    try:
+        vectorstore = open_shared_index().attach(st.session_state.index_session)
+    except BackendMismatchError as e:
+        # Never query an index embedded with another model, not even the previous version
+        st.session_state.conversation = None
+        st.session_state.vectorstore = None
+        st.error(f"❌ {str(e)}")
+        return False
+    if vectorstore is None:
+        return False
+    st.session_state.vectorstore = vectorstore
+    st.session_state.conversation = create_optimized_conversation_chain(vectorstore, memory=memory)
+    return True
+
 def main():
     st.set_page_config(
         page_title="FAISS Bengali PDF Chat", 
@@ -39,6 +69,9 @@ def main():
         layout="centered"
     )
     st.write(css, unsafe_allow_html=True)
+    if metrics.enabled() and CONFIG["METRICS_PORT"]:
+        # Started once per process; every session's queries land in the same registry
+        metrics.start_metrics_server(CONFIG["METRICS_PORT"])
 
     if "conversation" not in st.session_state:
         st.session_state.conversation = None
@@ -48,6 +81,15 @@ def main():
         st.session_state.processed_docs = 0
     if "vectorstore" not in st.session_state:
         st.session_state.vectorstore = None
+    if "query_metrics" not in st.session_state:
+        st.session_state.query_metrics = []
+    if "index_session" not in st.session_state:
+        st.session_state.index_session = SessionHandle(uuid.uuid4().hex)
+    
+    shared_index = open_shared_index()
+    if st.session_state.conversation and shared_index.is_stale(st.session_state.index_session):
+        # Another session updated the index: switch to the new version, keeping this conversation
+        attach_shared_index(memory=st.session_state.conversation.memory)
 
     st.header("🚀 10MS ChatBot")
     st.markdown("*Ultra-fast retrieval for large Bengali documents*")
@@ -74,6 +116,14 @@ def main():
 
     if st.session_state.chat_history:
         st.divider()
+        last = st.session_state.query_metrics[-1] if st.session_state.query_metrics else None
+        if last and last["cached"]:
+            st.caption("⚡ Last answer served from the answer cache")
+        elif last and last["ttft_ms"] is not None:
+            st.caption(
+                f"⏱️ Last answer: first token after {last['ttft_ms']:.0f} ms, "
+                f"generation {last['generation_ms'] or 0:.0f} ms, total {last['total_ms']:.0f} ms"
+            )
         for message in reversed(st.session_state.chat_history):
             if message.type == "human":
                 st.write(user_template.replace("{{MSG}}", message.content), unsafe_allow_html=True)
@@ -87,7 +137,7 @@ def main():
             ("Azure Endpoint", CONFIG["AZURE_OPENAI_ENDPOINT"]),
             ("API Key", CONFIG["AZURE_OPENAI_API_KEY"]),
             ("Chat Model", CONFIG["AZURE_OPENAI_DEPLOYMENT_NAME"]),
-            ("Embedding Model", CONFIG["AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"])
+            (f"Embedding Model ({CONFIG['EMBEDDING_BACKEND']})", is_backend_configured())
         ]
         
         all_configured = True
@@ -101,18 +151,45 @@ def main():
             st.write(f"📊 Processed: {st.session_state.processed_docs} documents")
             st.write("🗃️ Vector Store: FAISS")
         
+        index_stats = shared_index.stats()
+        if index_stats["loaded"]:
+            per_session = index_stats["rss_per_additional_session_mb"]
+            st.caption(
+                f"🧮 Shared index: {index_stats['chunks']} chunks, {index_stats['sessions']} sessions, "
+                f"RSS {index_stats['rss_mb']:.0f} MB"
+                + (f", ~{per_session:.1f} MB per additional session" if per_session is not None else "")
+            )
+        
         if os.path.exists("faiss_index") and not st.session_state.conversation:
             if st.button("📂 Load Existing Index", help="Load previously created FAISS index"):
                 try:
-                    vectorstore = load_existing_faiss_index()
-                    if vectorstore:
-                        st.session_state.vectorstore = vectorstore
-                        st.session_state.conversation = create_optimized_conversation_chain(vectorstore)
+                    if attach_shared_index():
                         st.success("✅ Existing FAISS index loaded!")
                         st.rerun()
                 except Exception as e:
                     st.error(f"Failed to load existing index: {str(e)}")
         
+        if os.path.exists("faiss_index"):
+            sources = indexed_sources()
+            if sources:
+                with st.expander("🗂️ Indexed Documents"):
+                    source_to_remove = st.selectbox("Document", sources)
+                    if st.button("🗑️ Remove from Index"):
+                        # The shared instance is read-only: edit a private copy, then publish it
+                        try:
+                            with shared_index.write_lock:
+                                vectorstore = load_existing_faiss_index()
+                                removed = vectorstore is not None and remove_from_faiss_index(vectorstore, source_to_remove)
+                                if removed:
+                                    shared_index.publish(vectorstore)
+                        except BackendMismatchError as e:
+                            st.error(f"❌ {str(e)}")
+                            removed = False
+                        if removed:
+                            invalidate_answer_cache()
+                            memory = st.session_state.conversation.memory if st.session_state.conversation else None
+                            attach_shared_index(memory=memory)
+        
         st.divider()
         
         st.subheader("📁 Document Upload")
@@ -137,53 +214,78 @@ def main():
         processing_method = st.selectbox(
             label="",
             options=["OCR Only", "Direct + OCR Fallback"],
-            help="Direct: Try text extraction first. OCR: Process as images."
+            help="Direct: Use each page's text layer and OCR only pages without one. OCR: Process every page as an image."
+        )
+        
+        rebuild_index = st.checkbox(
+            "Rebuild index from scratch",
+            value=False,
+            help="Otherwise new or changed files are added to the existing index and unchanged files are skipped"
         )
         
         process_button_disabled = not pdf_files or not all_configured
         
         if st.button("🚀 START PROCESS", type="primary", disabled=process_button_disabled):
             if not all_configured:
-                st.error("❌ Please configure all Azure OpenAI settings!")
+                st.error("❌ Please configure all Azure OpenAI and embedding settings!")
                 return
             
             st.session_state.conversation = None
             st.session_state.chat_history = []
+            st.session_state.query_metrics = []
             st.session_state.processed_docs = 0
-            st.session_state.vectorstore = None
             
-            if os.path.exists("faiss_index"):
-                try:
-                    shutil.rmtree("faiss_index")
-                    st.info("🗑️ Cleared existing FAISS index")
-                except:
-                    pass
+            st.session_state.vectorstore = None
             
-            with st.spinner("🔄 Processing "):
+            # One writer at a time; it edits a private copy while other sessions keep querying the shared one
+            with shared_index.write_lock, st.spinner("🔄 Processing "):
+                vectorstore = None
+                if not rebuild_index and os.path.exists("faiss_index"):
+                    try:
+                        vectorstore = load_existing_faiss_index()
+                    except BackendMismatchError as e:
+                        # Falling through would build a new index from these files only
+                        st.error(f"❌ {str(e)} Tick 'Rebuild index from scratch' to re-embed every document.")
+                        return
+                manifest = load_manifest("faiss_index") if vectorstore else {}
+                
                 try:
                     all_documents = []
+                    content_hashes = {}
                     
                     for pdf_file in pdf_files:
+                        content_hash = hash_content(pdf_file.getvalue())
+                        if vectorstore and is_unchanged(manifest, pdf_file.name, content_hash):
+                            # Same bytes as the indexed copy: skip extraction and embedding entirely
+                            st.info(f"⏭️ {pdf_file.name} is unchanged, skipping")
+                            continue
+                        
                         st.info(f"📖 Processing: {pdf_file.name}")
                         
-                        extracted_text = process_pdf_intelligently(pdf_file, processing_method)
-                        st.write(extracted_text,height=500)
+                        pages = process_pdf_intelligently(pdf_file, processing_method)
+                        st.write(join_pages(pages),height=500)
                         
-                        if not extracted_text.strip():
+                        if not pages:
                             st.warning(f"⚠️ No text extracted from {pdf_file.name}")
                             continue
                         
-                        documents = smart_text_chunking(extracted_text, pdf_file.name)
-                        all_documents.extend(documents)
+                        documents = smart_text_chunking(pages, pdf_file.name)
+                        if vectorstore:
+                            update_faiss_index(vectorstore, pdf_file.name, content_hash, documents)
+                        else:
+                            all_documents.extend(documents)
+                            content_hashes[pdf_file.name] = content_hash
                     
-                    if not all_documents:
-                        st.error("❌ No processable content found!")
-                        return
+                    if not vectorstore:
+                        if not all_documents:
+                            st.error("❌ No processable content found!")
+                            return
+                        vectorstore = create_faiss_vectorstore(all_documents, content_hashes)
                     
-                    vectorstore = create_faiss_vectorstore(all_documents)
-                    st.session_state.vectorstore = vectorstore
-                    st.session_state.conversation = create_optimized_conversation_chain(vectorstore)
-                    st.session_state.processed_docs = len(pdf_files)
+                    shared_index.publish(vectorstore)
+                    invalidate_answer_cache()
+                    attach_shared_index()
+                    st.session_state.processed_docs = len(indexed_sources()) or len(pdf_files)
                     
                     st.success("🎉 Processing complete!")
                     st.balloons()
@@ -1,3 +1,5 @@
-from .extraction import clean_extracted_text, enhanced_ocr_extraction, extract_direct_text_advanced
-from .preprocessing import preprocess_image_advanced
-from .chunking import smart_text_chunking
\ No newline at end of file
+from .extraction import clean_extracted_text, enhanced_ocr_extraction, extract_direct_text_advanced, extract_hybrid_text, join_pages
+from .preprocessing import preprocess_image_advanced, preprocess_page
+from .chunking import smart_text_chunking, split_marked_pages
+from .ocr_engine import ocr_page, ocr_page_image, run_parallel_ocr, run_pdf_ocr
+from .ocr_cache import OCRCache, open_ocr_cache
\ No newline at end of file
@@ -3,6 +3,12 @@ Bengali Text Fixes Module
 Contains comprehensive fixes for Bengali OCR spacing errors and text normalization.
 """
 
+import hashlib
+import json
+import re
+import unicodedata
+from functools import lru_cache
+
 # Comprehensive Bengali OCR fixes dictionary
 BENGALI_FIXES = {
     # ============= VOWEL SIGNS WITH NUKTA (়) =============
@@ -79,11 +85,167 @@ BENGALI_FIXES = {
     ' ্': '্', '্ ': '্', ' ়': '়', '় ': '়',
 }
 
+# Hash of the fix table (order matters); part of every OCR cache key, since cached
+# page texts already have the fixes applied
+BENGALI_FIXES_VERSION = hashlib.sha256(
+    json.dumps(list(BENGALI_FIXES.items()), ensure_ascii=False).encode("utf-8")
+).hexdigest()[:16]
+
+
+def _apply_bengali_fixes_sequential(text: str) -> str:
+    """
+    Reference implementation: one str.replace pass per BENGALI_FIXES entry, in order.
+    Kept as the semantic definition the compiled matcher must reproduce.
+    """
+    if not text:
+        return text
+        
+    fixed_text = text
+    
+    # Apply all fixes from the dictionary
+    for incorrect, correct in BENGALI_FIXES.items():
+        fixed_text = fixed_text.replace(incorrect, correct)
+    
+    return fixed_text
+
+
+def _compile_space_fixes(fixes: dict):
+    """
+    Compile the fixes into (left, width, right, new_width) space-deletion passes.
+    
+    Every fix has the shape left + spaces + right -> left + fewer spaces + right, so the
+    sequential replace loop only ever shortens runs of spaces. Returns None if a fix does
+    not fit that shape, in which case the sequential implementation is used.
+    """
+    passes = []
+    for incorrect, correct in fixes.items():
+        first, last = incorrect.find(' '), incorrect.rfind(' ')
+        if first < 0:
+            return None
+        left, gap, right = incorrect[:first], incorrect[first:last + 1], incorrect[last + 1:]
+        if gap.strip(' ') or len(correct) < len(left) + len(right):
+            return None
+        if not (correct.startswith(left) and correct.endswith(right)):
+            return None
+        new_gap = correct[len(left):len(correct) - len(right)]
+        if new_gap.strip(' ') or len(new_gap) >= len(gap):
+            return None
+        passes.append((left, len(gap), right, len(new_gap)))
+    return passes
+
+
+def _compile_gap_pattern(passes):
+    """
+    Regex matching exactly the maximal space runs that at least one pass can touch
+    """
+    def char_class(chars):
+        return '[%s]' % ''.join(re.escape(c) for c in sorted(chars))
+    
+    free_widths = [width for left, width, right, _ in passes if not left and not right]
+    left_only = {left[-1] for left, _, right, _ in passes if left and not right}
+    right_only = {right[0] for left, _, right, _ in passes if right and not left}
+    both = {(left[-1], right[0]) for left, _, right, _ in passes if left and right}
+    
+    alternatives = []
+    if free_widths:
+        alternatives.append(' {%d,}' % min(free_widths))
+    if left_only:
+        alternatives.append('(?<=%s) +' % char_class(left_only))
+    if right_only:
+        alternatives.append(' +(?=%s)' % char_class(right_only))
+    # Runs needing context on both sides, unless already covered by a one-sided class
+    both = {(before, after) for before, after in both if before not in left_only and after not in right_only}
+    for before in sorted({before for before, _ in both}):
+        afters = {after for b, after in both if b == before}
+        alternatives.append('(?<=%s) +(?=%s)' % (re.escape(before), char_class(afters)))
+    return re.compile('|'.join(alternatives))
+
+
+_SPACE_FIX_PASSES = _compile_space_fixes(BENGALI_FIXES)
+
+if _SPACE_FIX_PASSES is not None:
+    _GAP_PATTERN = _compile_gap_pattern(_SPACE_FIX_PASSES)
+    # Pass indices bucketed by (last char of left context, first char of right context)
+    _PASSES_BY_CONTEXT = {}
+    for _index, (_left, _width, _right, _new_width) in enumerate(_SPACE_FIX_PASSES):
+        _context = (_left[-1:], _right[:1])
+        _PASSES_BY_CONTEXT.setdefault(_context, []).append(_index)
+
+
+@lru_cache(maxsize=4096)
+def _passes_for_context(before: str, after: str) -> tuple:
+    """
+    Passes (in dictionary order) that can apply to a space run between before and after
+    """
+    indices = []
+    for context in {(before, after), (before, ''), ('', after), ('', '')}:
+        indices.extend(_PASSES_BY_CONTEXT.get(context, ()))
+    return tuple(sorted(indices))
+
+
+@lru_cache(maxsize=4096)
+def _is_local_context(before: str, after: str) -> bool:
+    """
+    True when the passes for this context only look at the run and its two neighbours,
+    so the result depends on nothing but (before, width, after) and can be memoized
+    """
+    for index in _passes_for_context(before, after):
+        left, _, right, _ = _SPACE_FIX_PASSES[index]
+        if (left and right) or len(left) > 1 or len(right) > 1:
+            return False
+    return True
+
+
+def _simulate_gap(text: str, start: int, end: int, last_match_end: dict) -> int:
+    """
+    Simulate the sequential replace passes on the space run text[start:end].
+    
+    Non-space characters are never modified, so each pass reduces to arithmetic on
+    the run length. last_match_end reproduces str.replace's non-overlapping scan for
+    passes with context on both sides (e.g. 'ক ্ক' on 'ক ্ক ্ক').
+    """
+    width = end - start
+    before = text[start - 1] if start else ''
+    after = text[end] if end < len(text) else ''
+    
+    for index in _passes_for_context(before, after):
+        left, pass_width, right, new_width = _SPACE_FIX_PASSES[index]
+        if width < pass_width:
+            continue
+        if left and (start < len(left) or not text.startswith(left, start - len(left))):
+            continue
+        if right and not text.startswith(right, end):
+            continue
+        
+        if left and right:
+            if width != pass_width or start - len(left) < last_match_end.get(index, -1):
+                continue
+            last_match_end[index] = end + len(right)
+            width = new_width
+        elif left or right:
+            width += new_width - pass_width
+        else:
+            width = (width // pass_width) * new_width + width % pass_width
+    
+    return width
+
+
+@lru_cache(maxsize=4096)
+def _local_gap(before: str, width: int, after: str) -> str:
+    """
+    Memoized replacement for runs whose context is purely local
+    """
+    text = before + ' ' * width + after
+    return ' ' * _simulate_gap(text, len(before), len(before) + width, {})
+
 
 def apply_bengali_fixes(text: str) -> str:
     """
     Apply comprehensive Bengali OCR fixes to text.
     
+    Equivalent to applying every BENGALI_FIXES entry in order with str.replace, but done
+    in a single regex scan that only visits the space runs a fix can touch.
+    
     Args:
         text (str): Bengali text with potential OCR spacing errors
         
@@ -92,14 +254,22 @@ def apply_bengali_fixes(text: str) -> str:
     """
     if not text:
         return text
-        
-    fixed_text = text
     
-    # Apply all fixes from the dictionary
-    for incorrect, correct in BENGALI_FIXES.items():
-        fixed_text = fixed_text.replace(incorrect, correct)
+    if _SPACE_FIX_PASSES is None:
+        return _apply_bengali_fixes_sequential(text)
     
-    return fixed_text
+    last_match_end = {}
+    text_length = len(text)
+    
+    def replace_gap(match) -> str:
+        start, end = match.span()
+        before = text[start - 1] if start else ''
+        after = text[end] if end < text_length else ''
+        if _is_local_context(before, after):
+            return _local_gap(before, end - start, after)
+        return ' ' * _simulate_gap(text, start, end, last_match_end)
+    
+    return _GAP_PATTERN.sub(replace_gap, text)
 
 
 def clean_bengali_text(text: str) -> str:
@@ -112,8 +282,6 @@ def clean_bengali_text(text: str) -> str:
     Returns:
         str: Cleaned and normalized Bengali text
     """
-    import re
-    
     if not text:
         return ""
     
@@ -127,8 +295,11 @@ def clean_bengali_text(text: str) -> str:
     # Remove isolated single characters that are likely OCR errors
     text = re.sub(r'\b[।০-৯]\b', '', text)
     
-    # Clean up multiple spaces (additional cleanup after fixes)
-    text = re.sub(r'\s+', ' ', text)
+    # Clean up horizontal whitespace but keep line and paragraph breaks, so page
+    # markers and paragraph separators survive for chunking
+    text = re.sub(r'[^\S\n]+', ' ', text)
+    text = re.sub(r' ?\n ?', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
     
     # Trim leading and trailing spaces
     text = text.strip()
@@ -136,6 +307,34 @@ def clean_bengali_text(text: str) -> str:
     return text
 
 
+# Zero-width joiners/non-joiners only change how a hasanta conjunct is drawn
+_ZERO_WIDTH = re.compile('[\u200c\u200d]')
+
+
+def normalize_for_search(text: str) -> str:
+    """
+    Canonical form for search matching.
+    
+    Applies the OCR spacing fixes, then NFC (which also splits the precomposed
+    nukta letters ড় ঢ় য় into base + ়, so both encodings match), maps the
+    explicit khanda ta form (ত + ্ + ZWJ) to ৎ, drops remaining zero-width
+    joiners and lowercases Latin text.
+    
+    Args:
+        text (str): Document or query text
+        
+    Returns:
+        str: Normalized text
+    """
+    if not text:
+        return ""
+    
+    text = unicodedata.normalize('NFC', apply_bengali_fixes(text))
+    text = text.replace('ত্\u200d', 'ৎ')
+    text = _ZERO_WIDTH.sub('', text)
+    return text.lower()
+
+
 # Utility function to get specific fix categories
 def get_vowel_fixes():
     """Get only vowel-related fixes"""
@@ -1,50 +1,110 @@
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bisect import bisect_right
 import hashlib
-from typing import List
+import re
+from typing import Dict, List, Tuple, Union
+from telemetry import metrics
 
-def smart_text_chunking(text: str, source_name: str) -> List[Document]:
+PAGE_MARKER_PATTERN = re.compile(r'\n?--- Page (\d+) ---\n')
+
+def split_marked_pages(text: str) -> List[Dict]:
+    """
+    Recover page records from text carrying "--- Page N ---" markers
+    (text without markers becomes a single record without a page number)
+    """
+    matches = list(PAGE_MARKER_PATTERN.finditer(text))
+    if not matches:
+        return [{"page": None, "text": text.strip()}] if text.strip() else []
+
+    pages = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        page_text = text[match.end():end].strip()
+        if page_text:
+            pages.append({"page": int(match.group(1)), "text": page_text})
+    return pages
+
+def assemble_pages(pages: List[Dict]) -> Tuple[str, List[int], List]:
     """
-    Intelligent text chunking optimized for Bengali content
+    Join page records into one marked-up document.
+    Returns the text, the start offset of every page and the matching page numbers.
     """
-    if not text.strip():
+    parts = []
+    offsets = []
+    numbers = []
+    position = 0
+    for page in pages:
+        marker = f"\n--- Page {page['page']} ---\n" if page.get("page") is not None else "\n"
+        offsets.append(position)
+        numbers.append(page.get("page"))
+        parts.append(marker + page["text"] + "\n")
+        position += len(parts[-1])
+    return "".join(parts), offsets, numbers
+
+@metrics.timed("chunking")
+def smart_text_chunking(pages: Union[str, List[Dict]], source_name: str) -> List[Document]:
+    """
+    Intelligent text chunking optimized for Bengali content.
+    Accepts page records from extraction (or marked-up text) and records the
+    page span of every chunk in its metadata.
+    """
+    if isinstance(pages, str):
+        pages = split_marked_pages(pages)
+    if not pages:
         return []
-    
+
+    text, page_offsets, page_numbers = assemble_pages(pages)
+
     separators = [
-        "\n--- Page", "\n\n", "\n", "।।", "।", 
+        "\n--- Page", "\n\n", "\n", "।।", "।",
         ".", "?", "!", ";", ":", ",", " "
     ]
-    
+
     chunk_size =   1500
     chunk_overlap = 300 #300
-    
+
     text_splitter = RecursiveCharacterTextSplitter(
         separators=separators,
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
         is_separator_regex=False,
+        add_start_index=True,
     )
-    
-    chunks = text_splitter.split_text(text)
+
+    chunks = text_splitter.create_documents([text])
     documents = []
-    
+
     for i, chunk in enumerate(chunks):
-        cleaned_chunk = chunk.strip()
+        cleaned_chunk = chunk.page_content.strip()
         if len(cleaned_chunk) < 40:
             continue
-        
+
+        start = chunk.metadata["start_index"] + len(chunk.page_content) - len(chunk.page_content.lstrip())
+        end = start + len(cleaned_chunk)
+        page_start = page_numbers[bisect_right(page_offsets, start) - 1]
+        page_end = page_numbers[bisect_right(page_offsets, end - 1) - 1]
+
         chunk_id = hashlib.md5(f"{source_name}_{i}_{cleaned_chunk[:100]}".encode()).hexdigest()
-        
+
+        metadata = {
+            "source": source_name,
+            "chunk_id": chunk_id,
+            "chunk_index": i,
+            "chunk_length": len(cleaned_chunk),
+            "start_index": start,
+            "end_index": end
+        }
+        if page_start is not None:
+            metadata["page_start"] = page_start
+            metadata["page_end"] = page_end
+
         doc = Document(
             page_content=cleaned_chunk,
-            metadata={
-                "source": source_name,
-                "chunk_id": chunk_id,
-                "chunk_index": i,
-                "chunk_length": len(cleaned_chunk)
-            }
+            metadata=metadata
         )
         documents.append(doc)
-    
-    return documents
\ No newline at end of file
+
+    metrics.count("chunks_total", len(documents), stage="chunking")
+    return documents
@@ -1,11 +1,19 @@
-import streamlit as st
-from pdf2image import convert_from_bytes
 from PIL import Image
 import fitz  # PyMuPDF
 import re
-from .preprocessing import preprocess_image_advanced
+import time
+from typing import Dict, List, Optional, Tuple
 from .bengali_text_fixes import clean_bengali_text, apply_bengali_fixes
-import pytesseract
+from .ocr_engine import run_pdf_ocr, resolve_worker_count
+from .ocr_cache import open_ocr_cache
+from config.config import CONFIG
+from telemetry.progress import get_reporter
+from telemetry import metrics
+
+# Pages whose text layer is shorter than this, or mostly garbage, are OCR'd instead
+MIN_TEXT_LAYER_CHARS = 50
+MAX_GARBAGE_RATIO = 0.1
+_GARBAGE_CHARS = re.compile(r'[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]')
 
 def clean_extracted_text(text: str) -> str:
     """
@@ -14,100 +22,163 @@ def clean_extracted_text(text: str) -> str:
     # Use the comprehensive Bengali text cleaning function
     return clean_bengali_text(text)
 
-def enhanced_ocr_extraction(pdf_bytes: bytes, pdf_name: str) -> str:
+def build_page_records(page_texts: Dict[int, str], methods: Dict[int, str]) -> List[Dict]:
+    """
+    Clean each page on its own and return ordered page records:
+    {"page": 1-based page number, "text": cleaned text, "method": "direct" | "ocr"}
     """
-    Enhanced OCR extraction with multiple strategies for Bengali text
+    pages = []
+    for page_index in sorted(page_texts):
+        with metrics.span("extract.clean"):
+            cleaned = clean_extracted_text(page_texts[page_index])
+        if not cleaned:
+            continue
+        pages.append({"page": page_index + 1, "text": cleaned, "method": methods[page_index]})
+    return pages
+
+def join_pages(pages: List[Dict]) -> str:
     """
-    text = ""
+    Render page records as one document with "--- Page N ---" markers
+    """
+    return "".join(f"\n--- Page {page['page']} ---\n{page['text']}\n" for page in pages).strip()
+
+def _run_ocr_with_progress(pdf_bytes: bytes, pdf_name: str, page_indices: List[int], max_workers: Optional[int] = None) -> Tuple[Dict[int, str], Dict]:
+    """
+    Run the OCR pipeline over selected pages, reporting progress to the active reporter
+    """
+    report = get_reporter()
+    total_pages = len(page_indices)
+    workers = min(resolve_worker_count(max_workers or CONFIG["OCR_WORKERS"]), max(total_pages, 1))
+    report.info(f"Processing {total_pages} pages from {pdf_name} with {workers} OCR workers")
     
-    try:
-        # Convert to high-quality images
-        images = convert_from_bytes(
-            pdf_bytes, 
-            dpi=400,
-            fmt='png',
-            thread_count=2
+    progress_bar = report.progress(f"OCR {pdf_name}")
+    
+    def report_progress(done: int, total: int):
+        progress_bar.progress(done / total)
+        if done % 2 == 1 or done == total:
+            report.info(f"Processed page {done}/{total}")
+    
+    # Pages are rendered lazily inside the pipeline instead of all up front
+    page_results, stats = run_pdf_ocr(
+        pdf_bytes,
+        page_indices=page_indices,
+        dpi=CONFIG["OCR_DPI"],
+        max_workers=workers,
+        progress_callback=report_progress,
+        cache=open_ocr_cache(CONFIG["OCR_CACHE_DIR"], CONFIG["OCR_CACHE_MAX_MB"])
+    )
+    
+    progress_bar.empty()
+    report.info(
+        f"OCR finished in {stats['seconds']:.1f}s | cached pages: {stats['cache_hits']}/{stats['pages']} | "
+        f"RSS this run: app {stats['rss_start_mb']:.0f} → {stats['rss_peak_mb']:.0f} MB, "
+        f"worker {stats['worker_rss_peak_mb']:.0f} MB (process peak {stats['process_peak_rss_mb']:.0f} MB)"
+    )
+    decisions = stats["preprocess"]
+    if decisions["pages"]:
+        report.info(
+            f"🧹 Preprocessing: {decisions['blank']} blank pages skipped, {decisions['denoised']} denoised, "
+            f"{decisions['downscaled']} downscaled | {decisions['preprocess_seconds']:.1f}s "
+            f"(denoise {decisions['denoise_seconds']:.1f}s)"
         )
+        report.details(f"🧹 Preprocessing decisions for {pdf_name}", {
+            f"page {page_index + 1}": page for page_index, page in sorted(stats["page_stats"].items())
+        })
+    return page_results, stats
+
+def enhanced_ocr_extraction(pdf_bytes: bytes, pdf_name: str, max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Enhanced OCR extraction: pages are rendered lazily and OCR'd across a process pool.
+    Returns page records (see build_page_records).
+    """
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        total_pages = len(doc)
+        doc.close()
         
-        total_pages = len(images)
-        st.info(f"Processing {total_pages} pages from {pdf_name}")
+        page_results, _ = _run_ocr_with_progress(pdf_bytes, pdf_name, list(range(total_pages)), max_workers)
+        return build_page_records(page_results, dict.fromkeys(page_results, "ocr"))
         
-        progress_bar = st.progress(0)
-        page_texts = []
+    except Exception as e:
+        get_reporter().error(f"OCR extraction failed for {pdf_name}: {str(e)}")
+        return []
+
+def is_usable_text_layer(page_text: str, min_chars: int = MIN_TEXT_LAYER_CHARS) -> bool:
+    """
+    Decide whether a page's embedded text layer can be used instead of OCR.
+    Rejects empty layers and layers dominated by replacement/private-use/control characters.
+    """
+    stripped = page_text.strip()
+    if len(stripped) < min_chars:
+        return False
+    garbage = len(_GARBAGE_CHARS.findall(stripped))
+    return garbage / len(stripped) <= MAX_GARBAGE_RATIO
+
+def extract_hybrid_text(pdf_bytes: bytes, pdf_name: str, max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Per-page hybrid extraction: use the PyMuPDF text layer where it is usable and
+    send only empty/garbage pages to OCR. Returns page records (see build_page_records).
+    """
+    try:
+        direct_start = time.perf_counter()
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        total_pages = len(doc)
+        page_texts: Dict[int, str] = {}
+        methods: Dict[int, str] = {}
+        ocr_pages = []
         
-        ocr_configs = [
-            r'--oem 3 --psm 6 -l ben',
-        ]
+        for page_num in range(total_pages):
+            with metrics.span("extract.text_layer"):
+                page_text = doc[page_num].get_text("text")
+            if is_usable_text_layer(page_text):
+                with metrics.span("extract.bengali_fixes"):
+                    page_texts[page_num] = apply_bengali_fixes(page_text)
+                methods[page_num] = "direct"
+            else:
+                ocr_pages.append(page_num)
+        doc.close()
+        direct_seconds = time.perf_counter() - direct_start
+        metrics.count("pages_total", total_pages - len(ocr_pages), stage="direct")
         
-        for i, image in enumerate(images):
-            progress_bar.progress((i + 1) / total_pages)
-            
-            # Preprocess image for better OCR
-            processed_image = preprocess_image_advanced(image)
-            
-            page_text = ""
-            best_result = ""
-            max_length = 0
-            
-            # Try multiple OCR configurations
-            for config in ocr_configs:
-                try:
-                    result = pytesseract.image_to_string(processed_image, config=config)
-                    if len(result.strip()) > max_length:
-                        max_length = len(result.strip())
-                        best_result = result
-                except:
-                    continue
-            
-            # Fallback to original image if needed
-            if max_length < 50:
-                try:
-                    best_result = pytesseract.image_to_string(
-                        image, config=r'--oem 3 --psm 6 -l ben'
-                    )
-                except:
-                    best_result = ""
-            
-            # Apply Bengali fixes immediately after OCR for each page
-            best_result = apply_bengali_fixes(best_result)
-            page_texts.append(best_result)
-            
-            if i % 2 == 0 or i == total_pages - 1:
-                st.info(f"Processed page {i + 1}/{total_pages}")
+        ocr_seconds = 0.0
+        if ocr_pages:
+            ocr_results, ocr_stats = _run_ocr_with_progress(pdf_bytes, pdf_name, ocr_pages, max_workers)
+            page_texts.update(ocr_results)
+            methods.update(dict.fromkeys(ocr_results, "ocr"))
+            ocr_seconds = ocr_stats["seconds"]
         
-        progress_bar.empty()
+        get_reporter().info(
+            f"📑 {pdf_name}: {total_pages - len(ocr_pages)} pages direct text ({direct_seconds:.2f}s), "
+            f"{len(ocr_pages)} pages OCR ({ocr_seconds:.1f}s)"
+        )
         
-        text = "\n\n".join(page_texts)
-        return clean_extracted_text(text)
+        return build_page_records(page_texts, methods)
         
     except Exception as e:
-        st.error(f"OCR extraction failed for {pdf_name}: {str(e)}")
-        return ""
+        get_reporter().error(f"Hybrid extraction failed for {pdf_name}: {str(e)}")
+        return []
 
-def extract_direct_text_advanced(pdf_bytes: bytes) -> str:
+def extract_direct_text_advanced(pdf_bytes: bytes) -> List[Dict]:
     """
-    Advanced direct text extraction with metadata preservation and Bengali fixes
+    Advanced direct text extraction with page records and Bengali fixes
     """
-    text = ""
     try:
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        page_texts: Dict[int, str] = {}
         
         for page_num in range(len(doc)):
             page = doc[page_num]
             page_text = page.get_text("text")
             
-            if len(page_text.strip()) < 50:
+            if len(page_text.strip()) < MIN_TEXT_LAYER_CHARS:
                 continue
                 
             # Apply Bengali fixes to directly extracted text as well
-            page_text = apply_bengali_fixes(page_text)
-            
-            text += f"\n--- Page {page_num + 1} ---\n"
-            text += page_text + "\n"
+            page_texts[page_num] = apply_bengali_fixes(page_text)
         
         doc.close()
-        return clean_extracted_text(text)
+        return build_page_records(page_texts, dict.fromkeys(page_texts, "direct"))
         
     except Exception as e:
-        st.warning(f"Direct text extraction failed: {str(e)}")
-        return ""
\ No newline at end of file
+        get_reporter().warning(f"Direct text extraction failed: {str(e)}")
+        return []
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+OCR Result Cache Module
+Persistent, content-addressed page-level cache for OCR output.
+Entries are keyed by the PDF content hash, page index, DPI, Tesseract configuration,
+preprocessing version and Bengali text-fix version, stored in SQLite (WAL mode) so several processes can
+share one cache safely, and evicted least-recently-used once the size bound is hit.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_pages (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_pages_last_access ON ocr_pages(last_access);
+"""
+
+
+def hash_pdf_bytes(pdf_bytes: bytes) -> str:
+    """
+    Content hash of a PDF file
+    """
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def make_page_key(
+    pdf_hash: str, page_index: int, dpi: int, ocr_config: str, preprocess_version: str, fixes_version: str
+) -> str:
+    """
+    Cache key for one OCR'd page
+    """
+    raw = f"{pdf_hash}|{page_index}|{dpi}|{ocr_config}|{preprocess_version}|{fixes_version}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class OCRCache:
+    """
+    Size-bounded LRU cache of OCR page texts on disk
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.db_path = os.path.join(cache_dir, "ocr_cache.sqlite3")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        One connection per process and thread; SQLite handles cross-process locking
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT text FROM ocr_pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        conn.execute("UPDATE ocr_pages SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, text: str):
+        size = len(text.encode("utf-8"))
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_pages (key, text, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, text, size, time.time()),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """
+        Drop least-recently-used entries until the cache fits in max_bytes
+        """
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT key, size FROM ocr_pages ORDER BY last_access ASC").fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM ocr_pages WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._connect().execute("DELETE FROM ocr_pages")
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_pages").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_mb": total / 1024 / 1024,
+        }
+
+
+@lru_cache(maxsize=None)
+def open_ocr_cache(cache_dir: str, max_mb: int) -> Optional[OCRCache]:
+    """
+    Shared OCRCache instance for a directory (None when caching is disabled)
+    """
+    if not cache_dir:
+        return None
+    return OCRCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
@@ -0,0 +1,344 @@
+"""
+Parallel OCR Engine Module
+Runs preprocessing, Tesseract and Bengali fixes for each page in a process pool.
+Pages are rendered lazily inside the workers, so only a bounded number of page
+images exist at any time. Has no Streamlit dependency so it can be driven from
+plain Python as well as the UI.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import pytesseract
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from telemetry import metrics
+
+from .preprocessing import preprocess_page, preprocess_signature, summarize_page_stats
+from .bengali_text_fixes import BENGALI_FIXES_VERSION, apply_bengali_fixes
+from .ocr_cache import OCRCache, hash_pdf_bytes, make_page_key
+
+OCR_CONFIGS = [
+    r'--oem 3 --psm 6 -l ben',
+]
+FALLBACK_OCR_CONFIG = r'--oem 3 --psm 6 -l ben'
+MIN_OCR_LENGTH = 50
+OCR_DPI = 400
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def ocr_page(image: Image.Image) -> Tuple[str, Dict]:
+    """
+    OCR a single page image: preprocess, run Tesseract and apply Bengali fixes.
+    Also returns the page's preprocessing decisions and timings; blank pages
+    skip Tesseract and come back as "".
+    """
+    with metrics.span("ocr.preprocess"):
+        processed_image, page_stats = preprocess_page(image)
+    if processed_image is None:
+        return "", page_stats
+
+    ocr_start = time.perf_counter()
+    best_result = ""
+    max_length = 0
+
+    # Try multiple OCR configurations
+    for config in OCR_CONFIGS:
+        try:
+            with metrics.span("ocr.tesseract"):
+                result = pytesseract.image_to_string(processed_image, config=config)
+            if len(result.strip()) > max_length:
+                max_length = len(result.strip())
+                best_result = result
+        except Exception:
+            continue
+
+    # Fallback to original image if needed
+    if max_length < MIN_OCR_LENGTH:
+        metrics.count("pages_total", stage="ocr.fallback")
+        try:
+            with metrics.span("ocr.tesseract", fallback=True):
+                best_result = pytesseract.image_to_string(image, config=FALLBACK_OCR_CONFIG)
+        except Exception:
+            best_result = ""
+    page_stats["ocr_ms"] = (time.perf_counter() - ocr_start) * 1000
+
+    # Apply Bengali fixes immediately after OCR for each page
+    with metrics.span("ocr.bengali_fixes"):
+        return apply_bengali_fixes(best_result), page_stats
+
+
+def ocr_page_image(image: Image.Image) -> str:
+    """
+    OCR a single page image: preprocess, run Tesseract and apply Bengali fixes
+    """
+    return ocr_page(image)[0]
+
+
+def render_page(doc: fitz.Document, page_index: int, dpi: int = OCR_DPI) -> Image.Image:
+    """
+    Render one PDF page to an RGB image with PyMuPDF
+    """
+    with metrics.span("ocr.render"):
+        pix = doc[page_index].get_pixmap(dpi=dpi, alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size over the whole life of the current process in MB (0.0
+    where unsupported). It never goes down, and a spawned process starts from its
+    parent's peak, so per-run memory comes from metrics.current_rss_mb samples instead.
+    """
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / divisor
+
+
+# Per-worker state, set once by the pool initializer
+_worker_doc = None
+_worker_dpi = OCR_DPI
+
+
+def _init_ocr_worker(tesseract_cmd: str, pdf_bytes: Optional[bytes] = None, dpi: int = OCR_DPI, record_metrics: bool = False):
+    """
+    Worker initializer: pin Tesseract/OpenCV to one thread each so N workers use N cores
+    and open the PDF once per worker
+    """
+    global _worker_doc, _worker_dpi
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    # Spans recorded here travel back with each page (see metrics.drain); a forked
+    # worker starts with a copy of the parent's registry, which must not be sent back
+    metrics.set_enabled(record_metrics)
+    metrics.reset()
+    metrics.set_process_label("ocr_worker")
+    try:
+        import cv2
+        cv2.setNumThreads(1)
+    except Exception:
+        pass
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    if pdf_bytes is not None:
+        _worker_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        _worker_dpi = dpi
+
+
+def _ocr_worker_page(page_index: int) -> Tuple[int, str, float, Optional[Dict], Dict]:
+    """
+    Render and OCR one page of the worker's PDF; RSS is sampled while the page image is alive
+    """
+    image = render_page(_worker_doc, page_index, _worker_dpi)
+    text, page_stats = ocr_page(image)
+    rss_mb = metrics.current_rss_mb()
+    del image
+    return page_index, text, rss_mb, metrics.drain(), page_stats
+
+
+def _ocr_worker_image(image: Image.Image) -> Tuple[str, Optional[Dict]]:
+    return ocr_page_image(image), metrics.drain()
+
+
+def resolve_worker_count(max_workers: Optional[int] = None) -> int:
+    """
+    Resolve the number of OCR worker processes (0/None means one per CPU)
+    """
+    if not max_workers or max_workers < 1:
+        return os.cpu_count() or 1
+    return max_workers
+
+
+def run_parallel_ocr(
+    images: List[Image.Image],
+    max_workers: Optional[int] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> List[str]:
+    """
+    OCR page images across a process pool and return page texts in page order.
+    progress_callback(done, total) is invoked from the calling thread.
+    """
+    total_pages = len(images)
+    if total_pages == 0:
+        return []
+
+    workers = min(resolve_worker_count(max_workers), total_pages)
+    page_texts = [""] * total_pages
+
+    if workers == 1:
+        for i, image in enumerate(images):
+            page_texts[i] = ocr_page_image(image)
+            if progress_callback:
+                progress_callback(i + 1, total_pages)
+        return page_texts
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_ocr_worker,
+        initargs=(pytesseract.pytesseract.tesseract_cmd, None, OCR_DPI, metrics.enabled()),
+    ) as executor:
+        futures = {
+            executor.submit(_ocr_worker_image, image): i
+            for i, image in enumerate(images)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                page_texts[futures[future]], worker_metrics = future.result()
+                metrics.merge(worker_metrics)
+            except Exception:
+                page_texts[futures[future]] = ""
+            if progress_callback:
+                progress_callback(done, total_pages)
+
+    return page_texts
+
+
+def ocr_cache_config() -> str:
+    """
+    Tesseract configuration string that is part of every OCR cache key
+    """
+    return "|".join(OCR_CONFIGS + [FALLBACK_OCR_CONFIG])
+
+
+def run_pdf_ocr(
+    pdf_bytes: bytes,
+    page_indices: Optional[Sequence[int]] = None,
+    dpi: int = OCR_DPI,
+    max_workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+    cache: Optional[OCRCache] = None,
+) -> Tuple[Dict[int, str], Dict]:
+    """
+    Streaming render -> preprocess -> OCR pipeline over a PDF.
+    Pages are rendered lazily in the workers and at most max_in_flight pages
+    (default two per worker) are queued at once. Pages found in the OCR cache
+    skip rendering and Tesseract entirely. Returns ({page_index: text}, stats).
+    """
+    start_time = time.perf_counter()
+
+    if page_indices is None:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        page_indices = range(len(doc))
+        doc.close()
+    page_indices = list(page_indices)
+    total_pages = len(page_indices)
+
+    page_texts: Dict[int, str] = {}
+    page_keys: Dict[int, str] = {}
+    page_stats: Dict[int, Dict] = {}
+    done = 0
+
+    def record(page_index: int, text: str):
+        nonlocal done
+        page_texts[page_index] = text
+        done += 1
+        if progress_callback:
+            progress_callback(done, total_pages)
+
+    # Serve unchanged pages straight from the cache
+    ocr_pages = page_indices
+    if cache is not None:
+        pdf_hash = hash_pdf_bytes(pdf_bytes)
+        config_key = ocr_cache_config()
+        ocr_pages = []
+        for page_index in page_indices:
+            key = make_page_key(pdf_hash, page_index, dpi, config_key, preprocess_signature(), BENGALI_FIXES_VERSION)
+            cached_text = cache.get(key)
+            if cached_text is None:
+                page_keys[page_index] = key
+                ocr_pages.append(page_index)
+            else:
+                record(page_index, cached_text)
+
+    def store(page_index: int, text: str, ok: bool):
+        if cache is not None and ok:
+            try:
+                cache.put(page_keys[page_index], text)
+            except Exception:
+                pass
+        record(page_index, text)
+
+    workers = min(resolve_worker_count(max_workers), max(len(ocr_pages), 1))
+    in_flight_limit = max(max_in_flight or workers * 2, workers)
+    # Sampled once per page: ru_maxrss covers the whole process life, not this run
+    rss_start_mb = metrics.current_rss_mb()
+    rss_peak_mb = rss_start_mb
+    worker_rss_peak_mb = 0.0
+
+    if ocr_pages and workers == 1:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            for page_index in ocr_pages:
+                try:
+                    image = render_page(doc, page_index, dpi)
+                    text, page_stats[page_index] = ocr_page(image)
+                    rss_peak_mb = max(rss_peak_mb, metrics.current_rss_mb())
+                    del image
+                    store(page_index, text, True)
+                except Exception:
+                    store(page_index, "", False)
+        finally:
+            doc.close()
+    elif ocr_pages:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_ocr_worker,
+            initargs=(pytesseract.pytesseract.tesseract_cmd, pdf_bytes, dpi, metrics.enabled()),
+        ) as executor:
+            pending = {}
+            next_page = 0
+            while next_page < len(ocr_pages) or pending:
+                while next_page < len(ocr_pages) and len(pending) < in_flight_limit:
+                    page_index = ocr_pages[next_page]
+                    pending[executor.submit(_ocr_worker_page, page_index)] = page_index
+                    next_page += 1
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    page_index = pending.pop(future)
+                    try:
+                        _, text, rss_mb, worker_metrics, page_stats[page_index] = future.result()
+                        worker_rss_peak_mb = max(worker_rss_peak_mb, rss_mb)
+                        rss_peak_mb = max(rss_peak_mb, metrics.current_rss_mb())
+                        metrics.merge(worker_metrics)
+                        store(page_index, text, True)
+                    except Exception:
+                        store(page_index, "", False)
+
+    rss_end_mb = metrics.current_rss_mb()
+    stats = {
+        "pages": total_pages,
+        "ocr_pages": len(ocr_pages),
+        "cache_hits": total_pages - len(ocr_pages) if cache is not None else 0,
+        "workers": workers if ocr_pages else 0,
+        "max_in_flight": in_flight_limit if workers > 1 else 1,
+        "dpi": dpi,
+        "seconds": time.perf_counter() - start_time,
+        # This run: RSS of this process at start / end and the largest per-page sample,
+        # and the largest sample taken in a worker
+        "rss_start_mb": rss_start_mb,
+        "rss_end_mb": rss_end_mb,
+        "rss_peak_mb": max(rss_peak_mb, rss_end_mb),
+        "worker_rss_peak_mb": worker_rss_peak_mb,
+        # Whole process life (never decreases across runs)
+        "process_peak_rss_mb": peak_rss_mb(),
+        # Per-page preprocessing decisions (blank / denoised / scale, noise, timings)
+        "preprocess": summarize_page_stats(page_stats),
+        "page_stats": page_stats,
+    }
+    metrics.count("pages_total", len(ocr_pages), stage="ocr")
+    if cache is not None:
+        metrics.cache_lookup("ocr", stats["cache_hits"], len(ocr_pages))
+    return page_texts, stats
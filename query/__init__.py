@@ -1 +1,3 @@
-from .query_handler import handle_user_query
\ No newline at end of file
+from .query_handler import handle_user_query
+from .answer_cache import AnswerCache, open_answer_cache
+from .streaming import StreamingAnswerHandler
\ No newline at end of file
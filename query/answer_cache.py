@@ -0,0 +1,165 @@
+"""
+Answer Cache Module
+Process-wide cache of generated answers for repeated questions.
+A question hits on its exact normalized text or, failing that, on embedding cosine
+similarity above a threshold. Entries are scoped to the index version and the recent
+chat context, expire after a TTL and are evicted least-recently-used.
+"""
+
+import hashlib
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pdf_processing.bengali_text_fixes import normalize_for_search
+from telemetry import metrics
+
+_PUNCTUATION = re.compile(r'[?!.,;:।॥"\'“”‘’()\[\]-]+')
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", normalize_for_search(question)).split())
+
+
+def answer_scope(index_version: str, context_messages: List) -> str:
+    """
+    Cache scope: answers are only reused for the same index and the same recent chat turns
+    """
+    context = "\x00".join(getattr(message, "content", str(message)) for message in context_messages)
+    return f"{index_version}|{hashlib.sha256(context.encode('utf-8')).hexdigest()[:16]}"
+
+
+class AnswerCache:
+    """
+    Thread-safe answer cache shared by every session in the process
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 86400, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, entry_id: str):
+        entry = self._entries.pop(entry_id)
+        self._exact.pop((entry["scope"], entry["question_key"]), None)
+
+    def _expire(self, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry["created"] > self.ttl_seconds]
+        for entry_id in expired:
+            self._drop(entry_id)
+        self.evictions += len(expired)
+
+    def lookup(
+        self,
+        scope: str,
+        question: str,
+        embed: Optional[Callable[[str], List[float]]] = None,
+    ) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+        """
+        Return (entry, question vector). The vector is computed only when the exact
+        lookup misses and is passed back so store() does not embed the question twice.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._expire(time.time())
+            entry_id = self._exact.get((scope, key))
+            if entry_id is not None:
+                self._entries.move_to_end(entry_id)
+                self.exact_hits += 1
+                metrics.cache_lookup("answer", 1, 0)
+                return dict(self._entries[entry_id], match="exact", similarity=1.0), None
+            candidates = [
+                (entry_id, entry["vector"]) for entry_id, entry in self._entries.items()
+                if entry["scope"] == scope and entry["vector"] is not None
+            ]
+
+        vector = None
+        if embed is not None:
+            vector = np.asarray(embed(question), dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+        if vector is not None and candidates:
+            similarities = np.stack([v for _, v in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                entry_id = candidates[best][0]
+                with self._lock:
+                    if entry_id in self._entries:
+                        self._entries.move_to_end(entry_id)
+                        self.semantic_hits += 1
+                        metrics.cache_lookup("answer", 1, 0)
+                        return dict(self._entries[entry_id], match="semantic", similarity=float(similarities[best])), vector
+
+        with self._lock:
+            self.misses += 1
+        metrics.cache_lookup("answer", 0, 1)
+        return None, vector
+
+    def store(self, scope: str, question: str, answer: str, source_documents: List, vector: Optional[np.ndarray] = None):
+        key = normalize_question(question)
+        with self._lock:
+            previous = self._exact.get((scope, key))
+            if previous is not None:
+                self._drop(previous)
+            entry_id = uuid.uuid4().hex
+            self._entries[entry_id] = {
+                "scope": scope,
+                "question_key": key,
+                "question": question,
+                "vector": vector,
+                "answer": answer,
+                "source_documents": source_documents,
+                "created": time.time(),
+            }
+            self._exact[(scope, key)] = entry_id
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, keep_index_version: Optional[str] = None) -> int:
+        """
+        Drop every entry (or every entry not built against keep_index_version)
+        """
+        with self._lock:
+            stale = [
+                entry_id for entry_id, entry in self._entries.items()
+                if keep_index_version is None or not entry["scope"].startswith(f"{keep_index_version}|")
+            ]
+            for entry_id in stale:
+                self._drop(entry_id)
+            return len(stale)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+@lru_cache(maxsize=None)
+def open_answer_cache(max_entries: int, ttl_seconds: float, similarity_threshold: float) -> Optional[AnswerCache]:
+    """
+    Shared AnswerCache for the process (None when disabled)
+    """
+    if max_entries <= 0:
+        return None
+    return AnswerCache(max_entries, ttl_seconds, similarity_threshold)
@@ -1,5 +1,88 @@
 import streamlit as st
+import time
+from langchain_core.messages import AIMessage, HumanMessage
 from templates.htmlTemplates import user_template, bot_template
+from conversation.conversation_chain import retrieval_stats
+from config.config import CONFIG
+from query.answer_cache import answer_scope, open_answer_cache
+from query.streaming import StreamingAnswerHandler
+from telemetry.metrics import record_query, span
+from vectorstore.shared_index import open_shared_index
+
+def get_answer_cache():
+    return open_answer_cache(
+        CONFIG["ANSWER_CACHE_MAX_ENTRIES"],
+        CONFIG["ANSWER_CACHE_TTL_SECONDS"],
+        CONFIG["ANSWER_CACHE_SIMILARITY"]
+    )
+
+def _cached_response(cache, scope: str, question: str):
+    """
+    Answer from the cache as a chain-shaped response (recorded in chat memory), or None
+    """
+    vectorstore = st.session_state.get('vectorstore')
+    embed = vectorstore.embeddings.embed_query if vectorstore is not None else None
+    entry, vector = cache.lookup(scope, question, embed)
+    if entry is None:
+        return None, vector
+    
+    st.session_state.conversation.memory.save_context({'question': question}, {'answer': entry['answer']})
+    response = {
+        'answer': entry['answer'],
+        'source_documents': entry['source_documents'],
+        'cache_match': entry['match'],
+        'cache_similarity': entry['similarity']
+    }
+    return response, vector
+
+def render_sources(source_documents):
+    with st.expander(f"📚 Source References ({len(source_documents)} chunks found)"):
+        sources_by_file = {}
+        for doc in source_documents:
+            source_file = doc.metadata.get('source', 'Unknown')
+            if source_file not in sources_by_file:
+                sources_by_file[source_file] = []
+            sources_by_file[source_file].append(doc)
+        
+        for source_file, docs in sources_by_file.items():
+            st.write(f"**📄 From: {source_file}** ({len(docs)} chunks)")
+            for i, doc in enumerate(docs):
+                page_start = doc.metadata.get('page_start')
+                page_end = doc.metadata.get('page_end')
+                if page_start is None:
+                    st.write(f"*Chunk {i+1}:*")
+                elif page_start == page_end:
+                    st.write(f"*Chunk {i+1} (page {page_start}):*")
+                else:
+                    st.write(f"*Chunk {i+1} (pages {page_start}-{page_end}):*")
+                st.write(doc.page_content[:400] + ("..." if len(doc.page_content) > 400 else ""))
+                st.write("---")
+
+def _streaming_handler():
+    """
+    Page placeholders for sources and the answer, fed by the chain's callbacks
+    """
+    status = st.empty()
+    status.info("🔍 Searching")
+    sources_area = st.container()
+    answer_area = st.empty()
+    last_render = [0.0]
+    
+    def on_sources(documents):
+        status.info("✍️ Generating answer...")
+        if documents:
+            with sources_area:
+                render_sources(documents)
+    
+    def on_token(token, text):
+        # Re-rendering the HTML block per token is wasteful; ~20 updates/s is smooth enough
+        now = time.perf_counter()
+        if now - last_render[0] >= 0.05:
+            last_render[0] = now
+            answer_area.write(bot_template.replace("{{MSG}}", text + "▌"), unsafe_allow_html=True)
+    
+    handler = StreamingAnswerHandler(on_token, on_sources)
+    return handler, status, answer_area
 
 def handle_user_query(user_question: str):
  
@@ -8,34 +91,66 @@ def handle_user_query(user_question: str):
         return
     
     try:
-        with st.spinner("🔍 Searching"):
-            processed_query = user_question.strip()
-            response = st.session_state.conversation({
-                'question': processed_query
-            })
-            st.session_state.chat_history = response['chat_history']
-        
-        for i, message in enumerate(st.session_state.chat_history):
-            if i % 2 == 0:
-                st.write(user_template.replace("{{MSG}}", message.content), unsafe_allow_html=True)
-            else:
-                st.write(bot_template.replace("{{MSG}}", message.content), unsafe_allow_html=True)
-        
-        if 'source_documents' in response and response['source_documents']:
-            with st.expander(f"📚 Source References ({len(response['source_documents'])} chunks found)"):
-                sources_by_file = {}
-                for doc in response['source_documents']:
-                    source_file = doc.metadata.get('source', 'Unknown')
-                    if source_file not in sources_by_file:
-                        sources_by_file[source_file] = []
-                    sources_by_file[source_file].append(doc)
-                
-                for source_file, docs in sources_by_file.items():
-                    st.write(f"**📄 From: {source_file}** ({len(docs)} chunks)")
-                    for i, doc in enumerate(docs):
-                        st.write(f"*Chunk {i+1}:*")
-                        st.write(doc.page_content[:400] + ("..." if len(doc.page_content) > 400 else ""))
-                        st.write("---")
+        processed_query = user_question.strip()
+        st.write(user_template.replace("{{MSG}}", processed_query), unsafe_allow_html=True)
+        
+        cache = get_answer_cache()
+        response, vector = None, None
+        if cache is not None:
+            context_messages = st.session_state.chat_history[-2 * CONFIG["ANSWER_CACHE_CONTEXT_TURNS"]:] if CONFIG["ANSWER_CACHE_CONTEXT_TURNS"] > 0 else []
+            scope = answer_scope(open_shared_index().version(), context_messages)
+            with span("query.cache_lookup"):
+                response, vector = _cached_response(cache, scope, processed_query)
+        
+        if response is None:
+            handler, status, answer_area = _streaming_handler()
+            response = st.session_state.conversation(
+                {'question': processed_query},
+                callbacks=[handler]
+            )
+            status.empty()
+            answer_area.write(bot_template.replace("{{MSG}}", response['answer']), unsafe_allow_html=True)
+            metrics = handler.metrics()
+            if cache is not None:
+                cache.store(scope, processed_query, response['answer'], response.get('source_documents', []), vector)
+        else:
+            st.write(bot_template.replace("{{MSG}}", response['answer']), unsafe_allow_html=True)
+            if response.get('source_documents'):
+                render_sources(response['source_documents'])
+            metrics = {"retrieval_ms": None, "ttft_ms": 0.0, "generation_ms": 0.0, "total_ms": None}
+        
+        metrics["cached"] = 'cache_match' in response
+        record_query(metrics, metrics["cached"])
+        st.session_state.query_metrics = st.session_state.get('query_metrics', []) + [metrics]
+        
+        # The displayed transcript is kept in full; the chain's memory is bounded
+        st.session_state.chat_history = st.session_state.chat_history + [
+            HumanMessage(content=processed_query),
+            AIMessage(content=response['answer'])
+        ]
+        
+        if 'cache_match' in response:
+            cache_stats = cache.stats()
+            st.caption(
+                f"⚡ Cached answer ({response['cache_match']} match, similarity {response['cache_similarity']:.3f}); "
+                f"cache hit rate {cache_stats['hit_rate']:.0%} over {cache_stats['entries']} answers"
+            )
+        
+        stages = {} if 'cache_match' in response else retrieval_stats(st.session_state.conversation)
+        rerank = stages.get('RerankingRetriever')
+        if rerank:
+            st.caption(
+                f"🎯 Retrieval {rerank['retrieve_ms']:.0f} ms, re-rank {rerank['rerank_ms']:.0f} ms: "
+                f"{rerank['kept']}/{rerank['candidates']} kept, {rerank['cache_hits']} cached"
+                + (" (budget exceeded, retriever order)" if rerank['fallback'] else "")
+            )
+        packing = stages.get('PackedRetriever')
+        if packing:
+            st.caption(
+                f"🧮 Context: {packing['packed_tokens']} tokens in {packing['passages']} passages "
+                f"from {packing['chunks_used']}/{packing['candidates']} chunks "
+                f"({packing['tokens_saved']} tokens saved)"
+            )
         
     except Exception as e:
         st.error(f"❌ Query processing failed: {str(e)}")
@@ -0,0 +1,70 @@
+"""
+Streaming Module
+Callback handler that forwards answer tokens as they are generated and reports the
+retrieved sources as soon as the outermost retriever finishes, while timing the
+query (time to first token, generation time, total).
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from langchain.schema import Document
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class StreamingAnswerHandler(BaseCallbackHandler):
+    """
+    Only the answer LLM streams (the condense-question LLM does not), so every
+    on_llm_new_token belongs to the answer
+    """
+
+    # Called inline from async chains too, so timestamps are not delayed by an executor hop
+    run_inline = True
+
+    def __init__(
+        self,
+        on_token: Callable[[str, str], None],
+        on_sources: Optional[Callable[[List[Document]], None]] = None,
+    ):
+        self.on_token = on_token
+        self.on_sources = on_sources
+        self.text = ""
+        self.started = time.perf_counter()
+        self.retrieved: Optional[float] = None
+        self.first_token: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._retriever_runs = set()
+
+    def on_retriever_start(self, serialized: Dict[str, Any], query: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._retriever_runs.add(run_id)
+
+    def on_retriever_end(self, documents, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        # Wrapped retrievers (packer -> re-ranker -> hybrid) nest; report the outermost result
+        if parent_run_id in self._retriever_runs:
+            return
+        self.retrieved = time.perf_counter()
+        if self.on_sources is not None:
+            self.on_sources(list(documents))
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.text += token
+        self.on_token(token, self.text)
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        if self.first_token is not None:
+            self.finished = time.perf_counter()
+
+    def metrics(self) -> Dict[str, Optional[float]]:
+        def ms(start: Optional[float], end: Optional[float]) -> Optional[float]:
+            return (end - start) * 1000 if start is not None and end is not None else None
+
+        return {
+            "retrieval_ms": ms(self.started, self.retrieved),
+            "ttft_ms": ms(self.started, self.first_token),
+            "generation_ms": ms(self.first_token, self.finished),
+            "total_ms": ms(self.started, time.perf_counter()),
+            "answer_chars": len(self.text),
+        }
@@ -0,0 +1 @@
+from .app import QueryService, SessionStore, create_app
\ No newline at end of file
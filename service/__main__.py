@@ -0,0 +1,30 @@
+"""
+Run the HTTP query service: python -m service [--host HOST] [--port PORT]
+Serves the index in ./faiss_index, so start it from the app's directory.
+"""
+
+import argparse
+import logging
+
+from aiohttp import web
+
+from config.config import CONFIG
+from telemetry.progress import LogReporter, set_default_reporter
+
+from .app import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m service", description="Async HTTP query service")
+    parser.add_argument("--host", default=CONFIG["SERVICE_HOST"])
+    parser.add_argument("--port", type=int, default=CONFIG["SERVICE_PORT"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # No Streamlit page here: index loading and chain setup report to the log
+    set_default_reporter(LogReporter())
+    web.run_app(create_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
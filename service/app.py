@@ -0,0 +1,382 @@
+"""
+Query Service Module
+Asyncio HTTP front end (aiohttp) for the same retrieval chain the Streamlit app uses.
+
+- Sessions are keyed by ID; each holds its own chain and memory over the shared,
+  read-only index (vectorstore/shared_index.py) and expires after a TTL. Sessions
+  with a question running or queued are never evicted; when SERVICE_MAX_SESSIONS
+  are all busy, new sessions are rejected with 503 + Retry-After.
+- Chains run through their async API: LLM calls use the async Azure client, while
+  FAISS / BM25 search and re-ranking run on a bounded thread pool.
+- Backpressure: SERVICE_MAX_CONCURRENCY questions run at once, SERVICE_MAX_QUEUE
+  more wait (including those waiting behind an earlier question of their session),
+  anything beyond that is rejected with 503 + Retry-After. A question that times
+  out keeps its slot until the pool threads it started have returned.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from config.config import CONFIG
+from conversation.conversation_chain import create_optimized_conversation_chain
+from query.answer_cache import answer_scope, open_answer_cache
+from query.streaming import StreamingAnswerHandler
+from telemetry import metrics
+from vectorstore.embeddings import BackendMismatchError
+from vectorstore.shared_index import SessionHandle, open_shared_index
+
+logger = logging.getLogger(__name__)
+
+MAX_QUESTION_CHARS = 4000
+SOURCE_EXCERPT_CHARS = 400
+
+# Pool futures submitted while answering the current question
+_pending_calls: ContextVar[Optional[Set[Future]]] = ContextVar("pending_calls", default=None)
+
+
+class TrackingExecutor(ThreadPoolExecutor):
+    """
+    Thread pool that records each call against the question that submitted it,
+    since cancelling the awaiting coroutine does not stop a running thread
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        pending = _pending_calls.get()
+        if pending is not None:
+            pending.add(future)
+            future.add_done_callback(pending.discard)
+        return future
+
+
+class QuerySession:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.handle = SessionHandle(session_id)
+        self.conversation = None
+        self.vectorstore = None
+        # Last turns for answer-cache scoping; the chain's memory is kept separately
+        self.history: List[BaseMessage] = []
+        # Questions within one session are answered in order so memory stays consistent
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class SessionsFull(Exception):
+    pass
+
+
+class SessionStore:
+    """
+    LRU of sessions with an idle TTL
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, QuerySession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_or_create(self, session_id: Optional[str]) -> Tuple[QuerySession, bool]:
+        session = self._sessions.get(session_id) if session_id else None
+        created = session is None
+        if created:
+            if len(self._sessions) >= self.max_sessions and not self._evict_idle():
+                raise SessionsFull()
+            session = QuerySession(session_id or uuid.uuid4().hex)
+            self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        session.last_used = time.monotonic()
+        return session, created
+
+    def _evict_idle(self) -> bool:
+        """
+        Drop the least recently used session that has no question running or queued
+        """
+        for session_id, session in self._sessions.items():
+            if not session.lock.locked():
+                del self._sessions[session_id]
+                return True
+        return False
+
+    def drop(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def expire(self) -> int:
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session.last_used < cutoff and not session.lock.locked()
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+
+def _source_record(doc) -> Dict:
+    return {
+        "source": doc.metadata.get("source"),
+        "page_start": doc.metadata.get("page_start"),
+        "page_end": doc.metadata.get("page_end"),
+        "chunk_id": doc.metadata.get("chunk_id"),
+        "excerpt": doc.page_content[:SOURCE_EXCERPT_CHARS],
+    }
+
+
+class Overloaded(Exception):
+    pass
+
+
+class QueryService:
+    def __init__(self):
+        self.shared_index = open_shared_index()
+        self.sessions = SessionStore(CONFIG["SERVICE_MAX_SESSIONS"], CONFIG["SERVICE_SESSION_TTL_SECONDS"])
+        self.executor = TrackingExecutor(max_workers=CONFIG["SERVICE_SEARCH_THREADS"], thread_name_prefix="query-search")
+        self.max_concurrency = CONFIG["SERVICE_MAX_CONCURRENCY"]
+        self.max_queue = CONFIG["SERVICE_MAX_QUEUE"]
+        self.timeout = CONFIG["SERVICE_REQUEST_TIMEOUT_SECONDS"]
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.answered = 0
+        self._draining: Set[asyncio.Task] = set()
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _ensure_chain(self, session: QuerySession):
+        if session.conversation is not None and not self.shared_index.is_stale(session.handle):
+            return
+        try:
+            vectorstore = await self._run_blocking(self.shared_index.attach, session.handle)
+        except BackendMismatchError:
+            # Drop the chain over the previous version too: the index on disk is not queryable
+            session.conversation = None
+            raise web.HTTPServiceUnavailable(reason="Index was built with a different embedding backend")
+        if vectorstore is None:
+            raise web.HTTPServiceUnavailable(reason="No index has been built yet")
+        # A session that outlives an index update keeps its conversation
+        memory = session.conversation.memory if session.conversation is not None else None
+        session.conversation = await self._run_blocking(create_optimized_conversation_chain, vectorstore, memory)
+        session.vectorstore = vectorstore
+
+    async def _cached(self, session: QuerySession, scope: str, question: str):
+        cache = open_answer_cache(
+            CONFIG["ANSWER_CACHE_MAX_ENTRIES"],
+            CONFIG["ANSWER_CACHE_TTL_SECONDS"],
+            CONFIG["ANSWER_CACHE_SIMILARITY"]
+        )
+        if cache is None:
+            return None, None, None
+        entry, vector = await self._run_blocking(cache.lookup, scope, question, session.vectorstore.embeddings.embed_query)
+        return cache, entry, vector
+
+    async def _answer(self, session: QuerySession, question: str) -> Dict:
+        await self._ensure_chain(session)
+        turns = CONFIG["ANSWER_CACHE_CONTEXT_TURNS"]
+        scope = answer_scope(self.shared_index.version(), session.history[-2 * turns:] if turns > 0 else [])
+        with metrics.span("query.cache_lookup"):
+            cache, entry, vector = await self._cached(session, scope, question)
+
+        if entry is not None:
+            await self._run_blocking(
+                session.conversation.memory.save_context, {"question": question}, {"answer": entry["answer"]}
+            )
+            answer, documents = entry["answer"], entry["source_documents"]
+            result = {"cached": entry["match"], "timings": {}}
+        else:
+            handler = StreamingAnswerHandler(lambda token, text: None)
+            response = await session.conversation.ainvoke({"question": question}, config={"callbacks": [handler]})
+            answer, documents = response["answer"], response.get("source_documents", [])
+            if cache is not None:
+                cache.store(scope, question, answer, documents, vector)
+            result = {"cached": None, "timings": handler.metrics()}
+
+        session.history = (session.history + [HumanMessage(content=question), AIMessage(content=answer)])[-2 * max(turns, 1):]
+        result.update(answer=answer, sources=[_source_record(doc) for doc in documents])
+        return result
+
+    async def ask(self, session: QuerySession, question: str) -> Dict:
+        """
+        Answer within the concurrency limit, waiting in the bounded queue if needed.
+        Waiting for the session's previous question counts as queued, so one client
+        cannot pile up requests behind its own session lock.
+        """
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            raise Overloaded()
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await session.lock.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                session.lock.release()
+                raise
+        finally:
+            self.waiting -= 1
+        queue_ms = (time.perf_counter() - queued) * 1000
+        self.in_flight += 1
+        pending: Set[Future] = set()
+        token = _pending_calls.set(pending)
+        try:
+            result = await asyncio.wait_for(self._answer(session, question), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            _pending_calls.reset(token)
+            self._release_when_idle(session, pending)
+        self.answered += 1
+        result["timings"]["queue_ms"] = queue_ms
+        metrics.record_query(result["timings"], result["cached"] is not None)
+        return result
+
+    def _release(self, session: QuerySession):
+        self.in_flight -= 1
+        self._slots.release()
+        session.lock.release()
+
+    def _release_when_idle(self, session: QuerySession, pending: Set[Future]):
+        """
+        Free the slot and the session now, or (after a timeout or disconnect) once
+        the pool threads the question started have returned
+        """
+        running = [future for future in list(pending) if not future.done()]
+        if not running:
+            self._release(session)
+            return
+        task = asyncio.get_running_loop().create_task(self._release_after(session, running))
+        self._draining.add(task)
+        task.add_done_callback(self._draining.discard)
+
+    async def _release_after(self, session: QuerySession, running: List[Future]):
+        await asyncio.wait([asyncio.wrap_future(future) for future in running])
+        self._release(session)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "answered": self.answered,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "sessions": len(self.sessions),
+            "index": self.shared_index.stats(),
+        }
+
+
+SERVICE_KEY = web.AppKey("query_service", QueryService)
+
+
+def _get_or_create_session(service: QueryService, session_id: Optional[str]) -> Tuple[QuerySession, bool]:
+    try:
+        return service.sessions.get_or_create(session_id)
+    except SessionsFull:
+        service.rejected += 1
+        raise web.HTTPServiceUnavailable(reason="Every session is busy", headers={"Retry-After": "1"})
+
+
+async def handle_query(request: web.Request) -> web.Response:
+    service = request.app[SERVICE_KEY]
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="Body must be JSON")
+    question = body.get("question") if isinstance(body, dict) else None
+    if not isinstance(question, str) or not question.strip():
+        raise web.HTTPBadRequest(reason="'question' must be a non-empty string")
+    if len(question) > MAX_QUESTION_CHARS:
+        raise web.HTTPRequestEntityTooLarge(max_size=MAX_QUESTION_CHARS, actual_size=len(question))
+
+    session, created = _get_or_create_session(service, body.get("session_id"))
+    try:
+        result = await service.ask(session, question.strip())
+    except Overloaded:
+        raise web.HTTPServiceUnavailable(reason="Too many questions in flight", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise web.HTTPGatewayTimeout(reason="Answer took longer than SERVICE_REQUEST_TIMEOUT_SECONDS")
+    return web.json_response(dict(result, session_id=session.session_id, new_session=created))
+
+
+async def handle_create_session(request: web.Request) -> web.Response:
+    session, _ = _get_or_create_session(request.app[SERVICE_KEY], None)
+    return web.json_response({"session_id": session.session_id}, status=201)
+
+
+async def handle_delete_session(request: web.Request) -> web.Response:
+    if not request.app[SERVICE_KEY].sessions.drop(request.match_info["session_id"]):
+        raise web.HTTPNotFound(reason="Unknown session")
+    return web.Response(status=204)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """
+    Prometheus text: pipeline metrics (when METRICS_ENABLED) plus the service's own load gauges
+    """
+    stats = request.app[SERVICE_KEY].stats()
+    lines = []
+    for key, suffix, kind in (
+        ("in_flight", "", "gauge"), ("waiting", "", "gauge"), ("sessions", "", "gauge"),
+        ("answered", "_total", "counter"), ("rejected", "_total", "counter"), ("timeouts", "_total", "counter"),
+    ):
+        name = f"{metrics.PREFIX}service_{key}{suffix}"
+        lines += [f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+    body = "\n".join(lines) + "\n" + metrics.render_prometheus()
+    return web.Response(text=body, content_type="text/plain", charset="utf-8")
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    stats = request.app[SERVICE_KEY].stats()
+    return web.json_response(dict(stats, ok=stats["index"]["loaded"]), status=200 if stats["index"]["loaded"] else 503)
+
+
+async def _expire_sessions(service: QueryService):
+    while True:
+        await asyncio.sleep(60)
+        expired = service.sessions.expire()
+        if expired:
+            logger.info("Expired %d idle sessions (%d left)", expired, len(service.sessions))
+
+
+async def _lifecycle(app: web.Application):
+    service = QueryService()
+    app[SERVICE_KEY] = service
+    # Sync retrievers called through the async chain API run on the loop's default executor
+    asyncio.get_running_loop().set_default_executor(service.executor)
+    try:
+        if await service._run_blocking(service.shared_index.get) is None:
+            logger.warning("No index found; /v1/query returns 503 until one is built")
+    except BackendMismatchError as e:
+        logger.error("%s /v1/query returns 503 until it is rebuilt", e)
+    expiry = asyncio.create_task(_expire_sessions(service))
+    yield
+    expiry.cancel()
+    service.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def create_app() -> web.Application:
+    app = web.Application(client_max_size=64 * 1024)
+    app.cleanup_ctx.append(_lifecycle)
+    app.router.add_post("/v1/query", handle_query)
+    app.router.add_post("/v1/sessions", handle_create_session)
+    app.router.add_delete("/v1/sessions/{session_id}", handle_delete_session)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
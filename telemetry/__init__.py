@@ -0,0 +1 @@
+from .metrics import cache_lookup, count, current_rss_mb, drain, enabled, log_summary, merge, observe, record_query, render_prometheus, reset, set_enabled, set_gauge, snapshot, span, start_metrics_server, timed
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""
+LLM call metrics: tokens in / out, calls and latency per client role
+("answer", "condense"), recorded from LangChain callbacks
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from . import metrics
+
+
+def _estimate_tokens(text: str) -> int:
+    from conversation.context_packer import count_tokens
+    return count_tokens(text) if text else 0
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Attached to a chat client, so it sees every call made through it. Streaming
+    responses carry no usage block, so tokens are then counted from the prompt
+    and the streamed tokens.
+    """
+
+    run_inline = True
+
+    def __init__(self, role: str):
+        self.role = role
+        self._runs: Dict[UUID, Tuple[float, List[Any], int]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        if metrics.enabled():
+            self._runs[run_id] = (time.perf_counter(), messages, 0)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        state = self._runs.get(run_id)
+        if state is not None:
+            self._runs[run_id] = (state[0], state[1], state[2] + 1)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        state = self._runs.pop(run_id, None)
+        if state is None:
+            return
+        started, messages, streamed = state
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        message = getattr(response.generations[0][0], "message", None) if response.generations and response.generations[0] else None
+        usage_metadata = getattr(message, "usage_metadata", None) or {}
+
+        tokens_in = usage.get("prompt_tokens") or usage_metadata.get("input_tokens") or sum(
+            _estimate_tokens(str(m.content)) for batch in messages for m in batch
+        )
+        tokens_out = usage.get("completion_tokens") or usage_metadata.get("output_tokens") or streamed or sum(
+            _estimate_tokens(g.text) for batch in response.generations for g in batch
+        )
+        metrics.count("llm_calls_total", role=self.role)
+        metrics.count("llm_tokens_total", tokens_in, role=self.role, direction="in")
+        metrics.count("llm_tokens_total", tokens_out, role=self.role, direction="out")
+        metrics.observe(metrics.STAGE_SECONDS, time.perf_counter() - started, stage=f"llm.{self.role}")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        if self._runs.pop(run_id, None) is not None:
+            metrics.count("stage_errors_total", stage=f"llm.{self.role}")
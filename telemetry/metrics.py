@@ -0,0 +1,388 @@
+"""
+Metrics Module
+Timing spans and counters around the pipeline stages (OCR, chunking, embedding,
+index build, retrieval, generation), kept in one process-wide registry and
+exported as a log summary or Prometheus text.
+- span("ocr.tesseract") times a block into the rag_stage_seconds histogram;
+  count() / observe() / set_gauge() record tokens, chunks, cache hits, memory.
+- With METRICS_ENABLED off every call returns at the first check and span()
+  hands back one shared no-op context manager.
+- OCR worker processes record into their own registry; drain() ships the
+  deltas back with each page and merge() folds them into the parent's.
+"""
+
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Optional, Tuple
+
+from config.config import CONFIG
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("telemetry")
+
+PREFIX = "rag_"
+STAGE_SECONDS = "stage_seconds"
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+HELP = {
+    "stage_seconds": "Wall time per pipeline stage",
+    "query_seconds": "Per-question latency by phase (queue, retrieval, ttft, generation, total)",
+    "llm_tokens_total": "LLM tokens by direction (in = prompt, out = completion)",
+    "llm_calls_total": "LLM calls",
+    "embedding_texts_total": "Texts sent to the embedding model",
+    "embedding_tokens_total": "Estimated tokens sent to the embedding model",
+    "embedding_retries_total": "Embedding batches retried, by whether the API rate-limited them",
+    "chunks_total": "Chunks produced or retrieved, by stage",
+    "pages_total": "Pages processed, by stage",
+    "cache_lookups_total": "Cache lookups by cache and result",
+    "condense_total": "Follow-up questions condensed or passed through",
+    "rerank_fallbacks_total": "Re-rankings abandoned for exceeding their latency budget",
+    "context_tokens_total": "Tokens of retrieved context sent to the answer prompt",
+    "stage_errors_total": "Stages that raised",
+    "index_vectors_decoded_total": "Vectors compaction decoded from the index for lack of an exact copy",
+    "peak_rss_mb": "Peak resident memory of the process",
+}
+
+_NOOP_SPAN = nullcontext()
+_enabled = CONFIG["METRICS_ENABLED"]
+_log_spans = CONFIG["METRICS_LOG_SPANS"]
+_process = "main"
+
+INF_BUCKET = 'le="+Inf"'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(flag: bool, log_spans: Optional[bool] = None):
+    """
+    Turn recording on or off at runtime (CLIs, benchmarks, worker initializers)
+    """
+    global _enabled, _log_spans
+    _enabled = flag
+    if log_spans is not None:
+        _log_spans = log_spans
+
+
+def set_process_label(name: str):
+    """
+    Label this process's peak-memory gauge (e.g. "ocr_worker")
+    """
+    global _process
+    _process = name
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def current_rss_mb() -> float:
+    """
+    Current resident set size of the process in MB (peak RSS where /proc is unavailable)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: Dict) -> LabelKey:
+    return tuple(sorted((key, str(value).lower() if isinstance(value, bool) else str(value)) for key, value in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("count", "sum", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(SECONDS_BUCKETS)
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(SECONDS_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+    def merge(self, other: Dict):
+        self.count += other["count"]
+        self.sum += other["sum"]
+        self.max = max(self.max, other["max"])
+        self.buckets = [a + b for a, b in zip(self.buckets, other["buckets"])]
+
+    def as_dict(self) -> Dict:
+        return {"count": self.count, "sum": self.sum, "max": self.max, "buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges (kept at their maximum) and histograms keyed by (name, labels)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self.histograms: Dict[Tuple[str, LabelKey], _Histogram] = {}
+
+    def count(self, name: str, value: float, labels: LabelKey):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def gauge(self, name: str, value: float, labels: LabelKey, keep_max: bool = False):
+        with self._lock:
+            key = (name, labels)
+            self.gauges[key] = max(self.gauges.get(key, value), value) if keep_max else value
+
+    def observe(self, name: str, value: float, labels: LabelKey):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = _Histogram()
+            histogram.add(value)
+
+    def drain(self) -> Dict:
+        """
+        Everything recorded so far, as plain data, and reset
+        """
+        with self._lock:
+            delta = {
+                "counters": list(self.counters.items()),
+                "gauges": list(self.gauges.items()),
+                "histograms": [(key, histogram.as_dict()) for key, histogram in self.histograms.items()],
+            }
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+        return delta
+
+    def merge(self, delta: Dict):
+        with self._lock:
+            for key, value in delta["counters"]:
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, value in delta["gauges"]:
+                self.gauges[key] = max(self.gauges.get(key, value), value)
+            for key, data in delta["histograms"]:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = _Histogram()
+                histogram.merge(data)
+
+    def snapshot(self) -> Dict:
+        def name(key: Tuple[str, LabelKey]) -> str:
+            metric, labels = key
+            return metric + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        with self._lock:
+            return {
+                "counters": {name(key): value for key, value in sorted(self.counters.items())},
+                "gauges": {name(key): value for key, value in sorted(self.gauges.items())},
+                "histograms": {
+                    name(key): {"count": h.count, "sum": h.sum, "mean": h.sum / h.count if h.count else 0.0, "max": h.max}
+                    for key, h in sorted(self.histograms.items())
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        def labels_text(labels: LabelKey, extra: str = "") -> str:
+            parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+            if extra:
+                parts.append(extra)
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for metric in sorted({name for name, _ in series}):
+                    lines.append(f"# HELP {PREFIX}{metric} {HELP.get(metric, metric)}")
+                    lines.append(f"# TYPE {PREFIX}{metric} {kind}")
+                    for (name, labels), value in sorted(series.items()):
+                        if name == metric:
+                            lines.append(f"{PREFIX}{metric}{labels_text(labels)} {value:g}")
+            for metric in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# HELP {PREFIX}{metric} {HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {PREFIX}{metric} histogram")
+                for (name, labels), h in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    # Stored per bucket as "value <= bound", which is already cumulative
+                    for bound, bucket_count in zip(SECONDS_BUCKETS, h.buckets):
+                        le = 'le="%g"' % bound
+                        lines.append(f"{PREFIX}{metric}_bucket{labels_text(labels, le)} {bucket_count}")
+                    lines.append(f"{PREFIX}{metric}_bucket{labels_text(labels, INF_BUCKET)} {h.count}")
+                    lines.append(f"{PREFIX}{metric}_sum{labels_text(labels)} {h.sum:g}")
+                    lines.append(f"{PREFIX}{metric}_count{labels_text(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Span:
+    __slots__ = ("stage", "labels", "start")
+
+    def __init__(self, stage: str, labels: LabelKey):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        labels = (("stage", self.stage),) + self.labels
+        REGISTRY.observe(STAGE_SECONDS, seconds, labels)
+        REGISTRY.gauge("peak_rss_mb", _peak_rss_mb(), (("process", _process),), keep_max=True)
+        if exc_type is not None:
+            REGISTRY.count("stage_errors_total", 1, labels)
+        if _log_spans:
+            logger.info("span %s %.1f ms%s", self.stage, seconds * 1000, "".join(f" {k}={v}" for k, v in self.labels))
+        return False
+
+
+def span(stage: str, **labels):
+    """
+    Context manager timing one stage; a shared no-op when metrics are disabled
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(stage, _labels(labels))
+
+
+def timed(stage: str):
+    """
+    Decorator form of span()
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(stage, ()):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: float = 1, **labels):
+    if _enabled and value:
+        REGISTRY.count(name, value, _labels(labels))
+
+
+def observe(name: str, value: float, **labels):
+    if _enabled:
+        REGISTRY.observe(name, value, _labels(labels))
+
+
+def set_gauge(name: str, value: float, **labels):
+    if _enabled:
+        REGISTRY.gauge(name, value, _labels(labels))
+
+
+def cache_lookup(cache: str, hits: int, misses: int):
+    """
+    Count hits and misses of one of the caches (ocr, embedding, answer, rerank)
+    """
+    if _enabled:
+        count("cache_lookups_total", hits, cache=cache, result="hit")
+        count("cache_lookups_total", misses, cache=cache, result="miss")
+
+
+def record_query(timings: Dict[str, Optional[float]], cached: bool):
+    """
+    Per-question latencies from StreamingAnswerHandler.metrics() (milliseconds)
+    """
+    if not _enabled:
+        return
+    for phase in ("queue", "retrieval", "ttft", "generation", "total"):
+        value = timings.get(f"{phase}_ms")
+        if value is not None:
+            REGISTRY.observe("query_seconds", value / 1000, _labels({"phase": phase, "cached": cached}))
+
+
+def drain() -> Optional[Dict]:
+    """
+    Worker side: this process's metrics since the last drain (None when disabled)
+    """
+    return REGISTRY.drain() if _enabled else None
+
+
+def merge(delta: Optional[Dict]):
+    if delta:
+        REGISTRY.merge(delta)
+
+
+def reset():
+    REGISTRY.drain()
+
+
+def snapshot() -> Dict:
+    return REGISTRY.snapshot()
+
+
+def render_prometheus() -> str:
+    REGISTRY.gauge("peak_rss_mb", _peak_rss_mb(), (("process", _process),), keep_max=True)
+    return REGISTRY.render_prometheus()
+
+
+def log_summary(title: str = "metrics"):
+    """
+    One log line per stage (count / total / mean / max) plus counters and gauges
+    """
+    if not _enabled:
+        return
+    data = snapshot()
+    for name, h in data["histograms"].items():
+        logger.info("%s %s: n=%d total=%.2fs mean=%.1fms max=%.1fms", title, name, h["count"], h["sum"], h["mean"] * 1000, h["max"] * 1000)
+    for name, value in list(data["counters"].items()) + list(data["gauges"].items()):
+        logger.info("%s %s: %g", title, name, value)
+
+
+@functools.lru_cache(maxsize=None)
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """
+    Serve GET /metrics (Prometheus text) from a daemon thread; once per process and port
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving Prometheus metrics on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,219 @@
+"""
+Progress Reporting Module
+Ingestion and chain setup report status through a reporter instead of calling
+Streamlit directly, so the same code runs in the app and headless:
+- "streamlit": st.info / st.progress / st.expander (the app's default)
+- "log": the logging module
+- "tqdm": progress bars on stderr, messages above them
+- "json": one JSON event per line on stdout, for orchestration tools
+The active reporter is per context (thread / task), see use_reporter;
+headless processes can replace the Streamlit default with set_default_reporter.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Optional, Union
+
+logger = logging.getLogger("ingest")
+
+
+class ProgressBar:
+    def progress(self, fraction: float):
+        pass
+
+    def empty(self):
+        pass
+
+
+class ProgressReporter:
+    """
+    Base reporter: every message is an event; subclasses decide how to show it
+    """
+
+    def event(self, kind: str, message: str = "", **fields: Any):
+        pass
+
+    def info(self, message: str):
+        self.event("info", message)
+
+    def success(self, message: str):
+        self.event("success", message)
+
+    def warning(self, message: str):
+        self.event("warning", message)
+
+    def error(self, message: str):
+        self.event("error", message)
+
+    def details(self, title: str, content: Union[dict, Iterable[str]]):
+        """
+        Supplementary output (build reports, sample results) that the app folds into an expander
+        """
+        self.event("details", title, content=content if isinstance(content, dict) else list(content))
+
+    def progress(self, task: str) -> ProgressBar:
+        return ProgressBar()
+
+
+class StreamlitReporter(ProgressReporter):
+    def info(self, message: str):
+        import streamlit as st
+        st.info(message)
+
+    def success(self, message: str):
+        import streamlit as st
+        st.success(message)
+
+    def warning(self, message: str):
+        import streamlit as st
+        st.warning(message)
+
+    def error(self, message: str):
+        import streamlit as st
+        st.error(message)
+
+    def details(self, title: str, content: Union[dict, Iterable[str]]):
+        import streamlit as st
+        with st.expander(title):
+            if isinstance(content, dict):
+                st.json(content)
+            else:
+                for line in content:
+                    st.write(line)
+
+    def progress(self, task: str) -> ProgressBar:
+        import streamlit as st
+        return st.progress(0)
+
+
+class _LogBar(ProgressBar):
+    def __init__(self, task: str, step: int = 10):
+        self.task = task
+        self.step = step
+        self.next = step
+
+    def progress(self, fraction: float):
+        # One line per 10% rather than one per batch
+        percent = round(fraction * 100)
+        if percent >= self.next:
+            logger.info("%s: %d%%", self.task, percent)
+            self.next = (percent // self.step + 1) * self.step
+
+
+class LogReporter(ProgressReporter):
+    LEVELS = {"info": logging.INFO, "success": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+    def event(self, kind: str, message: str = "", **fields: Any):
+        if kind == "details":
+            logger.debug("%s: %s", message, json.dumps(fields.get("content"), ensure_ascii=False, default=str))
+        elif kind in self.LEVELS:
+            logger.log(self.LEVELS[kind], "%s", message)
+        else:
+            logger.info("%s %s %s", kind, message, json.dumps(fields, ensure_ascii=False, default=str))
+
+    def progress(self, task: str) -> ProgressBar:
+        return _LogBar(task)
+
+
+class _TqdmBar(ProgressBar):
+    def __init__(self, task: str):
+        from tqdm import tqdm
+        self.bar = tqdm(total=1000, desc=task, unit="‰", leave=False, file=sys.stderr)
+
+    def progress(self, fraction: float):
+        self.bar.update(int(fraction * 1000) - self.bar.n)
+
+    def empty(self):
+        self.bar.close()
+
+
+class TqdmReporter(ProgressReporter):
+    def event(self, kind: str, message: str = "", **fields: Any):
+        if kind == "details":
+            return
+        from tqdm import tqdm
+        suffix = f" {json.dumps(fields, ensure_ascii=False, default=str)}" if fields else ""
+        tqdm.write(f"{message}{suffix}" if message else f"{kind}{suffix}", file=sys.stderr)
+
+    def progress(self, task: str) -> ProgressBar:
+        return _TqdmBar(task)
+
+
+class _JsonBar(ProgressBar):
+    def __init__(self, reporter: "JsonEventReporter", task: str):
+        self.reporter = reporter
+        self.task = task
+        self.last = -1.0
+
+    def progress(self, fraction: float):
+        # At most one event per percent
+        if fraction - self.last >= 0.01 or fraction >= 1.0:
+            self.last = fraction
+            self.reporter.event("progress", task=self.task, fraction=round(fraction, 4))
+
+
+class JsonEventReporter(ProgressReporter):
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        # Embedding progress can arrive from batch worker threads
+        self._lock = threading.Lock()
+
+    def event(self, kind: str, message: str = "", **fields: Any):
+        record = {"time": round(time.time(), 3), "event": kind}
+        if message:
+            record["message"] = message
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def progress(self, task: str) -> ProgressBar:
+        return _JsonBar(self, task)
+
+
+REPORTERS = {
+    "streamlit": StreamlitReporter,
+    "log": LogReporter,
+    "tqdm": TqdmReporter,
+    "json": JsonEventReporter,
+}
+
+_current: ContextVar[Optional[ProgressReporter]] = ContextVar("progress_reporter", default=None)
+_default = StreamlitReporter()
+
+
+def get_reporter() -> ProgressReporter:
+    return _current.get() or _default
+
+
+def set_default_reporter(reporter: ProgressReporter):
+    """
+    Process-wide fallback for headless processes, where work also runs on threads
+    that do not inherit the use_reporter context
+    """
+    global _default
+    _default = reporter
+
+
+@contextmanager
+def use_reporter(reporter: ProgressReporter):
+    """
+    Route ingestion progress to reporter for the duration of the block
+    """
+    token = _current.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current.reset(token)
+
+
+def create_reporter(name: str) -> ProgressReporter:
+    if name not in REPORTERS:
+        raise ValueError(f"Unknown progress reporter: {name!r} (expected one of {tuple(REPORTERS)})")
+    return REPORTERS[name]()
@@ -1 +1,8 @@
-from .faiss_vectorstore import create_faiss_vectorstore, load_existing_faiss_index
\ No newline at end of file
+from .faiss_vectorstore import create_faiss_vectorstore, load_existing_faiss_index, remove_from_faiss_index, update_faiss_index
+from .embedding_cache import CachedEmbeddings, EmbeddingCache, open_embedding_cache
+from .embedding_batcher import BatchedEmbeddings
+from .embeddings import BackendMismatchError, create_embeddings, embedding_backend_info
+from .index_builder import build_faiss_index, build_vectorstore, recall_report
+from .incremental import compact_index, load_manifest, remove_document, replay_deltas, upsert_document
+from .index_store import load_index, save_index
+from .shared_index import SessionHandle, SharedIndex, open_shared_index
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Embedding Batcher Module
+Concurrent, rate-limit-aware batching for embedding APIs.
+Batches run on a bounded thread pool, are throttled by a tokens-per-minute bucket,
+and are retried with exponential backoff (honouring Retry-After on 429s). A batch
+that still fails after all retries raises instead of silently dropping documents.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from telemetry import metrics
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tokenizer unavailable offline: fall back to a character estimate
+    _ENCODING = None
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def estimate_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // 3)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) / (1000 if name.endswith("-ms") else 1)
+            except ValueError:
+                pass
+    return None
+
+
+class TokenBucket:
+    """
+    Thread-safe tokens-per-minute limiter (tokens_per_minute <= 0 disables it)
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+
+    def acquire(self, tokens: int):
+        if self.capacity <= 0:
+            return
+        # A single request larger than the whole budget waits for a full bucket
+        tokens = min(float(tokens), self.capacity)
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                self.condition.wait((tokens - self.tokens) / self.rate)
+
+    def penalize(self, seconds: float):
+        """
+        Drain the bucket after a 429 so other threads back off too
+        """
+        if self.capacity <= 0:
+            return
+        with self.condition:
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+            self.updated = time.monotonic()
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that embeds documents in concurrent, throttled, retried batches
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        tokens_per_minute: int = 0,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        progress_callback: Optional[ProgressCallback] = None,
+    ):
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.progress_callback = progress_callback
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(text) for text in texts)
+        attempt = 0
+        while True:
+            self.bucket.acquire(tokens)
+            try:
+                with metrics.span("embedding.batch"):
+                    vectors = self.embeddings.embed_documents(texts)
+                metrics.count("embedding_texts_total", len(texts))
+                metrics.count("embedding_tokens_total", tokens)
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt)) * (0.5 + random.random() / 2)
+                metrics.count("embedding_retries_total", rate_limited=is_rate_limit_error(e))
+                if is_rate_limit_error(e):
+                    self.rate_limited += 1
+                    delay = max(delay, retry_after_seconds(e) or 0.0)
+                    self.bucket.penalize(delay)
+                self.retries += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results: Dict[int, List[List[float]]] = {}
+        done = 0
+
+        with metrics.span("embedding"), ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = {executor.submit(self._embed_batch, batch): i for i, batch in enumerate(batches)}
+            failures = []
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    failures.append((index, e))
+                    continue
+                done += len(batches[index])
+                if self.progress_callback:
+                    self.progress_callback(done, len(texts))
+
+        if failures:
+            index, error = failures[0]
+            raise RuntimeError(
+                f"{len(failures)} of {len(batches)} embedding batches failed after "
+                f"{self.max_retries} retries (first failure: batch {index + 1}: {error})"
+            ) from error
+
+        vectors = []
+        for i in range(len(batches)):
+            vectors.extend(results[i])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
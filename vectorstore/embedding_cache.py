@@ -0,0 +1,194 @@
+"""
+Embedding Cache Module
+Content-addressed, persistent cache of chunk embeddings.
+Vectors live in an append-only float32 file that is read through a memory map;
+a small SQLite index maps hash(normalized text + deployment + API version) to a row.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from telemetry import metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    row INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalization applied before hashing so whitespace/Unicode variants share an entry
+    """
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def embedding_namespace(deployment: str, api_version: str) -> str:
+    return f"{deployment}|{api_version}"
+
+
+def make_embedding_key(text: str, namespace: str) -> str:
+    return hashlib.sha256(f"{namespace}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding store for one embedding model (namespace)
+    """
+
+    def __init__(self, cache_dir: str, namespace: str):
+        self.namespace = namespace
+        self.directory = os.path.join(cache_dir, hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:16])
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.db_path = os.path.join(self.directory, "index.sqlite3")
+        self._local = threading.local()
+        self._mmap = None
+        self._mmap_rows = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._connect().executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _meta(self, conn: sqlite3.Connection, name: str) -> Optional[int]:
+        row = conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _vectors(self, rows_needed: int, dim: int) -> np.ndarray:
+        """
+        Memory map of the vector file, remapped only when it has grown
+        """
+        with self._lock:
+            if self._mmap is None or self._mmap_rows < rows_needed:
+                rows = os.path.getsize(self.vectors_path) // (dim * 4)
+                self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, dim))
+                self._mmap_rows = rows
+            return self._mmap
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached vectors; returns only the keys that were found
+        """
+        if not keys:
+            return {}
+        conn = self._connect()
+        dim = self._meta(conn, "dim")
+        found = {}
+        if dim:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT key, row FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall())
+        vectors = {}
+        if found:
+            mmap = self._vectors(max(found.values()) + 1, dim)
+            vectors = {key: mmap[row].tolist() for key, row in found.items()}
+        return vectors
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """
+        Append new vectors; the SQLite write transaction serialises writers across processes
+        """
+        if not items:
+            return
+        matrix = np.asarray(list(items.values()), dtype=np.float32)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dim = self._meta(conn, "dim")
+            if dim is None:
+                dim = matrix.shape[1]
+                conn.execute("INSERT INTO meta (name, value) VALUES ('dim', ?)", (dim,))
+                conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('rows', 0)")
+            if matrix.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match cache dimension {dim}")
+            rows = self._meta(conn, "rows") or 0
+            with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                f.seek(rows * dim * 4)
+                f.write(matrix.tobytes())
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, row) VALUES (?, ?)",
+                [(key, rows + i) for i, key in enumerate(items)],
+            )
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (rows + len(items),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only sends cache misses to the underlying model.
+    Hit/miss counters are per wrapper, i.e. per ingest.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [make_embedding_key(text, self.cache.namespace) for text in texts]
+        cached = self.cache.get_many(keys)
+        found = sum(1 for key in keys if key in cached)
+        self.hits += found
+        self.misses += len(keys) - found
+        metrics.cache_lookup("embedding", found, len(keys) - found)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def open_embedding_cache(cache_dir: str, namespace: str) -> Optional[EmbeddingCache]:
+    """
+    Shared EmbeddingCache for a directory and model namespace (None when disabled)
+    """
+    if not cache_dir:
+        return None
+    return EmbeddingCache(cache_dir, namespace)
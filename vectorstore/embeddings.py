@@ -0,0 +1,154 @@
+"""
+Embedding Backends Module
+Builds the embedding model selected by CONFIG["EMBEDDING_BACKEND"]:
+- "azure": Azure OpenAI embeddings (network)
+- "local": multilingual sentence-transformers model with batched, multi-threaded
+  CPU inference and optional ONNX / int8 execution (fully offline)
+Every index records the backend that built it so mismatched loads fail fast.
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Dict
+
+from langchain_core.embeddings import Embeddings
+
+from config.config import CONFIG
+from .embedding_cache import embedding_namespace
+
+BACKEND_FILE = "embedding_backend.json"
+
+
+def embedding_backend_info() -> Dict:
+    """
+    Identity of the configured embedding backend; two indexes are compatible only
+    if these match
+    """
+    backend = CONFIG["EMBEDDING_BACKEND"]
+    if backend == "azure":
+        return {
+            "backend": "azure",
+            "model": CONFIG["AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"],
+            "api_version": CONFIG["OPENAI_EMBEDDING_API_VERSION"],
+        }
+    if backend == "local":
+        return {
+            "backend": "local",
+            "model": CONFIG["LOCAL_EMBEDDING_MODEL"],
+            "runtime": CONFIG["LOCAL_EMBEDDING_RUNTIME"],
+            "onnx_file": CONFIG["LOCAL_EMBEDDING_ONNX_FILE"] if CONFIG["LOCAL_EMBEDDING_RUNTIME"] == "onnx" else None,
+        }
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend!r} (expected 'azure' or 'local')")
+
+
+def embedding_cache_namespace() -> str:
+    """
+    Namespace for the embedding cache; Azure keeps the deployment|api-version form
+    """
+    info = embedding_backend_info()
+    if info["backend"] == "azure":
+        return embedding_namespace(info["model"], info["api_version"])
+    return json.dumps(info, sort_keys=True)
+
+
+def is_backend_configured() -> bool:
+    if CONFIG["EMBEDDING_BACKEND"] == "local":
+        return bool(CONFIG["LOCAL_EMBEDDING_MODEL"])
+    return bool(CONFIG["AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"])
+
+
+def _create_azure_embeddings(max_retries: int = 2) -> Embeddings:
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    return AzureOpenAIEmbeddings(
+        azure_endpoint=CONFIG["AZURE_OPENAI_ENDPOINT"],
+        api_key=CONFIG["AZURE_OPENAI_API_KEY"],
+        azure_deployment=CONFIG["AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"],
+        openai_api_version=CONFIG["OPENAI_EMBEDDING_API_VERSION"],
+        chunk_size=50,
+        max_retries=max_retries,
+    )
+
+
+def _create_local_embeddings() -> Embeddings:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    threads = CONFIG["LOCAL_EMBEDDING_THREADS"]
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+    model_kwargs = {"device": "cpu"}
+    if CONFIG["LOCAL_EMBEDDING_RUNTIME"] == "onnx":
+        # sentence-transformers ONNX backend; point at a quantized (int8) export if configured
+        model_kwargs["backend"] = "onnx"
+        if CONFIG["LOCAL_EMBEDDING_ONNX_FILE"]:
+            model_kwargs["model_kwargs"] = {"file_name": CONFIG["LOCAL_EMBEDDING_ONNX_FILE"]}
+
+    return HuggingFaceEmbeddings(
+        model_name=CONFIG["LOCAL_EMBEDDING_MODEL"],
+        model_kwargs=model_kwargs,
+        encode_kwargs={
+            "batch_size": CONFIG["LOCAL_EMBEDDING_BATCH_SIZE"],
+            "normalize_embeddings": True,
+        },
+    )
+
+
+def create_embeddings(for_ingest: bool = False) -> Embeddings:
+    """
+    Create the configured embedding model. For ingest the Azure client leaves
+    retries to BatchedEmbeddings.
+    """
+    info = embedding_backend_info()
+    if info["backend"] == "local":
+        return _create_local_embeddings()
+    return _create_azure_embeddings(max_retries=0 if for_ingest else 2)
+
+
+@lru_cache(maxsize=None)
+def shared_embeddings() -> Embeddings:
+    """
+    Query-time embedding client shared by every session (one model / connection pool per process)
+    """
+    return create_embeddings()
+
+
+def save_backend_info(index_path: str, dimension: int):
+    info = dict(embedding_backend_info(), dimension=dimension)
+    with open(os.path.join(index_path, BACKEND_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+
+class BackendMismatchError(ValueError):
+    """
+    The index was embedded with a different backend or model than the one configured;
+    querying it would compare vectors from two different embedding spaces
+    """
+
+
+def check_backend_info(index_path: str):
+    """
+    Raise BackendMismatchError if the index at index_path was built with a different embedding backend
+    """
+    path = os.path.join(index_path, BACKEND_FILE)
+    if not os.path.exists(path):
+        # Indexes built before backends were recorded are Azure-only
+        recorded = {"backend": "azure"}
+    else:
+        with open(path, encoding="utf-8") as f:
+            recorded = json.load(f)
+
+    current = embedding_backend_info()
+    mismatched = [
+        key for key in ("backend", "model", "api_version", "runtime", "onnx_file")
+        if key in recorded and recorded.get(key) != current.get(key)
+    ]
+    if mismatched:
+        built_with = {key: recorded.get(key) for key in mismatched}
+        configured = {key: current.get(key) for key in mismatched}
+        raise BackendMismatchError(
+            f"Index '{index_path}' was built with embedding backend {built_with} but the current "
+            f"configuration is {configured}. Rebuild the index or change EMBEDDING_BACKEND."
+        )
@@ -1,103 +1,256 @@
-import streamlit as st
 from langchain.vectorstores import FAISS
-from langchain_openai import AzureOpenAIEmbeddings
 import os
 import time
 from config.config import CONFIG
-from typing import List
+from typing import Dict, List, Optional
 from langchain.schema import Document
+from telemetry.progress import get_reporter
+from telemetry import metrics
+from .embedding_cache import CachedEmbeddings, open_embedding_cache
+from .embeddings import check_backend_info, create_embeddings, embedding_backend_info, embedding_cache_namespace, save_backend_info, shared_embeddings
+from .embedding_batcher import BatchedEmbeddings
+from .index_builder import build_vectorstore, save_build_report
+from .index_store import has_legacy_index, has_saved_index, load_index, saved_generation
+from .sparse_index import build_sparse_index
+from .incremental import (
+    compact_index, is_unchanged, load_manifest, manifest_from_vectorstore, needs_compaction,
+    remove_document, replay_deltas, upsert_document
+)
 
-def create_faiss_vectorstore(documents: List[Document]) -> FAISS:
+INDEX_PATH = "faiss_index"
+# Loads that overlap a compaction (new base generation, delta log cleared) are retried
+LOAD_ATTEMPTS = 3
+
+def _ingest_embeddings(progress_bar):
+    """
+    Backend embeddings wrapped for ingest: batched/throttled, then cached
+    """
+    backend = embedding_backend_info()
+    # Retries and 429 backoff are handled by BatchedEmbeddings
+    embeddings = create_embeddings(for_ingest=True)
+    is_local = backend["backend"] == "local"
+    
+    # Misses are embedded in concurrent, throttled and retried batches
+    batcher = BatchedEmbeddings(
+        embeddings,
+        batch_size=CONFIG["EMBEDDING_BATCH_SIZE"],
+        # A local model already uses every core per batch; concurrency only helps remote APIs
+        max_concurrency=1 if is_local else CONFIG["EMBEDDING_MAX_CONCURRENCY"],
+        tokens_per_minute=0 if is_local else CONFIG["EMBEDDING_TPM_LIMIT"],
+        max_retries=CONFIG["EMBEDDING_MAX_RETRIES"],
+        progress_callback=lambda done, total: progress_bar.progress(done / total)
+    )
+    embeddings = batcher
+    
+    cache = open_embedding_cache(CONFIG["EMBEDDING_CACHE_DIR"], embedding_cache_namespace())
+    if cache is not None:
+        # Only chunks never embedded before are sent to the model
+        embeddings = CachedEmbeddings(embeddings, cache)
+    return embeddings, batcher
+
+def _report_embedding_stats(embeddings, batcher: BatchedEmbeddings):
+    report = get_reporter()
+    if batcher.retries:
+        report.info(f"🔁 Embedding retries: {batcher.retries} ({batcher.rate_limited} rate-limited)")
+    
+    if isinstance(embeddings, CachedEmbeddings):
+        cache_stats = embeddings.stats()
+        report.info(
+            f"🧠 Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} hit rate)"
+        )
+
+def attach_sparse_index(vectorstore: FAISS):
+    """
+    Build the BM25 index over every chunk in the store (saved with it by compact_index)
     """
-    Create FAISS vector store
+    with metrics.span("index.sparse"):
+        ids = [vectorstore.index_to_docstore_id[i] for i in sorted(vectorstore.index_to_docstore_id)]
+        texts = [vectorstore.docstore.search(doc_id).page_content for doc_id in ids]
+        vectorstore.sparse_index = build_sparse_index(ids, texts)
+
+def create_faiss_vectorstore(documents: List[Document], content_hashes: Optional[Dict[str, str]] = None) -> FAISS:
+    """
+    Create FAISS vector store from scratch.
+    content_hashes maps source name to file hash for the incremental-update manifest.
     """
     if not documents:
         raise ValueError("No documents to process")
     
-    st.info("🔄 Initializing Azure OpenAI embeddings for FAISS...")
+    report = get_reporter()
+    backend = embedding_backend_info()
+    report.info(f"🔄 Initializing {backend['backend']} embeddings ({backend['model']}) for FAISS...")
     
-    embeddings = AzureOpenAIEmbeddings(
-        azure_endpoint=CONFIG["AZURE_OPENAI_ENDPOINT"],
-        api_key=CONFIG["AZURE_OPENAI_API_KEY"],
-        azure_deployment=CONFIG["AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"],
-        openai_api_version=CONFIG["OPENAI_EMBEDDING_API_VERSION"],
-        chunk_size=50
-    )
+    total_docs = len(documents)
+    progress_bar = report.progress("Embedding")
+    embeddings, batcher = _ingest_embeddings(progress_bar)
     
     try:
         test_embedding = embeddings.embed_query("Test sentence for Bengali embedding বাংলা পরীক্ষা")
         embedding_dim = len(test_embedding)
-        st.success(f"✅ Embeddings working! Dimension: {embedding_dim}")
+        report.success(f"✅ Embeddings working! Dimension: {embedding_dim}")
     except Exception as e:
-        st.error(f"❌ Embedding test failed: {str(e)}")
+        report.error(f"❌ Embedding test failed: {str(e)}")
         raise e
     
-    total_docs = len(documents)
-    st.info(f"📊 Creating FAISS index for {total_docs} documents...")
+    report.info(
+        f"📊 Creating FAISS index for {total_docs} documents "
+        f"(batches of {batcher.batch_size}, {batcher.max_concurrency} concurrent)..."
+    )
     
-    batch_size = 100
+    texts = [doc.page_content for doc in documents]
+    try:
+        vectors = embeddings.embed_documents(texts)
+    except Exception as e:
+        report.error(f"❌ Embedding failed after retries, index not built: {str(e)}")
+        raise
+    finally:
+        progress_bar.empty()
     
-    if total_docs <= batch_size:
-        vectorstore = FAISS.from_documents(documents, embeddings)
-        st.success(f"✅ FAISS vector store created with {total_docs} documents!")
-    else:
-        st.info(f"Processing large dataset in batches of {batch_size}...")
-        first_batch = documents[:batch_size]
-        vectorstore = FAISS.from_documents(first_batch, embeddings)
-        
-        for i in range(batch_size, total_docs, batch_size):
-            batch_end = min(i + batch_size, total_docs)
-            batch = documents[i:batch_end]
-            
-            progress = batch_end / total_docs
-            st.progress(progress)
-            st.info(f"Processing batch: {batch_end}/{total_docs}")
-            
-            try:
-                batch_vectorstore = FAISS.from_documents(batch, embeddings)
-                vectorstore.merge_from(batch_vectorstore)
-                time.sleep(0.1)
-            except Exception as e:
-                st.warning(f"Failed to process batch {i//batch_size + 1}: {str(e)}")
-                continue
-        
-        st.success(f"✅ FAISS vector store created with {total_docs} documents!")
+    # One bulk add into a single index instead of per-batch indexes + merge_from;
+    # the index type (flat / HNSW / IVF) is chosen by corpus size unless configured
+    vectorstore, build_info = build_vectorstore(documents, vectors, embeddings)
+    recall = build_info["recall"]
+    memory = build_info["memory"]
+    report.success(
+        f"✅ FAISS {build_info['index_type']} ({build_info['encoding']}) index created with {total_docs} documents! "
+        f"recall@{recall['k']}: {recall['recall_at_k']:.3f}, "
+        f"{recall['index_ms_per_query']:.2f} ms/query vs exact {recall['exact_ms_per_query']:.2f} ms/query"
+    )
+    if memory["saved_fraction"] > 0:
+        report.info(
+            f"🗜️ Vectors: {memory['index_mb']:.1f} MB in memory vs {memory['float32_mb']:.1f} MB float32 "
+            f"({memory['saved_fraction']:.0%} saved)"
+        )
+    attach_sparse_index(vectorstore)
+    report.info(f"🔤 BM25 index built: {len(vectorstore.sparse_index.postings)} terms over {len(vectorstore.sparse_index)} chunks")
+    report.details("📐 FAISS Build Report", build_info)
+    _report_embedding_stats(embeddings, batcher)
     
     try:
         test_results = vectorstore.similarity_search("test বাংলা", k=5)
-        st.success(f"✅ FAISS retrieval test successful! Found {len(test_results)} results")
+        report.success(f"✅ FAISS retrieval test successful! Found {len(test_results)} results")
         
-        with st.expander("🔍 FAISS Retrieval Test Results"):
-            for i, doc in enumerate(test_results):
-                st.write(f"**Result {i+1}:** {doc.page_content[:150]}...")
-                st.write(f"*Source: {doc.metadata.get('source', 'Unknown')}*")
-                st.write("---")
+        report.details("🔍 FAISS Retrieval Test Results", [
+            line
+            for i, doc in enumerate(test_results)
+            for line in (
+                f"**Result {i+1}:** {doc.page_content[:150]}...",
+                f"*Source: {doc.metadata.get('source', 'Unknown')}*",
+                "---",
+            )
+        ])
     except Exception as e:
-        st.warning(f"⚠️ FAISS retrieval test failed: {str(e)}")
+        report.warning(f"⚠️ FAISS retrieval test failed: {str(e)}")
     
     try:
-        vectorstore.save_local("faiss_index")
-        st.info("💾 FAISS index saved locally")
+        # Writes the base index and manifest, dropping any delta log left by a previous index
+        compact_index(vectorstore, INDEX_PATH, manifest_from_vectorstore(vectorstore, content_hashes or {}))
+        save_backend_info(INDEX_PATH, embedding_dim)
+        save_build_report(INDEX_PATH, build_info)
+        report.info("💾 FAISS index saved locally")
     except Exception as e:
-        st.warning(f"Could not save FAISS index: {str(e)}")
+        report.warning(f"Could not save FAISS index: {str(e)}")
     
     return vectorstore
 
+def update_faiss_index(vectorstore: FAISS, source: str, content_hash: str, documents: List[Document]) -> str:
+    """
+    Add or replace one document in an existing index, persisting only the delta.
+    Returns "added", "replaced" or "unchanged".
+    """
+    report = get_reporter()
+    if is_unchanged(load_manifest(INDEX_PATH), source, content_hash):
+        report.info(f"⏭️ {source} is unchanged, skipping")
+        return "unchanged"
+    
+    progress_bar = report.progress("Embedding")
+    embeddings, batcher = _ingest_embeddings(progress_bar)
+    try:
+        vectors = embeddings.embed_documents([doc.page_content for doc in documents])
+    except Exception as e:
+        report.error(f"❌ Embedding failed after retries, {source} not indexed: {str(e)}")
+        raise
+    finally:
+        progress_bar.empty()
+    _report_embedding_stats(embeddings, batcher)
+    
+    status = upsert_document(vectorstore, INDEX_PATH, source, content_hash, documents, vectors)
+    report.success(f"✅ {source} {status}: {len(documents)} chunks ({len(vectorstore.index_to_docstore_id)} in index)")
+    _compact_if_needed(vectorstore)
+    return status
+
+def remove_from_faiss_index(vectorstore: FAISS, source: str) -> bool:
+    """
+    Delete one document's chunks from the index by source name
+    """
+    report = get_reporter()
+    if not remove_document(vectorstore, INDEX_PATH, source):
+        report.warning(f"⚠️ {source} is not in the index")
+        return False
+    report.success(f"🗑️ Removed {source} ({len(vectorstore.index_to_docstore_id)} chunks left)")
+    _compact_if_needed(vectorstore)
+    return True
+
+def _compact_if_needed(vectorstore: FAISS):
+    # A legacy pickled index is converted by the first update after it was loaded
+    if not has_saved_index(INDEX_PATH) or needs_compaction(vectorstore, INDEX_PATH):
+        # Renumbering rebuilds from the embedded vectors, not from (possibly lossy) index codes
+        cache = open_embedding_cache(CONFIG["EMBEDDING_CACHE_DIR"], embedding_cache_namespace())
+        compact_index(vectorstore, INDEX_PATH, vector_cache=cache)
+        get_reporter().info("💾 Compacted FAISS index deltas")
+
+def indexed_sources() -> List[str]:
+    return sorted(load_manifest(INDEX_PATH))
+
+def _load_with_deltas(embeddings):
+    if not has_saved_index(INDEX_PATH) and has_legacy_index(INDEX_PATH):
+        # Index written by LangChain's save_local (pickle): read into memory only; the
+        # next writer converts it to the memory-mapped format
+        get_reporter().warning("⚠️ Loading legacy pickled FAISS index; the next update converts it")
+        vectorstore = FAISS.load_local(INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+        attach_sparse_index(vectorstore)
+    else:
+        vectorstore = load_index(INDEX_PATH, embeddings)
+    return vectorstore, replay_deltas(vectorstore, INDEX_PATH)
+
 def load_existing_faiss_index() -> FAISS:
     """
-    Load existing FAISS index if available
+    Load existing FAISS index if available: memory-mapped, no pickle involved.
+    Read-only on disk: pending deltas are replayed in memory, and only writers (holding
+    SharedIndex.write_lock) fold them into the base index.
+    Raises BackendMismatchError for an index embedded with another backend/model, so
+    callers refuse to query it (or to treat it as missing and overwrite it); other load
+    failures are reported and return None.
     """
+    report = get_reporter()
+    if os.path.exists(INDEX_PATH):
+        check_backend_info(INDEX_PATH)
     try:
-        if os.path.exists("faiss_index"):
-            embeddings = AzureOpenAIEmbeddings(
-                azure_endpoint=CONFIG["AZURE_OPENAI_ENDPOINT"],
-                api_key=CONFIG["AZURE_OPENAI_API_KEY"],
-                azure_deployment=CONFIG["AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"],
-                openai_api_version=CONFIG["OPENAI_EMBEDDING_API_VERSION"],
+        if os.path.exists(INDEX_PATH):
+            embeddings = shared_embeddings()
+            
+            start = time.perf_counter()
+            for attempt in range(LOAD_ATTEMPTS):
+                generation = saved_generation(INDEX_PATH)
+                try:
+                    with metrics.span("index.load"):
+                        vectorstore, deltas = _load_with_deltas(embeddings)
+                except Exception:
+                    # Files of a generation a writer just replaced; otherwise a real error
+                    if saved_generation(INDEX_PATH) == generation:
+                        raise
+                    continue
+                # A compaction during the load could pair the old base with the new delta log
+                if saved_generation(INDEX_PATH) == generation:
+                    break
+            else:
+                raise RuntimeError(f"index changed during {LOAD_ATTEMPTS} load attempts")
+            report.info(
+                f"📂 Loaded existing FAISS index: {len(vectorstore.index_to_docstore_id)} chunks in "
+                f"{time.perf_counter() - start:.2f}s ({deltas} pending updates applied)"
             )
-            vectorstore = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-            st.info("📂 Loaded existing FAISS index")
             return vectorstore
     except Exception as e:
-        st.warning(f"Could not load existing FAISS index: {str(e)}")
+        report.warning(f"Could not load existing FAISS index: {str(e)}")
     return None
\ No newline at end of file
@@ -0,0 +1,430 @@
+"""
+Incremental Index Module
+Per-document add / remove / replace on a persisted FAISS index.
+
+A manifest records, for every source document, its content hash and the chunk_ids
+it contributed, so re-uploading an unchanged file is a no-op. Changes are persisted
+as an append-only delta log (one JSON + .npy pair per operation) that is replayed
+on load; compact_index folds the log back into the base index.
+
+Each delta carries its own manifest entry, and the base index keeps a manifest
+snapshot together with the sequence number of the last delta folded into it, so the
+manifest is always the snapshot plus the pending deltas: writing a delta is the
+single step that commits a change. manifest.json at the top level is a derived copy
+that index_version hashes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+
+from telemetry import metrics
+
+from .embedding_cache import EmbeddingCache, make_embedding_key
+from .index_builder import apply_search_params
+from .index_store import make_writable, save_index, saved_manifest
+
+MANIFEST_FILE = "manifest.json"
+DELTA_DIR = "deltas"
+# Fold deltas into the base index once the log grows past either limit
+MAX_DELTA_FILES = 20
+MAX_DELTA_FRACTION = 0.2
+
+
+def hash_content(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_json_atomic(path: str, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_manifest(index_path: str) -> Dict:
+    """
+    {source: {"content_hash", "chunk_ids", "updated"}}; empty when there is no index yet.
+    Rebuilt from the base index's snapshot and the pending delta log.
+    """
+    manifest, folded = saved_manifest(index_path)
+    if manifest is None:
+        # Index saved before snapshots existed (or a legacy pickled one): start from the copy
+        path = os.path.join(index_path, MANIFEST_FILE)
+        manifest = _read_json(path) if os.path.exists(path) else {}
+    for path in _pending_delta_files(index_path, folded):
+        delta = _read_json(path)
+        # Older deltas carry no manifest entry; manifest.json already includes them
+        if "content_hash" not in delta:
+            continue
+        if delta["op"] == "remove":
+            manifest.pop(delta["source"], None)
+        else:
+            manifest[delta["source"]] = {
+                "content_hash": delta["content_hash"],
+                "chunk_ids": delta["added_ids"],
+                "updated": delta["updated"],
+            }
+    return manifest
+
+
+def save_manifest(index_path: str, manifest: Dict):
+    _write_json_atomic(os.path.join(index_path, MANIFEST_FILE), manifest)
+
+
+def index_version(index_path: str) -> str:
+    """
+    Changes whenever documents are added, replaced or removed (the manifest is rewritten)
+    """
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return "none"
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def is_unchanged(manifest: Dict, source: str, content_hash: str) -> bool:
+    entry = manifest.get(source)
+    return entry is not None and entry.get("content_hash") == content_hash
+
+
+def manifest_from_vectorstore(vectorstore: FAISS, content_hashes: Dict[str, str]) -> Dict:
+    """
+    Build a manifest for a freshly built index from the chunk ids it actually holds
+    """
+    manifest = {}
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        doc = vectorstore.docstore.search(doc_id)
+        source = doc.metadata.get("source", "Unknown") if isinstance(doc, Document) else "Unknown"
+        entry = manifest.setdefault(source, {
+            "content_hash": content_hashes.get(source),
+            "chunk_ids": [],
+            "updated": time.time(),
+        })
+        entry["chunk_ids"].append(doc_id)
+    return manifest
+
+
+def _delta_files(index_path: str) -> List[str]:
+    delta_dir = os.path.join(index_path, DELTA_DIR)
+    if not os.path.isdir(delta_dir):
+        return []
+    return sorted(
+        os.path.join(delta_dir, name) for name in os.listdir(delta_dir) if name.endswith(".json")
+    )
+
+
+def _delta_sequence(path: str) -> int:
+    return int(os.path.basename(path).split(".")[0])
+
+
+def _pending_delta_files(index_path: str, folded: int) -> List[str]:
+    """
+    Deltas not yet folded into the base index; older ones are only left behind by a
+    compaction interrupted before it cleared the log
+    """
+    return [path for path in _delta_files(index_path) if _delta_sequence(path) > folded]
+
+
+def _next_delta_path(index_path: str) -> str:
+    delta_dir = os.path.join(index_path, DELTA_DIR)
+    os.makedirs(delta_dir, exist_ok=True)
+    files = _delta_files(index_path)
+    # Sequence numbers keep growing across compactions, so a delta is never taken for a folded one
+    _, folded = saved_manifest(index_path)
+    sequence = max(_delta_sequence(files[-1]) if files else 0, folded) + 1
+    return os.path.join(delta_dir, f"{sequence:08d}.json")
+
+
+def _labeled_index(vectorstore: FAISS) -> Optional[faiss.Index]:
+    """
+    The index in a form that adds and removes by label instead of by position, or None
+    for flat (incl. scalar-quantized) indexes, which renumber on remove_ids as LangChain's
+    delete assumes. IVF removes natively once its direct map is a hashtable; HNSW and
+    re-ranking indexes cannot remove at all, so they are wrapped in an IndexIDMap2 whose
+    removed labels are tombstoned. compact_index renumbers and unwraps both.
+    """
+    index = vectorstore.index
+    if isinstance(index, faiss.IndexFlatCodes):
+        return None
+    if isinstance(index, faiss.IndexIVF):
+        if index.direct_map.type != faiss.DirectMap.Hashtable:
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+    if not isinstance(index, faiss.IndexIDMap2):
+        # faiss only wraps an empty index: wrap a placeholder, then swap in the populated
+        # one with the identity mapping its positions already have
+        wrapped = faiss.IndexIDMap2(faiss.IndexFlat(index.d, index.metric_type))
+        wrapped.index = index
+        wrapped.referenced_objects = [index]
+        wrapped.ntotal = index.ntotal
+        faiss.copy_array_to_vector(np.arange(index.ntotal, dtype=np.int64), wrapped.id_map)
+        wrapped.construct_rev_map()
+        vectorstore.index = wrapped
+    return vectorstore.index
+
+
+def _remove_ids(vectorstore: FAISS, ids: List[str]):
+    """
+    Remove chunk ids from the store without touching the remaining vectors
+    """
+    present = set(vectorstore.index_to_docstore_id.values())
+    ids = [doc_id for doc_id in ids if doc_id in present]
+    if not ids:
+        return
+    sparse_index = getattr(vectorstore, "sparse_index", None)
+    if sparse_index is not None:
+        for doc_id in ids:
+            sparse_index.remove(doc_id, vectorstore.docstore.search(doc_id).page_content)
+    index = _labeled_index(vectorstore)
+    if index is None:
+        vectorstore.delete(ids)
+        return
+
+    removed = set(ids)
+    labels = [label for label, doc_id in vectorstore.index_to_docstore_id.items() if doc_id in removed]
+    if isinstance(index, faiss.IndexIDMap2):
+        # Searches return -1 for a tombstoned label, which every caller skips
+        id_map = faiss.vector_to_array(index.id_map)
+        id_map[np.isin(id_map, labels)] = -1
+        faiss.copy_array_to_vector(id_map, index.id_map)
+        index.construct_rev_map()
+    else:
+        index.remove_ids(np.array(labels, dtype=np.int64))
+    for label in labels:
+        del vectorstore.index_to_docstore_id[label]
+    vectorstore.docstore.delete(ids)
+
+
+def _add_documents(vectorstore: FAISS, documents: List[Document], vectors: np.ndarray, ids: List[str]):
+    index = _labeled_index(vectorstore)
+    if index is None:
+        vectorstore.add_embeddings(
+            list(zip([doc.page_content for doc in documents], vectors.tolist())),
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids,
+        )
+    else:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectorstore._normalize_L2:
+            faiss.normalize_L2(vectors)
+        start = max(vectorstore.index_to_docstore_id, default=-1) + 1
+        labels = list(range(start, start + len(ids)))
+        index.add_with_ids(vectors, np.array(labels, dtype=np.int64))
+        vectorstore.docstore.add(dict(zip(ids, documents)))
+        vectorstore.index_to_docstore_id.update(zip(labels, ids))
+    sparse_index = getattr(vectorstore, "sparse_index", None)
+    if sparse_index is not None:
+        for doc_id, doc in zip(ids, documents):
+            sparse_index.add(doc_id, doc.page_content)
+
+
+def _apply_delta(vectorstore: FAISS, delta: Dict, vectors: Optional[np.ndarray]):
+    make_writable(vectorstore)
+    _remove_ids(vectorstore, delta.get("removed_ids", []))
+    if delta.get("documents"):
+        documents = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in delta["documents"]]
+        _add_documents(vectorstore, documents, vectors, delta["added_ids"])
+
+
+def _write_delta(index_path: str, delta: Dict, vectors: Optional[np.ndarray]):
+    path = _next_delta_path(index_path)
+    if vectors is not None:
+        np.save(path[:-len(".json")] + ".npy", vectors, allow_pickle=False)
+    # JSON last: a delta only counts once its descriptor exists
+    _write_json_atomic(path, delta)
+
+
+def replay_deltas(vectorstore: FAISS, index_path: str) -> int:
+    """
+    Apply the persisted delta log to a freshly loaded base index; returns the count applied
+    """
+    _, folded = saved_manifest(index_path)
+    files = _pending_delta_files(index_path, folded)
+    for path in files:
+        delta = _read_json(path)
+        vectors_path = path[:-len(".json")] + ".npy"
+        vectors = np.load(vectors_path, allow_pickle=False) if os.path.exists(vectors_path) else None
+        _apply_delta(vectorstore, delta, vectors)
+    return len(files)
+
+
+@metrics.timed("index.upsert")
+def upsert_document(
+    vectorstore: FAISS,
+    index_path: str,
+    source: str,
+    content_hash: str,
+    documents: List[Document],
+    vectors: List[List[float]],
+) -> str:
+    """
+    Add a new document or replace an existing one by source, persisting only the delta.
+    Returns "added" or "replaced".
+    """
+    manifest = load_manifest(index_path)
+    old_ids = manifest.get(source, {}).get("chunk_ids", [])
+    present = set(vectorstore.index_to_docstore_id.values()) - set(old_ids)
+
+    ids = []
+    for i, doc in enumerate(documents):
+        doc_id = doc.metadata.get("chunk_id") or hash_content(f"{source}_{i}".encode())
+        if doc_id in present or doc_id in ids:
+            doc_id = hash_content(f"{source}_{content_hash}_{i}".encode())
+        ids.append(doc_id)
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    delta = {
+        "op": "replace" if old_ids else "add",
+        "source": source,
+        "content_hash": content_hash,
+        "updated": time.time(),
+        "removed_ids": old_ids,
+        "added_ids": ids,
+        "documents": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents],
+    }
+    _apply_delta(vectorstore, delta, matrix)
+    _write_delta(index_path, delta, matrix)
+
+    manifest[source] = {"content_hash": content_hash, "chunk_ids": ids, "updated": delta["updated"]}
+    save_manifest(index_path, manifest)
+    return "replaced" if old_ids else "added"
+
+
+@metrics.timed("index.remove")
+def remove_document(vectorstore: FAISS, index_path: str, source: str) -> bool:
+    """
+    Delete every chunk of one source document; returns False if it was not indexed
+    """
+    manifest = load_manifest(index_path)
+    entry = manifest.pop(source, None)
+    if entry is None:
+        return False
+    delta = {
+        "op": "remove",
+        "source": source,
+        "content_hash": None,
+        "updated": time.time(),
+        "removed_ids": entry["chunk_ids"],
+        "added_ids": [],
+        "documents": [],
+    }
+    _apply_delta(vectorstore, delta, None)
+    _write_delta(index_path, delta, None)
+    save_manifest(index_path, manifest)
+    return True
+
+
+def needs_compaction(vectorstore: FAISS, index_path: str) -> bool:
+    _, folded = saved_manifest(index_path)
+    files = _pending_delta_files(index_path, folded)
+    if len(files) >= MAX_DELTA_FILES:
+        return True
+    live = len(vectorstore.index_to_docstore_id)
+    # Tombstoned vectors still take search slots and memory
+    if vectorstore.index.ntotal - live > MAX_DELTA_FRACTION * max(live, 1):
+        return True
+    delta_vectors = 0
+    for path in files:
+        npy_path = path[:-len(".json")] + ".npy"
+        if os.path.exists(npy_path):
+            delta_vectors += np.load(npy_path, mmap_mode="r", allow_pickle=False).shape[0]
+    return delta_vectors > MAX_DELTA_FRACTION * max(live, 1)
+
+
+def _exact_vectors(
+    vectorstore: FAISS, index_path: str, labels: List[int], vector_cache: Optional[EmbeddingCache]
+) -> np.ndarray:
+    """
+    Vectors for the given labels as they were embedded: from the pending deltas, then
+    the embedding cache, and only then decoded from the index (lossy for PQ codes)
+    """
+    exact = {}
+    _, folded = saved_manifest(index_path)
+    for path in _pending_delta_files(index_path, folded):
+        vectors_path = path[:-len(".json")] + ".npy"
+        if os.path.exists(vectors_path):
+            exact.update(zip(_read_json(path)["added_ids"], np.load(vectors_path, allow_pickle=False)))
+    ids = [vectorstore.index_to_docstore_id[label] for label in labels]
+    missing = [doc_id for doc_id in ids if doc_id not in exact]
+    if missing and vector_cache is not None:
+        keys = {
+            doc_id: make_embedding_key(vectorstore.docstore.search(doc_id).page_content, vector_cache.namespace)
+            for doc_id in missing
+        }
+        cached = vector_cache.get_many(list(keys.values()))
+        exact.update((doc_id, cached[key]) for doc_id, key in keys.items() if key in cached)
+
+    matrix = np.empty((len(labels), vectorstore.index.d), dtype=np.float32)
+    decoded = 0
+    for row, (label, doc_id) in enumerate(zip(labels, ids)):
+        if doc_id in exact:
+            matrix[row] = exact[doc_id]
+        else:
+            matrix[row] = vectorstore.index.reconstruct(label)
+            decoded += 1
+    if decoded:
+        metrics.count("index_vectors_decoded_total", decoded)
+    return matrix
+
+
+def _renumber(vectorstore: FAISS, index_path: str, vector_cache: Optional[EmbeddingCache]):
+    """
+    Rebuild a labeled index (see _labeled_index) from exact vectors so labels are
+    positions again, dropping removed vectors and the IndexIDMap2 wrapper
+    """
+    labels = sorted(vectorstore.index_to_docstore_id)
+    matrix = _exact_vectors(vectorstore, index_path, labels, vector_cache)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(matrix)
+    index = vectorstore.index
+    if isinstance(index, faiss.IndexIDMap2):
+        index = faiss.downcast_index(index.index)
+    # Trained quantizers are kept; only the stored codes (and HNSW graph) are rebuilt
+    index.reset()
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    index.add(matrix)
+    apply_search_params(index)
+    vectorstore.index = index
+    vectorstore.index_to_docstore_id = {i: vectorstore.index_to_docstore_id[label] for i, label in enumerate(labels)}
+
+
+@metrics.timed("index.compact")
+def compact_index(
+    vectorstore: FAISS,
+    index_path: str,
+    manifest: Optional[Dict] = None,
+    vector_cache: Optional[EmbeddingCache] = None,
+):
+    """
+    Rewrite the base index with all deltas applied and clear the delta log.
+    manifest replaces the current one (a full rebuild); every existing delta is folded.
+    vector_cache supplies exact vectors when a labeled index has to be renumbered.
+    """
+    index = vectorstore.index
+    labels = vectorstore.index_to_docstore_id
+    if isinstance(index, faiss.IndexIDMap2) or index.ntotal != len(labels) or max(labels, default=-1) != len(labels) - 1:
+        _renumber(vectorstore, index_path, vector_cache)
+    files = _delta_files(index_path)
+    if manifest is None:
+        manifest = load_manifest(index_path)
+    _, folded = saved_manifest(index_path)
+    folded = max(_delta_sequence(files[-1]) if files else 0, folded)
+    save_index(vectorstore, index_path, manifest=manifest, delta_seq=folded)
+    save_manifest(index_path, manifest)
+    shutil.rmtree(os.path.join(index_path, DELTA_DIR), ignore_errors=True)
@@ -0,0 +1,275 @@
+"""
+FAISS Index Builder Module
+Builds flat, IVF-Flat, IVF-PQ or HNSW indexes (chosen automatically by corpus size
+or forced via CONFIG["FAISS_INDEX_TYPE"]), trains them on a sample, applies the
+nprobe / efSearch settings and measures recall@k and latency against exact search.
+Vectors can be stored as fp16 / int8 scalar-quantized codes, optionally re-ranked
+exactly from a float32 copy kept next to the codes (which costs more memory than
+plain float32: it buys recall for the compressed codes, not space).
+"""
+
+import json
+import math
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.embeddings import Embeddings
+
+from config.config import CONFIG
+from telemetry import metrics
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+VECTOR_ENCODINGS = {
+    "float32": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+BUILD_REPORT_FILE = "build_report.json"
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """
+    Exact search for small corpora, HNSW for medium, compressed IVF-PQ for ~1M chunks
+    """
+    if num_vectors < CONFIG["FAISS_FLAT_MAX_VECTORS"]:
+        return "flat"
+    if num_vectors < CONFIG["FAISS_HNSW_MAX_VECTORS"]:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def _ivf_nlist(num_vectors: int) -> int:
+    # ~4*sqrt(N) lists, with at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if dimension % m == 0 and dimension // m >= 4:
+            return m
+    return 1
+
+
+def _training_sample(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    if len(vectors) <= size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    return vectors[rng.choice(len(vectors), size, replace=False)]
+
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """
+    The compressed index inside an exact re-ranking wrapper (or the index itself)
+    """
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.downcast_index(index.base_index)
+    return index
+
+
+def apply_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """
+    Set query-time knobs on IVF (nprobe) and HNSW (efSearch) indexes
+    """
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = max(1, CONFIG["FAISS_RERANK_FACTOR"])
+        index = base_index(index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe or CONFIG["FAISS_NPROBE"], ivf.nlist)
+        # LangChain's MMR search reconstructs candidate vectors by id (an index that
+        # removed ids already has a hashtable direct map for that)
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search or CONFIG["FAISS_EF_SEARCH"]
+
+
+def index_memory(index: faiss.Index, num_vectors: int, dimension: int) -> Dict:
+    """
+    Bytes the index holds versus plain float32 vectors: codes, HNSW graph links or
+    IVF list ids, and the float32 copy kept for exact re-ranking. All of it is
+    resident in the process that builds the index.
+    """
+    float32_bytes = num_vectors * dimension * 4
+    searched = base_index(index)
+    ivf = faiss.try_extract_index_ivf(searched)
+    if isinstance(searched, faiss.IndexHNSW):
+        code_bytes = num_vectors * faiss.downcast_index(searched.storage).sa_code_size()
+        # int32 neighbour ids, plus an int64 offset and an int32 level per vector
+        link_bytes = searched.hnsw.neighbors.size() * 4 + num_vectors * 12
+    elif ivf is not None:
+        code_bytes = num_vectors * ivf.code_size
+        link_bytes = num_vectors * 8
+    else:
+        code_bytes = num_vectors * searched.sa_code_size()
+        link_bytes = 0
+    rerank_bytes = float32_bytes if searched is not index else 0
+    index_bytes = code_bytes + link_bytes + rerank_bytes
+    return {
+        "float32_mb": float32_bytes / 1024 / 1024,
+        "index_mb": index_bytes / 1024 / 1024,
+        "codes_mb": code_bytes / 1024 / 1024,
+        "links_mb": link_bytes / 1024 / 1024,
+        "rerank_mb": rerank_bytes / 1024 / 1024,
+        "saved_fraction": 1 - index_bytes / float32_bytes if float32_bytes else 0.0,
+    }
+
+
+def build_faiss_index(
+    vectors: np.ndarray,
+    index_type: str = "auto",
+    encoding: Optional[str] = None,
+    rerank_factor: Optional[int] = None,
+) -> Tuple[faiss.Index, Dict]:
+    """
+    Build and populate a FAISS index (L2 metric, like LangChain's default) with one bulk add
+    """
+    num_vectors, dimension = vectors.shape
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE: {index_type!r} (expected 'auto' or one of {INDEX_TYPES})")
+    encoding = encoding or CONFIG["FAISS_VECTOR_ENCODING"]
+    if encoding not in VECTOR_ENCODINGS:
+        raise ValueError(f"Unknown FAISS_VECTOR_ENCODING: {encoding!r} (expected one of {tuple(VECTOR_ENCODINGS)})")
+    rerank_factor = CONFIG["FAISS_RERANK_FACTOR"] if rerank_factor is None else rerank_factor
+
+    params = {}
+    # Too few vectors to train a quantizer: fall back to exact search
+    if index_type in ("ivf_flat", "ivf_pq") and num_vectors < 256:
+        index_type = "flat"
+    # PQ codes are already compressed far below int8
+    if index_type == "ivf_pq":
+        encoding = "float32"
+    qtype = VECTOR_ENCODINGS[encoding]
+
+    if index_type == "flat":
+        if qtype is None:
+            index = faiss.IndexFlatL2(dimension)
+        else:
+            index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_L2)
+    elif index_type == "hnsw":
+        params["M"] = CONFIG["FAISS_HNSW_M"]
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dimension, params["M"])
+        else:
+            index = faiss.IndexHNSWSQ(dimension, qtype, params["M"])
+        index.hnsw.efConstruction = CONFIG["FAISS_EF_CONSTRUCTION"]
+    else:
+        params["nlist"] = _ivf_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_flat" and qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dimension, params["nlist"])
+        elif index_type == "ivf_flat":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, params["nlist"], qtype, faiss.METRIC_L2)
+        else:
+            params["pq_m"] = _pq_subquantizers(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["pq_m"], 8)
+
+    # Exact re-ranking only makes sense on top of lossy codes
+    lossy = qtype is not None or index_type == "ivf_pq"
+    if lossy and rerank_factor > 0:
+        params["rerank_factor"] = rerank_factor
+        index = faiss.IndexRefineFlat(index)
+
+    train_seconds = 0.0
+    if not index.is_trained:
+        train_start = time.perf_counter()
+        sample = _training_sample(vectors, max(params.get("nlist", 1) * 64, 10000))
+        params["train_vectors"] = len(sample)
+        with metrics.span("index.train", index_type=index_type):
+            index.train(sample)
+        train_seconds = time.perf_counter() - train_start
+
+    add_start = time.perf_counter()
+    with metrics.span("index.add", index_type=index_type):
+        index.add(vectors)
+    add_seconds = time.perf_counter() - add_start
+    apply_search_params(index)
+
+    info = {
+        "index_type": index_type,
+        "encoding": encoding,
+        "vectors": num_vectors,
+        "dimension": dimension,
+        "params": params,
+        "memory": index_memory(index, num_vectors, dimension),
+        "train_seconds": train_seconds,
+        "add_seconds": add_seconds,
+    }
+    return index, info
+
+
+def recall_report(index: faiss.Index, vectors: np.ndarray, k: int = 10, num_queries: int = 200) -> Dict:
+    """
+    recall@k and per-query latency of index versus exact brute-force search,
+    using a sample of the indexed vectors as queries
+    """
+    queries = _training_sample(vectors, num_queries, seed=1)
+    k = min(k, len(vectors))
+
+    # Brute-force ground truth without building (and copying into) a second index
+    start = time.perf_counter()
+    _, exact_ids = faiss.knn(queries, vectors, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    _, approx_ids = index.search(queries, k)
+    approx_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approx_ids, exact_ids))
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": hits / (k * len(queries)),
+        "exact_ms_per_query": exact_ms,
+        "index_ms_per_query": approx_ms,
+    }
+
+
+def build_vectorstore(
+    documents: List[Document],
+    vectors: List[List[float]],
+    embeddings: Embeddings,
+    index_type: Optional[str] = None,
+) -> Tuple[FAISS, Dict]:
+    """
+    Wrap a freshly built index in a LangChain FAISS store keyed by chunk_id.
+    Returns the store and a build report including recall@k versus exact search.
+    """
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    index, info = build_faiss_index(matrix, index_type or CONFIG["FAISS_INDEX_TYPE"])
+    with metrics.span("index.recall_check"):
+        info["recall"] = recall_report(index, matrix)
+        if isinstance(index, faiss.IndexRefine):
+            # Recall impact of the compressed codes alone, i.e. what re-ranking recovers
+            info["recall_without_rerank"] = recall_report(base_index(index), matrix)
+
+    ids = []
+    seen = set()
+    for doc in documents:
+        doc_id = doc.metadata.get("chunk_id")
+        if not doc_id or doc_id in seen:
+            doc_id = str(uuid.uuid4())
+        seen.add(doc_id)
+        ids.append(doc_id)
+    docstore = InMemoryDocstore(dict(zip(ids, documents)))
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(ids)),
+    )
+    return vectorstore, info
+
+
+def save_build_report(index_path: str, info: Dict):
+    with open(os.path.join(index_path, BUILD_REPORT_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
@@ -0,0 +1,343 @@
+"""
+Index Store Module
+Pickle-free, memory-mapped persistence for the FAISS vector store.
+
+Layout of an index directory:
+- header.json   versioned header (format, version, counts, dimension, current data directory)
+- data-<id>/    one saved generation of the index:
+  - vectors.faiss the FAISS index, memory-mapped (see _mmap_flags)
+  - docs.bin      chunk records (UTF-8 JSON: page_content + metadata) back to back
+  - offsets.npy   int64 record offsets into docs.bin (count + 1 entries)
+  - ids.npy       fixed-width chunk ids in index position order
+  - ids_sorted.npy / ids_order.npy  sorted ids and their positions for id lookups
+  - sparse_index.json  BM25 index over the same chunk ids (when one was built)
+  - manifest.json   the incremental-update manifest as of this generation; the header's
+                    delta_seq is the last delta folded into it (see incremental.py)
+
+Every chunk array is memory-mapped, and so are the FAISS vectors with faiss >= 1.11
+(IO_FLAG_MMAP_IFC); older faiss maps only IVF inverted lists and reads flat, scalar-
+quantized and HNSW indexes fully into memory. Resident memory then grows with the
+chunks that are actually retrieved rather than with the corpus.
+"""
+
+import json
+import os
+import shutil
+import time
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import Embeddings
+
+from .index_builder import apply_search_params
+from .sparse_index import SPARSE_INDEX_FILE, BM25Index
+
+FORMAT_NAME = "bengali-rag-faiss"
+FORMAT_VERSION = 2
+HEADER_FILE = "header.json"
+DATA_DIR_PREFIX = "data-"
+INDEX_FILE = "vectors.faiss"
+DOCS_FILE = "docs.bin"
+OFFSETS_FILE = "offsets.npy"
+IDS_FILE = "ids.npy"
+SORTED_IDS_FILE = "ids_sorted.npy"
+IDS_ORDER_FILE = "ids_order.npy"
+MANIFEST_SNAPSHOT_FILE = "manifest.json"
+# Files written by LangChain's save_local (pickled docstore)
+LEGACY_FILES = ("index.faiss", "index.pkl")
+# Version 1 kept the data files directly in the index directory
+V1_FILES = (INDEX_FILE, DOCS_FILE, OFFSETS_FILE, IDS_FILE, SORTED_IDS_FILE, IDS_ORDER_FILE, SPARSE_INDEX_FILE)
+
+
+def _open_array(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+    except ValueError:
+        # Zero-length arrays (an emptied index) cannot be memory-mapped
+        return np.load(path, allow_pickle=False)
+
+
+class PositionIdMap(MutableMapping):
+    """
+    index position -> chunk id backed by a memory-mapped array.
+    The first mutation copies it into a plain dict (only incremental updates mutate).
+    """
+
+    def __init__(self, ids: np.ndarray):
+        self._ids = ids
+        self._dict: Optional[Dict[int, str]] = None
+
+    def _materialize(self) -> Dict[int, str]:
+        if self._dict is None:
+            self._dict = {i: doc_id.decode("utf-8") for i, doc_id in enumerate(self._ids)}
+        return self._dict
+
+    def __getitem__(self, position: int) -> str:
+        if self._dict is not None:
+            return self._dict[position]
+        if not 0 <= position < len(self._ids):
+            raise KeyError(position)
+        return self._ids[position].decode("utf-8")
+
+    def __setitem__(self, position: int, doc_id: str):
+        self._materialize()[position] = doc_id
+
+    def __delitem__(self, position: int):
+        del self._materialize()[position]
+
+    def __iter__(self) -> Iterator[int]:
+        if self._dict is not None:
+            return iter(self._dict)
+        return iter(range(len(self._ids)))
+
+    def __len__(self) -> int:
+        return len(self._dict) if self._dict is not None else len(self._ids)
+
+
+class LazyDocstore(Docstore, AddableMixin):
+    """
+    Docstore that decodes a chunk from docs.bin only when it is looked up.
+    Added and deleted chunks are tracked in memory until the next save.
+    """
+
+    def __init__(self, index_path: str):
+        self._offsets = _open_array(os.path.join(index_path, OFFSETS_FILE))
+        self._sorted_ids = _open_array(os.path.join(index_path, SORTED_IDS_FILE))
+        self._order = _open_array(os.path.join(index_path, IDS_ORDER_FILE))
+        docs_path = os.path.join(index_path, DOCS_FILE)
+        # np.memmap cannot map an empty file
+        self._records = np.memmap(docs_path, dtype=np.uint8, mode="r") if os.path.getsize(docs_path) else None
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+
+    def _record(self, doc_id: str) -> Optional[int]:
+        if doc_id in self._deleted or not len(self._sorted_ids):
+            return None
+        key = doc_id.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._order[i])
+        return None
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._added:
+            return self._added[search]
+        record = self._record(search)
+        if record is None:
+            return f"ID {search} not found."
+        payload = json.loads(bytes(self._records[self._offsets[record]:self._offsets[record + 1]]))
+        return Document(page_content=payload["page_content"], metadata=payload["metadata"])
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = [doc_id for doc_id in texts if doc_id in self._added or self._record(doc_id) is not None]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids: List) -> None:
+        missing = [doc_id for doc_id in ids if doc_id not in self._added and self._record(doc_id) is None]
+        if missing:
+            raise ValueError(f"Tried to delete ids that does not exist: {missing}")
+        for doc_id in ids:
+            if self._added.pop(doc_id, None) is None:
+                self._deleted.add(doc_id)
+
+
+def has_saved_index(index_path: str) -> bool:
+    return os.path.exists(os.path.join(index_path, HEADER_FILE))
+
+
+def has_legacy_index(index_path: str) -> bool:
+    return all(os.path.exists(os.path.join(index_path, name)) for name in LEGACY_FILES)
+
+
+def read_header(index_path: str) -> Dict:
+    with open(os.path.join(index_path, HEADER_FILE), encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format") != FORMAT_NAME:
+        raise ValueError(f"'{index_path}' is not a {FORMAT_NAME} index")
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(
+            f"Index '{index_path}' uses format version {header['version']}; "
+            f"this build reads up to version {FORMAT_VERSION}"
+        )
+    return header
+
+
+def saved_generation(index_path: str) -> Optional[str]:
+    """
+    Data directory header.json points to (None without one). Every save_index changes
+    it, so a reader that sees the same value before and after a load read one generation.
+    """
+    try:
+        return read_header(index_path).get("data_dir")
+    except FileNotFoundError:
+        return None
+
+
+def _data_path(index_path: str, header: Dict) -> str:
+    """
+    Directory holding the data files of the generation the header points to
+    """
+    return os.path.join(index_path, header["data_dir"]) if header.get("data_dir") else index_path
+
+
+def saved_manifest(index_path: str) -> Tuple[Optional[Dict], int]:
+    """
+    (manifest snapshot, last folded delta sequence) of the saved generation; the
+    snapshot is None for an index saved without one (or no saved index at all)
+    """
+    if not has_saved_index(index_path):
+        return None, 0
+    header = read_header(index_path)
+    path = os.path.join(_data_path(index_path, header), MANIFEST_SNAPSHOT_FILE)
+    if not header.get("data_dir") or not os.path.exists(path):
+        return None, header.get("delta_seq", 0)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f), header.get("delta_seq", 0)
+
+
+def _mmap_flags(header: Dict) -> int:
+    """
+    IVF inverted lists are mapped with IO_FLAG_MMAP; flat codes (flat, scalar-quantized,
+    HNSW storage, re-ranking copies) need IO_FLAG_MMAP_IFC, which faiss rejects for
+    IVF indexes when combined with IO_FLAG_MMAP
+    """
+    ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    if not ifc or header.get("ivf"):
+        return faiss.IO_FLAG_MMAP
+    return ifc
+
+
+def _remove_stale_generations(index_path: str, keep: List[str]):
+    for name in os.listdir(index_path):
+        if name.startswith(DATA_DIR_PREFIX) and name not in keep:
+            shutil.rmtree(os.path.join(index_path, name), ignore_errors=True)
+
+
+def save_index(vectorstore: FAISS, index_path: str, manifest: Optional[Dict] = None, delta_seq: int = 0):
+    """
+    Write the store in the memory-mappable format. Each save writes a new data
+    directory and then switches header.json to it with a single os.replace, so a
+    reader sees either the old index or the new one, never a mix. The previous
+    generation is kept until the next save, so an index that is currently
+    memory-mapped (or about to be re-read by make_writable) stays valid.
+    A manifest snapshot and delta_seq are committed by the same header switch.
+    """
+    os.makedirs(index_path, exist_ok=True)
+    previous = read_header(index_path).get("data_dir") if has_saved_index(index_path) else None
+    data_dir = f"{DATA_DIR_PREFIX}{time.time_ns():x}"
+    path = os.path.join(index_path, data_dir)
+    os.makedirs(path)
+
+    positions = sorted(vectorstore.index_to_docstore_id)
+    ids = [vectorstore.index_to_docstore_id[p] for p in positions]
+
+    offsets = [0]
+    with open(os.path.join(path, DOCS_FILE), "wb") as f:
+        for doc_id in ids:
+            doc = vectorstore.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Docstore is missing chunk {doc_id}")
+            record = json.dumps(
+                {"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False
+            ).encode("utf-8")
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+
+    id_width = max((len(doc_id.encode("utf-8")) for doc_id in ids), default=1)
+    id_array = np.array([doc_id.encode("utf-8") for doc_id in ids], dtype=f"S{id_width}")
+    order = np.argsort(id_array, kind="stable")
+    arrays = {
+        OFFSETS_FILE: np.array(offsets, dtype=np.int64),
+        IDS_FILE: id_array,
+        SORTED_IDS_FILE: id_array[order],
+        IDS_ORDER_FILE: order.astype(np.int64),
+    }
+    for name, array in arrays.items():
+        with open(os.path.join(path, name), "wb") as f:
+            np.save(f, array, allow_pickle=False)
+
+    faiss.write_index(vectorstore.index, os.path.join(path, INDEX_FILE))
+
+    sparse_index = getattr(vectorstore, "sparse_index", None)
+    if sparse_index is not None:
+        sparse_index.save(os.path.join(path, SPARSE_INDEX_FILE))
+
+    if manifest is not None:
+        with open(os.path.join(path, MANIFEST_SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "count": len(ids),
+        "dimension": vectorstore.index.d,
+        "data_dir": data_dir,
+        "index_file": INDEX_FILE,
+        "docs_file": DOCS_FILE,
+        "id_width": id_width,
+        "ivf": faiss.try_extract_index_ivf(vectorstore.index) is not None,
+        "distance_strategy": str(vectorstore.distance_strategy.value),
+        "delta_seq": delta_seq,
+        "saved": time.time(),
+    }
+    tmp_path = os.path.join(index_path, HEADER_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+    os.replace(tmp_path, os.path.join(index_path, HEADER_FILE))
+
+    # Anything older than the previous generation (and unfinished saves) goes
+    _remove_stale_generations(index_path, [data_dir, previous])
+    # The pickled LangChain files are superseded once the header exists, and
+    # version 1 files once no reader can still be using them
+    stale = LEGACY_FILES + (V1_FILES if previous else ())
+    for name in stale:
+        legacy = os.path.join(index_path, name)
+        if os.path.exists(legacy):
+            os.remove(legacy)
+
+
+def load_index(index_path: str, embeddings: Embeddings, mmap: bool = True) -> FAISS:
+    """
+    Open a saved index without unpickling anything. With mmap the FAISS data and all
+    chunk arrays are paged in on demand.
+    """
+    header = read_header(index_path)
+    path = _data_path(index_path, header)
+    index_file = os.path.join(path, header["index_file"])
+    index = faiss.read_index(index_file, _mmap_flags(header) if mmap else 0)
+    apply_search_params(index)
+
+    ids = _open_array(os.path.join(path, IDS_FILE))
+    if len(ids) != index.ntotal:
+        raise ValueError(f"Index '{index_path}' is inconsistent: {index.ntotal} vectors but {len(ids)} chunk ids")
+
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=LazyDocstore(path),
+        index_to_docstore_id=PositionIdMap(ids),
+        distance_strategy=DistanceStrategy(header.get("distance_strategy", DistanceStrategy.EUCLIDEAN_DISTANCE.value)),
+    )
+    vectorstore.mmap_index_path = index_file if mmap else None
+    sparse_path = os.path.join(path, SPARSE_INDEX_FILE)
+    vectorstore.sparse_index = BM25Index.load(sparse_path) if os.path.exists(sparse_path) else None
+    return vectorstore
+
+
+def make_writable(vectorstore: FAISS):
+    """
+    Swap a memory-mapped (read-only) FAISS index for an in-memory copy before adds or removes
+    """
+    path = getattr(vectorstore, "mmap_index_path", None)
+    if path:
+        vectorstore.index = faiss.read_index(path)
+        apply_search_params(vectorstore.index)
+        vectorstore.mmap_index_path = None
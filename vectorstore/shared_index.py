@@ -0,0 +1,142 @@
+"""
+Shared Index Module
+Process-wide registry for the persisted index: every session gets the same
+read-only FAISS instance, loaded once per index version instead of once per
+session. Writers (uploads, removals) work on a private copy under the write lock
+and publish the result; sessions pick up the new version on their next query.
+Also tracks live sessions to report resident memory per additional session.
+"""
+
+import os
+import threading
+import weakref
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from langchain.vectorstores import FAISS
+
+from telemetry import metrics
+
+from .faiss_vectorstore import INDEX_PATH, load_existing_faiss_index
+from .incremental import MANIFEST_FILE, index_version
+
+
+class SessionHandle:
+    """
+    Token a session keeps (e.g. in st.session_state) while it uses the shared index;
+    the registry only holds it weakly, so a closed session stops counting
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.index_version: Optional[str] = None
+
+
+class SharedIndex:
+    def __init__(self, index_path: str = INDEX_PATH):
+        self.index_path = index_path
+        self.write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._vectorstore: Optional[FAISS] = None
+        self._version: Optional[str] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._sessions: "weakref.WeakSet[SessionHandle]" = weakref.WeakSet()
+        self._baseline_rss_mb: Optional[float] = None
+        self._baseline_sessions = 0
+        self.loads = 0
+
+    def _manifest_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(os.path.join(self.index_path, MANIFEST_FILE))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def version(self) -> str:
+        """
+        Current on-disk index version; the manifest is only re-hashed when its stat changes
+        """
+        stamp = self._manifest_stamp()
+        with self._lock:
+            if stamp is not None and stamp == self._stamp and self._version is not None:
+                return self._version
+        return index_version(self.index_path)
+
+    def get(self) -> Optional[FAISS]:
+        """
+        The shared vectorstore for the current on-disk version, loading it at most once.
+        Loading never writes to the index directory, so it needs no write_lock.
+        """
+        stamp = self._manifest_stamp()
+        version = self.version()
+        with self._lock:
+            if self._vectorstore is not None and version == self._version:
+                return self._vectorstore
+            # Loading inside the lock: concurrent sessions wait for one load instead of each loading a copy
+            vectorstore = load_existing_faiss_index()
+            if vectorstore is None:
+                return None
+            self._set(vectorstore, version, stamp)
+            self.loads += 1
+            return vectorstore
+
+    def publish(self, vectorstore: FAISS):
+        """
+        Make a freshly written index the shared instance; the caller must not mutate it afterwards
+        """
+        stamp = self._manifest_stamp()
+        version = index_version(self.index_path)
+        with self._lock:
+            self._set(vectorstore, version, stamp)
+
+    def _set(self, vectorstore: FAISS, version: str, stamp: Optional[Tuple[int, int]]):
+        self._vectorstore = vectorstore
+        self._version = version
+        self._stamp = stamp
+        # Sessions still holding the old instance keep it alive until they switch over
+        self._baseline_rss_mb = None
+
+    def attach(self, session: SessionHandle) -> Optional[FAISS]:
+        """
+        Shared vectorstore for a session, recording the session as live
+        """
+        vectorstore = self.get()
+        if vectorstore is None:
+            return None
+        with self._lock:
+            session.index_version = self._version
+            self._sessions.add(session)
+            if self._baseline_rss_mb is None or len(self._sessions) <= self._baseline_sessions:
+                # Resident memory with this index version loaded and the sessions attached so far
+                self._baseline_rss_mb = metrics.current_rss_mb()
+                self._baseline_sessions = len(self._sessions)
+        return vectorstore
+
+    def is_stale(self, session: SessionHandle) -> bool:
+        return session.index_version != self.version()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions = len(self._sessions)
+            baseline = self._baseline_rss_mb
+            added = sessions - self._baseline_sessions
+            loaded = self._vectorstore is not None
+            chunks = len(self._vectorstore.index_to_docstore_id) if loaded else 0
+        rss = metrics.current_rss_mb()
+        per_session = (rss - baseline) / added if baseline is not None and added > 0 else None
+        return {
+            "loaded": loaded,
+            "chunks": chunks,
+            "loads": self.loads,
+            "sessions": sessions,
+            "rss_mb": rss,
+            "rss_per_additional_session_mb": per_session,
+        }
+
+
+@lru_cache(maxsize=None)
+def open_shared_index() -> SharedIndex:
+    """
+    The registry for the app's index (INDEX_PATH), one per process
+    """
+    return SharedIndex(INDEX_PATH)
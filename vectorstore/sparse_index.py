@@ -0,0 +1,157 @@
+"""
+Sparse Index Module
+BM25 inverted index over chunk text, built alongside the FAISS store so exact Bengali
+names and terms ("অনুপমের মামা") are found even when the dense embedding misses them.
+Tokens go through the same normalization as the OCR fixes (hasanta / nukta spacing,
+NFC, zero-width joiners) plus light suffix stripping for case endings.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from typing import Dict, List, Tuple
+
+from pdf_processing.bengali_text_fixes import normalize_for_search
+
+SPARSE_INDEX_FILE = "sparse_index.json"
+SPARSE_INDEX_VERSION = 1
+
+# Bengali runs (letters, vowel signs, hasanta, nukta, digits) or other alphanumerics
+_TOKEN_PATTERN = re.compile(r'[ঀ-৿]+|[^\W_]+')
+# Case endings and plural markers, longest first; "অনুপমের" -> "অনুপম", "মামার" -> "মামা"
+_SUFFIXES = ('গুলোর', 'গুলির', 'গুলো', 'গুলি', 'দের', 'টির', 'টার', 'েরা', 'ের', 'কে', 'তে', 'রা', 'টি', 'টা', 'র')
+_MIN_STEM_LENGTH = 2
+
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize_bengali(text: str) -> List[str]:
+    """
+    Normalized, suffix-stripped tokens; applied identically to chunks and queries
+    """
+    return [_stem(token) for token in _TOKEN_PATTERN.findall(normalize_for_search(text))]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk ids, supporting incremental add/remove
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # slot -> chunk id (None once removed) and token count
+        self.doc_ids: List = []
+        self.doc_lens: List[int] = []
+        self.slots: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.slots:
+            return
+        tokens = tokenize_bengali(text)
+        slot = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lens.append(len(tokens))
+        self.slots[doc_id] = slot
+        self.total_len += len(tokens)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[slot] = tf
+
+    def remove(self, doc_id: str, text: str):
+        """
+        text must be the chunk text that was added; its tokens locate the postings to drop
+        """
+        slot = self.slots.pop(doc_id, None)
+        if slot is None:
+            return
+        for token in set(tokenize_bengali(text)):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(slot, None)
+                if not postings:
+                    del self.postings[token]
+        self.total_len -= self.doc_lens[slot]
+        self.doc_ids[slot] = None
+        self.doc_lens[slot] = 0
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Top-k (chunk id, BM25 score) for the query, best first
+        """
+        num_docs = len(self.slots)
+        if not num_docs:
+            return []
+        avg_len = self.total_len / num_docs or 1.0
+        scores: Dict[int, float] = {}
+        for token in set(tokenize_bengali(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            for slot, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lens[slot] / avg_len)
+                scores[slot] = scores.get(slot, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.doc_ids[slot], score) for slot, score in best]
+
+    def save(self, path: str):
+        """
+        Write as JSON with removed slots compacted away
+        """
+        live = [slot for slot, doc_id in enumerate(self.doc_ids) if doc_id is not None]
+        renumber = {slot: i for i, slot in enumerate(live)}
+        payload = {
+            "version": SPARSE_INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "doc_ids": [self.doc_ids[slot] for slot in live],
+            "doc_lens": [self.doc_lens[slot] for slot in live],
+            # term -> flat [slot, tf, slot, tf, ...]
+            "postings": {
+                token: [value for slot, tf in postings.items() for value in (renumber[slot], tf)]
+                for token, postings in self.postings.items()
+            },
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version", 0) > SPARSE_INDEX_VERSION:
+            raise ValueError(f"Sparse index '{path}' uses unsupported version {payload['version']}")
+        index = cls(payload["k1"], payload["b"])
+        index.doc_ids = payload["doc_ids"]
+        index.doc_lens = payload["doc_lens"]
+        index.slots = {doc_id: slot for slot, doc_id in enumerate(index.doc_ids)}
+        index.total_len = sum(index.doc_lens)
+        index.postings = {
+            token: dict(zip(flat[0::2], flat[1::2])) for token, flat in payload["postings"].items()
+        }
+        return index
+
+
+def build_sparse_index(ids: List[str], texts: List[str]) -> BM25Index:
+    index = BM25Index()
+    for doc_id, text in zip(ids, texts):
+        index.add(doc_id, text)
+    return index